@@ -0,0 +1,206 @@
+"""
+Running time of every coefficient across sizes, tie densities and orders.
+
+Every configuration is timed in three phases, plus the whole call:
+
+- validation: the type and shape checks of both vectors,
+- ranking: the rank views of both vectors, as `RankedVector` computes them,
+- kernel: the coefficient on vectors already validated and ranked,
+- total: the coefficient on the plain vectors, as users call it.
+
+The tie density is the fraction of items tied with an earlier one, so that a
+vector with density r has n(1 - r) tie groups of about the same size. `tau` and
+`tauap` do not allow ties and only run at density 0, and `tau_a` and `tauap_a`
+only have ties in `y`. Times are the best of `--repeat` runs, each averaged
+over as many calls as fit in 0.2 seconds. The results, together with the
+first-call latency of `bench_jit.py` and the versions of the environment, are
+printed as a JSON record:
+
+    python benchmarks/bench_coefficients.py > base.json
+    python benchmarks/bench_coefficients.py --sizes 1000 100000 > new.json
+    python benchmarks/bench_coefficients.py --compare base.json new.json
+
+`--compare` prints the ratio of the times of the configurations present in both
+runs, marking those slower than `--threshold`.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+
+import numba as nb
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import bench_jit  # noqa: E402
+from pyircor import tau, tauap  # noqa: E402
+from pyircor.check import _check_types  # noqa: E402
+from pyircor.ranks import RankedVector  # noqa: E402
+
+
+SIZES = (10, 100, 1000, 10000, 100000, 1000000)
+TIES = (0., .1, .5, .9)
+PHASES = ('validation', 'ranking', 'kernel', 'total')
+
+# coefficient -> (function, whether it takes `decreasing`, ties allowed in x,
+# in y)
+METHODS = {
+    'tau': (tau.tau, False, False, False),
+    'tau_a': (tau.tau_a, False, False, True),
+    'tau_b': (tau.tau_b, False, True, True),
+    'tauap': (tauap.tauap, True, False, False),
+    'tauap_a': (tauap.tauap_a, True, False, True),
+    'tauap_b': (tauap.tauap_b, True, True, True),
+}
+
+
+def with_ties(v, ties):
+    """Scores following the order of `v` in n(1 - ties) tie groups
+
+    The groups are of about the same size.
+    """
+    n = len(v)
+    groups = max(1, int(round(n * (1 - ties))))
+    ranks = np.empty(n, np.int64)
+    ranks[np.argsort(v, kind='mergesort')] = np.arange(n)
+    return (ranks * groups // n).astype(np.float64)
+
+
+def best_time(func, repeat):
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def ranked(x, decreasing):
+    r = RankedVector._from_checked(x, decreasing)
+    r.dense, r.tie_sizes  # every view the kernels may use
+    return r
+
+
+def run_config(method, n, ties, decreasing, repeat, seed=0):
+    func, takes_order, x_ties, y_ties = METHODS[method]
+    rng = np.random.RandomState(seed)
+    scores = rng.rand(n)
+    x = with_ties(scores, ties if x_ties else 0)
+    y = with_ties(scores + rng.rand(n), ties if y_ties else 0)
+
+    rx = ranked(x, decreasing)
+    ry = ranked(y, decreasing)
+    args = (decreasing,) if takes_order else ()
+
+    def total():
+        return func(x, y, *args)
+
+    def kernel():
+        return func(rx, ry, *args, validate=False)
+
+    total()  # compile outside of the timings
+    return {
+        'method': method,
+        'n': n,
+        'ties': ties,
+        'decreasing': decreasing,
+        'validation': best_time(
+            lambda: (_check_types(x, 'x'), _check_types(y, 'y')), repeat),
+        'ranking': best_time(
+            lambda: (ranked(x, decreasing), ranked(y, decreasing)), repeat),
+        'kernel': best_time(kernel, repeat),
+        'total': best_time(total, repeat),
+    }
+
+
+def configs(methods, sizes, ties):
+    for method in methods:
+        _, takes_order, x_ties, y_ties = METHODS[method]
+        for n in sizes:
+            for r in (ties if x_ties or y_ties else [0.]):
+                for decreasing in [True, False]:
+                    yield method, n, r, decreasing
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT,
+                                check=True, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL)
+        commit = commit.stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'numba': nb.__version__,
+        'machine': platform.machine(),
+        'threads': nb.config.NUMBA_NUM_THREADS,
+    }
+
+
+def compare(base_path, new_path, threshold):
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    def key(r):
+        return r['method'], r['n'], r['ties'], r['decreasing']
+
+    base_results = {key(r): r for r in base['results']}
+    print('{:<8}{:>9}{:>6}{:>6}'.format('method', 'n', 'ties', 'dec') +
+          ''.join('{:>12}'.format(p) for p in PHASES))
+    slower = 0
+    for r in new['results']:
+        b = base_results.get(key(r))
+        if b is None:
+            continue
+        ratios = [r[p] / b[p] for p in PHASES]
+        mark = ' *' if ratios[-1] > threshold else ''
+        slower += bool(mark)
+        order = 'T' if r['decreasing'] else 'F'
+        row = '{:<8}{:>9}{:>6}{:>6}'.format(r['method'], r['n'], r['ties'],
+                                            order)
+        print(row + ''.join('{:>12.2f}'.format(v) for v in ratios) + mark)
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--methods', nargs='+', default=list(METHODS),
+                        choices=list(METHODS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(SIZES))
+    parser.add_argument('--ties', nargs='+', type=float, default=list(TIES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-jit', action='store_true',
+                        help='skip the first-call latency, which starts new '
+                             'processes')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'),
+                        help='compare two JSON records instead of running')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='ratio of the total time marked as a regression')
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    results = []
+    for config in configs(args.methods, args.sizes, args.ties):
+        results.append(run_config(*config, repeat=args.repeat))
+        print('{} n={} ties={} decreasing={}: {:.3g}s'.format(
+            *config, results[-1]['total']), file=sys.stderr)
+    record = {'environment': environment(), 'results': results}
+    if not args.no_jit:
+        record['jit'] = bench_jit.measure()
+    print(json.dumps(record, indent=2))
+
+
+if __name__ == '__main__':
+    main()
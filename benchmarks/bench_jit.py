@@ -0,0 +1,60 @@
+"""
+Import and first-call latency of pyircor.
+
+Every measurement runs in a fresh interpreter, first with an empty numba cache
+(cold) and then with the cache the cold run left behind (warm), and prints a
+JSON record:
+
+    python benchmarks/bench_jit.py > jit.json
+
+A regression in the warm numbers means that something is compiled at import
+time or is not being loaded from the cache.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+
+PROBE = '''
+import json, time
+start = time.perf_counter()
+import pyircor.tau, pyircor.tauap
+import numpy as np
+res = {'import': time.perf_counter() - start}
+x = np.random.RandomState(0).rand(100)
+y = np.round(x * 5)
+for name, call in [('tau', lambda: pyircor.tau.tau(x, x[::-1])),
+                   ('tau_b', lambda: pyircor.tau.tau_b(y, x)),
+                   ('tauap', lambda: pyircor.tauap.tauap(x, x[::-1])),
+                   ('tauap_a', lambda: pyircor.tauap.tauap_a(x, y)),
+                   ('tauap_b', lambda: pyircor.tauap.tauap_b(y, x))]:
+    start = time.perf_counter()
+    call()
+    res[name] = time.perf_counter() - start
+print(json.dumps(res))
+'''
+
+
+def probe(cache_dir):
+    env = dict(os.environ, NUMBA_CACHE_DIR=cache_dir)
+    out = subprocess.run([sys.executable, '-c', PROBE], env=env, check=True,
+                         stdout=subprocess.PIPE, cwd=os.path.dirname(
+                             os.path.dirname(os.path.abspath(__file__))))
+    return json.loads(out.stdout.decode().strip().splitlines()[-1])
+
+
+def measure():
+    """Latencies with a cold and then a warm cache"""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        return {'cold': probe(cache_dir), 'warm': probe(cache_dir)}
+
+
+def main():
+    print(json.dumps(measure(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
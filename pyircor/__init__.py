@@ -3,3 +3,5 @@
 __author__ = """Jaehun Kim"""
 __email__ = 'jaehun.j.kim@gmail.com'
 __version__ = '0.2.0'
+
+from .coefficients import Coefficients, all_coefficients  # noqa: F401
@@ -0,0 +1,235 @@
+"""
+Approximate Correlations by Sampling
+
+Estimates of `tau`, `tau_b` and `tauap` for very long vectors, from random
+samples drawn in vectorised batches until the confidence interval of the
+estimate is narrower than a tolerance. The time taken depends on the tolerance,
+not on the length of the vectors, which are neither copied nor sorted, and not
+even checked for ties.
+
+`tau` is the mean of `sign(x[i] - x[j]) * sign(y[i] - y[j])` over all pairs of
+items, so it is estimated by that mean over random pairs. `tau_b` is the same
+mean divided by the square root of the fractions of pairs not tied in `x` and
+not tied in `y`, all estimated from the same pairs.
+
+`tauap` is `2 * q - 1`, `q` being the average, over the items but the top one,
+of the fraction of the items above each one in `y` that are also above it in
+`x`. It is estimated by drawing pivot items at random and, for every pivot,
+drawing items at random until one is above the pivot in `y`, which is
+concordant or not. A pivot near the top of `y` may need up to n draws, so every
+pivot gets at most `2 / tol` draws and the pivots left without an item above
+are counted as unknown, widening the interval by their fraction, which is about
+`tol / 2`.
+
+The half-width of the interval is given by the central limit theorem
+(`bound='clt'`), with the delta method for `tau_b`, or by Hoeffding's
+inequality (`bound='hoeffding'`), which holds for any number of samples but is
+wider.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+from scipy import stats
+
+
+Estimate = namedtuple('Estimate', ['estimate', 'half_width', 'n_samples'])
+Estimate.__doc__ = """Approximate correlation coefficient
+
+The coefficient is within `estimate - half_width` and `estimate + half_width`
+with the requested confidence. `n_samples` is the number of pairs, or pivots
+for `tauap`, drawn.
+"""
+
+BOUNDS = ('clt', 'hoeffding')
+
+
+def _check_options(tol, confidence, bound):
+    if not 0 < tol < 1:
+        raise ValueError('[ERROR] tol must be in (0, 1)')
+    if not 0 < confidence < 1:
+        raise ValueError('[ERROR] confidence must be in (0, 1)')
+    if bound not in BOUNDS:
+        raise ValueError('[ERROR] bound must be one of {}'.format(BOUNDS))
+
+
+def _inputs(x, y):
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if x.ndim != 1 or len(x) < 2 or len(x) != len(y):
+        raise ValueError('[ERROR] x and y must be vectors of the same length')
+    return x, y
+
+
+def _sample(draw, half_width, tol, batch_size, max_samples):
+    """Draw batches of samples until the half-width is below `tol`
+
+    `draw(size)` returns a (size, k) matrix of samples, and `half_width(mean,
+    cov, m)` the estimate and its half-width from their mean and covariance.
+    """
+    m = 0
+    s1 = 0.
+    s2 = 0.
+    while True:
+        size = min(batch_size, max_samples - m)
+        samples = draw(size)
+        m += size
+        s1 = s1 + samples.sum(axis=0)
+        s2 = s2 + samples.T @ samples
+        mean = s1 / m
+        cov = (s2 / m - np.outer(mean, mean)) * (m / max(m - 1, 1))
+        estimate, width = half_width(mean, cov, m)
+        if width <= tol or m >= max_samples:
+            return Estimate(float(estimate), float(width), m)
+
+
+def _pairs(rng, n, size):
+    i = rng.integers(0, n, size)
+    j = rng.integers(0, n - 1, size)
+    j += j >= i  # any item but i
+    return i, j
+
+
+def tau(x, y, tol=.01, confidence=.95, bound='clt', batch_size=100000,
+        max_samples=10**8, seed=None):
+    """Approximate Kendall :math:`\\tau` Rank Correlation Coefficient
+
+    Inputs:
+        x (array-like of numeric): input vector
+        y (array-like of numeric): another vector for comparison
+        tol (float): half-width of the confidence interval to reach
+        confidence (float): confidence level of the interval
+        bound (str): 'clt' or 'hoeffding'
+        batch_size (int): number of pairs drawn at once
+        max_samples (int): maximum number of pairs, even if `tol` is not
+                           reached
+        seed (int or None): seed of the samples
+
+    Returns:
+        Estimate: the estimated coefficient, the half-width of its confidence
+                  interval and the number of pairs drawn.
+    """
+    _check_options(tol, confidence, bound)
+    x, y = _inputs(x, y)
+    rng = np.random.default_rng(seed)
+
+    def draw(size):
+        i, j = _pairs(rng, len(x), size)
+        return (np.sign(x[i] - x[j]) * np.sign(y[i] - y[j]))[:, None]
+
+    def half_width(mean, cov, m):
+        if bound == 'hoeffding':
+            return mean[0], np.sqrt(2 * np.log(2 / (1 - confidence)) / m)
+        z = stats.norm.ppf(.5 + confidence / 2)
+        return mean[0], z * np.sqrt(cov[0, 0] / m)
+
+    return _sample(draw, half_width, tol, batch_size, max_samples)
+
+
+def tau_b(x, y, tol=.01, confidence=.95, bound='clt', batch_size=100000,
+          max_samples=10**8, seed=None):
+    """Approximate Kendall :math:`\\tau_b` Rank Correlation Coefficient
+
+    Inputs:
+        x (array-like of numeric): input vector
+        y (array-like of numeric): another vector for comparison
+        tol (float): half-width of the confidence interval to reach
+        confidence (float): confidence level of the interval
+        bound (str): 'clt' or 'hoeffding'
+        batch_size (int): number of pairs drawn at once
+        max_samples (int): maximum number of pairs, even if `tol` is not
+                           reached
+        seed (int or None): seed of the samples
+
+    Returns:
+        Estimate: the estimated coefficient, the half-width of its confidence
+                  interval and the number of pairs drawn.
+    """
+    _check_options(tol, confidence, bound)
+    x, y = _inputs(x, y)
+    rng = np.random.default_rng(seed)
+
+    def draw(size):
+        i, j = _pairs(rng, len(x), size)
+        sx = np.sign(x[i] - x[j])
+        sy = np.sign(y[i] - y[j])
+        return np.column_stack([sx * sy, np.abs(sx), np.abs(sy)])
+
+    def half_width(mean, cov, m):
+        a, u, v = mean
+        with np.errstate(divide='ignore', invalid='ignore'):
+            estimate = a / np.sqrt(u * v)
+            if bound == 'clt':
+                # delta method
+                grad = np.array([1, -a / (2 * u), -a / (2 * v)])
+                grad = grad / np.sqrt(u * v)
+                z = stats.norm.ppf(.5 + confidence / 2)
+                return estimate, z * np.sqrt(grad @ cov @ grad / m)
+
+            # the three means within their bounds at once, by the union bound
+            log = np.log(6 / (1 - confidence))
+            ha = np.sqrt(2 * log / m)
+            hu = np.sqrt(log / (2 * m))
+            low = np.sqrt(max(u - hu, 0) * max(v - hu, 0))
+            high = np.sqrt(min(u + hu, 1) * min(v + hu, 1))
+            ends = [(a - ha) / low, (a - ha) / high,
+                    (a + ha) / low, (a + ha) / high]
+            return estimate, max(estimate - min(ends), max(ends) - estimate)
+
+    return _sample(draw, half_width, tol, batch_size, max_samples)
+
+
+def tauap(x, y, decreasing=True, tol=.01, confidence=.95, bound='clt',
+          batch_size=10000, max_samples=10**7, seed=None):
+    """Approximate AP Rank Correlation Coefficient
+
+    Inputs:
+        x (array-like of numeric): input vector
+        y (array-like of numeric): another vector for comparison
+        decreasing (bool): whether items are sorted in decreasing order
+        tol (float): half-width of the confidence interval to reach
+        confidence (float): confidence level of the interval
+        bound (str): 'clt' or 'hoeffding'
+        batch_size (int): number of pivots drawn at once
+        max_samples (int): maximum number of pivots, even if `tol` is not
+                           reached
+        seed (int or None): seed of the samples
+
+    Returns:
+        Estimate: the estimated coefficient, the half-width of its confidence
+                  interval and the number of pivots drawn.
+    """
+    _check_options(tol, confidence, bound)
+    x, y = _inputs(x, y)
+    n = len(x)
+    sign = 1 if decreasing else -1
+    rng = np.random.default_rng(seed)
+    # draws per pivot, so that about tol / 2 of the pivots find no item above
+    tries = int(np.ceil(2 / tol))
+    block = max(1, 10**6 // tries)
+
+    def draw(size):
+        out = np.zeros((size, 2))
+        for start in range(0, size, block):
+            i = rng.integers(0, n, min(block, size - start))
+            j = rng.integers(0, n, (len(i), tries))
+            above = sign * (y[j] - y[i, None]) > 0
+            found = above.any(axis=1)
+            # the first item above every pivot, if any
+            j = j[np.arange(len(i)), above.argmax(axis=1)]
+            concordant = sign * (x[j] - x[i]) > 0
+            out[start:start+len(i), 0] = np.where(found, 2. * concordant - 1,
+                                                  0)
+            out[start:start+len(i), 1] = ~found
+        return out
+
+    def half_width(mean, cov, m):
+        # pivots without an item above could be anywhere in [-1, 1]
+        if bound == 'hoeffding':
+            width = np.sqrt(2 * np.log(2 / (1 - confidence)) / m)
+        else:
+            z = stats.norm.ppf(.5 + confidence / 2)
+            width = z * np.sqrt(cov[0, 0] / m)
+        return mean[0], width + mean[1]
+
+    return _sample(draw, half_width, tol, batch_size, max_samples)
@@ -0,0 +1,232 @@
+"""
+Asymptotic Tests of Independence
+
+`tau_test`, `tau_b_test` and `tauap_test` test whether a rank correlation
+coefficient is significantly different from zero with the normal approximation
+of its distribution under independence, from a closed-form variance, instead of
+the resampling of `pyircor.permute`. `batch_test` does the same between one
+reference and many candidates, on top of `matrix.corr_batch`.
+
+The variance of the Kendall score `S = C - D` under independence is
+
+    Var(S) = (n(n-1)(2n+5) - sum t(t-1)(2t+5) - sum u(u-1)(2u+5)) / 18
+             + sum t(t-1)(t-2) sum u(u-1)(u-2) / (9n(n-1)(n-2))
+             + sum t(t-1) sum u(u-1) / (2n(n-1))
+
+`t` and `u` being the sizes of the tie groups of `x` and `y` [1]. Without ties
+it reduces to `n(n-1)(2n+5) / 18`, and it is computed in O(n) once the vectors
+are ranked.
+
+For `tauap`, the number of items above the item at position `i` of `y` that are
+also above it in `x` is, under independence, uniform on `0..i-1` and
+independent of the others [2], so that the variance of `tauap` is exactly
+
+    Var(tauap) = (n - 1 + 2 H(n-1)) / (3 (n-1)^2)
+
+`H(k)` being the k-th harmonic number. No such result is established for
+`tauap_a` and `tauap_b`, which are left to the permutation tests.
+
+.. [1] Kendall, M. G. (1970). Rank Correlation Methods, 4th ed., Griffin.
+.. [2] Rényi, A. (1962). Théorie des éléments saillants d'une suite
+       d'observations. Annales scientifiques de l'Université de Clermont, 8,
+       7-13.
+"""
+
+from collections import namedtuple
+
+import numba as nb
+import numpy as np
+from scipy import stats
+
+from .config import threads
+from .matrix import _check_matrix, _rank_rows, corr_batch
+from .ranks import _tie_sizes, as_ranked, check_ranked
+from .tau import _pair_counts
+from .tauap import tauap
+
+
+AsymptoticTestResult = namedtuple('AsymptoticTestResult', [
+    'statistic', 'variance', 'zscore', 'pvalue',
+])
+AsymptoticTestResult.__doc__ = """Result of an asymptotic test
+
+`variance` is the variance of the coefficient under independence. In
+`batch_test`, every field is a vector with one element per candidate.
+"""
+
+ALTERNATIVES = ('two-sided', 'greater', 'less')
+BATCH_METHODS = ('tau', 'tau_b', 'tauap')
+
+
+def _pvalue(z, alternative):
+    if alternative not in ALTERNATIVES:
+        raise ValueError(
+            '[ERROR] alternative must be one of {}'.format(ALTERNATIVES))
+    if alternative == 'two-sided':
+        return 2 * stats.norm.sf(np.abs(z))
+    elif alternative == 'greater':
+        return stats.norm.sf(z)
+    return stats.norm.cdf(z)
+
+
+def _result(statistic, variance, z, alternative):
+    return AsymptoticTestResult(float(statistic), float(variance), float(z),
+                                float(_pvalue(z, alternative)))
+
+
+def _tie_terms(t):
+    """Tie sums of the variance of `S`, from the tie group size of every item
+
+    A group of size t has t items, so every sum over groups is a sum over items
+    of the term divided by t.
+    """
+    t = t.astype(np.float64)
+    return (np.sum(t - 1), np.sum((t - 1) * (2 * t + 5)),
+            np.sum((t - 1) * (t - 2)))
+
+
+@nb.njit(cache=True, parallel=True)
+def _tie_terms_rows(order, mins):
+    """`_tie_terms` of every row"""
+    m = order.shape[0]
+    out = np.empty((m, 3))
+    for i in nb.prange(m):
+        t = _tie_sizes(order[i], mins[i]).astype(np.float64)
+        out[i, 0] = np.sum(t - 1)
+        out[i, 1] = np.sum((t - 1) * (2 * t + 5))
+        out[i, 2] = np.sum((t - 1) * (t - 2))
+    return out
+
+
+def _s_variance(n, terms_x, terms_y):
+    """Variance of `S = C - D` under independence, from the tie sums"""
+    x0, x1, x2 = terms_x
+    y0, y1, y2 = terms_y
+    m = n * (n - 1.)
+    return ((m * (2 * n + 5) - x1 - y1) / 18 +
+            x2 * y2 / (9 * m * (n - 2)) + x0 * y0 / (2 * m))
+
+
+def _tauap_variance(n):
+    h = np.sum(1 / np.arange(1, n, dtype=np.float64))
+    return (n - 1 + 2 * h) / (3. * (n - 1)**2)
+
+
+def _check_size(n):
+    if n < 3:
+        raise ValueError('[ERROR] asymptotic tests need at least 3 items')
+
+
+def tau_test(x, y, alternative='two-sided', validate=True):
+    """Asymptotic Test of Independence with Kendall :math:`\\tau`
+
+    Inputs:
+        x (Iterable of numeric or RankedVector): input vector
+        y (Iterable of numeric or RankedVector): another vector for comparison
+        alternative (str): 'two-sided', 'greater' or 'less'
+        validate (bool): whether to validate the inputs, or trust them
+
+    Returns:
+        AsymptoticTestResult: the coefficient, its variance, z-score and
+                              p-value.
+    """
+    x, y = check_ranked(x, y, 'default', validate=validate)
+    n = len(x)
+    _check_size(n)
+    c, d, _, _ = _pair_counts(x, y)
+    nn = n * (n - 1) / 2
+    var = n * (n - 1.) * (2 * n + 5) / 18
+    z = (c - d) / np.sqrt(var)
+    return _result((c - d) / nn, var / nn**2, z, alternative)
+
+
+def tau_b_test(x, y, alternative='two-sided', validate=True):
+    """Asymptotic Test of Independence with Kendall :math:`\\tau_b`
+
+    Inputs:
+        x (Iterable of numeric or RankedVector): input vector
+        y (Iterable of numeric or RankedVector): another vector for comparison
+        alternative (str): 'two-sided', 'greater' or 'less'
+        validate (bool): whether to validate the inputs, or trust them
+
+    Returns:
+        AsymptoticTestResult: the coefficient, its variance, z-score and
+                              p-value, all NaN if every item is tied in `x` or
+                              in `y`.
+    """
+    x, y = check_ranked(x, y, 'b', validate=validate)
+    n = len(x)
+    _check_size(n)
+    c, d, tx, ty = _pair_counts(x, y)
+    nn = n * (n - 1) / 2
+    var = _s_variance(n, _tie_terms(x.tie_sizes), _tie_terms(y.tie_sizes))
+    denominator = (nn - tx) * (nn - ty)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.float64(c - d) / np.sqrt(var)
+        return _result((c - d) / np.sqrt(denominator), var / denominator, z,
+                       alternative)
+
+
+def tauap_test(x, y, decreasing=True, alternative='two-sided', validate=True):
+    """Asymptotic Test of Independence with AP Correlation
+
+    Inputs:
+        x (Iterable of numeric or RankedVector): input vector
+        y (Iterable of numeric or RankedVector): another vector for comparison
+        decreasing (bool): whether items are sorted in decreasing order
+        alternative (str): 'two-sided', 'greater' or 'less'
+        validate (bool): whether to validate the inputs, or trust them
+
+    Returns:
+        AsymptoticTestResult: the coefficient, its variance, z-score and
+                              p-value.
+    """
+    x, y = check_ranked(x, y, 'default', decreasing, validate)
+    n = len(x)
+    _check_size(n)
+    statistic = tauap(x, y, decreasing, validate=False)
+    var = _tauap_variance(n)
+    return _result(statistic, var, statistic / np.sqrt(var), alternative)
+
+
+def batch_test(x, Y, method='tau_b', decreasing=True, alternative='two-sided'):
+    """Asymptotic Tests between a Reference and Many Candidates
+
+    Inputs:
+        x (Iterable of numeric or RankedVector): (n,) reference vector
+        Y (array-like of numeric): (k, n) matrix with one candidate per row
+        method (str): coefficient to test, 'tau', 'tau_b' or 'tauap'
+        decreasing (bool): whether items are sorted in decreasing order
+        alternative (str): 'two-sided', 'greater' or 'less'
+
+    Returns:
+        AsymptoticTestResult: (k,) vectors with the coefficient, its variance,
+                              z-score and p-value of every candidate.
+    """
+    if method not in BATCH_METHODS:
+        raise ValueError(
+            '[ERROR] method must be one of {}'.format(BATCH_METHODS))
+    x = as_ranked(x, decreasing)
+    Y = _check_matrix(Y, 'Y')
+    n = len(x)
+    _check_size(n)
+    statistic = corr_batch(x, Y, method, decreasing)
+    nn = n * (n - 1) / 2
+
+    if method == 'tauap':
+        var = np.full(len(Y), _tauap_variance(n))
+        z = statistic / np.sqrt(var)
+    elif method == 'tau':
+        var_s = n * (n - 1.) * (2 * n + 5) / 18
+        var = np.full(len(Y), var_s / nn**2)
+        z = statistic * nn / np.sqrt(var_s)
+    else:
+        with threads():
+            terms_y = _tie_terms_rows(*_rank_rows(Y, decreasing)[:2])
+        var_s = _s_variance(n, _tie_terms(x.tie_sizes), terms_y.T)
+        denominator = ((nn - terms_y[:, 0] / 2) *
+                       (nn - (x.tie_sizes - 1).sum() / 2))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var = var_s / denominator
+            z = statistic * np.sqrt(denominator) / np.sqrt(var_s)
+    return AsymptoticTestResult(statistic, var, z, _pvalue(z, alternative))
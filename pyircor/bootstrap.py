@@ -0,0 +1,143 @@
+"""
+Bootstrap Confidence Intervals
+
+`bootstrap_ci` computes a confidence interval for the correlation between the
+rankings of systems induced by two evaluation measures over a test collection,
+resampling the topics with replacement. Each measure is given as a (systems x
+topics) matrix of per-topic scores, and systems are ranked by their mean score
+over the resampled topics.
+
+Resamples are drawn in batches from a seeded generator. The mean scores of a
+whole batch are computed at once, weighting every topic by the number of times
+it was drawn, and the coefficients of the batch are computed in parallel with
+the kernels of `pyircor.matrix`. Both percentile and bias-corrected and
+accelerated (BCa) intervals are available, the latter using the jackknife over
+topics for the acceleration.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+from scipy import stats
+
+from .config import threads
+from .matrix import _check_matrix, _check_measure, _corr_pairs, _rank_checked
+
+
+BootstrapResult = namedtuple('BootstrapResult', [
+    'statistic', 'ci_low', 'ci_high', 'standard_error', 'distribution',
+])
+BootstrapResult.__doc__ = """Result of a bootstrap confidence interval
+
+`statistic` is the coefficient over all topics, and `distribution` holds the
+coefficient of every resample.
+"""
+
+INTERVALS = ('percentile', 'bca')
+
+
+def _row_coefs(method, A, B, decreasing):
+    """Coefficient between every row of `A` and the same row of `B`"""
+    check_type, code, _ = _check_measure(method)
+    k = A.shape[0]
+    X = np.vstack([A, B])
+    # only `x` must be free of ties for the `_a` coefficients
+    views = [np.vstack(v) for v in zip(
+        _rank_checked(A, 'b' if check_type == 'b' else 'default',
+                      'the mean scores of x', decreasing),
+        _rank_checked(B, 'default' if check_type == 'default' else 'b',
+                      'the mean scores of y', decreasing),
+    )]
+    rows_idx = np.arange(k, dtype=np.int64)
+    cols_idx = rows_idx + k
+    out = _corr_pairs(code, X, *views, rows_idx, cols_idx, decreasing)
+    if method == 'tauap_b':
+        out = (out + _corr_pairs(code, X, *views, cols_idx, rows_idx,
+                                 decreasing)) / 2
+    return out
+
+
+def _percentile(distribution, alpha):
+    return np.quantile(distribution, [alpha / 2, 1 - alpha / 2])
+
+
+def _bca(distribution, statistic, jackknife, alpha):
+    """BCa interval, with the acceleration estimated by the jackknife"""
+    r = len(distribution)
+    # bias correction, kept finite if all resamples fall on one side
+    below = (np.sum(distribution < statistic) +
+             np.sum(distribution == statistic) / 2) / r
+    z0 = stats.norm.ppf(np.clip(below, 1 / (2 * r), 1 - 1 / (2 * r)))
+
+    d = jackknife.mean() - jackknife
+    den = 6 * np.sum(d**2)**1.5
+    a = np.sum(d**3) / den if den > 0 else 0.
+
+    z = stats.norm.ppf([alpha / 2, 1 - alpha / 2])
+    q = stats.norm.cdf(z0 + (z0 + z) / (1 - a * (z0 + z)))
+    return np.quantile(distribution, q)
+
+
+def bootstrap_ci(x, y, method='tauap_b', decreasing=True, n_resamples=10000,
+                 batch_size=1000, interval='bca', confidence=.95, seed=None):
+    """Bootstrap Confidence Interval over Topics
+
+    Inputs:
+        x (array-like of numeric): (systems, topics) scores of the first
+                                   measure, the true scores for the `_a`
+                                   coefficients
+        y (array-like of numeric): (systems, topics) scores of the second
+                                   measure
+        method (str): coefficient to compute, one of 'tau', 'tau_a', 'tau_b',
+                      'tauap', 'tauap_a' or 'tauap_b'
+        decreasing (bool): whether systems are sorted in decreasing order
+        n_resamples (int): number of bootstrap resamples of the topics
+        batch_size (int): number of resamples computed at once
+        interval (str): 'bca' or 'percentile'
+        confidence (float): confidence level of the interval
+        seed (int or None): seed of the resamples
+
+    Returns:
+        BootstrapResult: the coefficient over all topics, the bounds of the
+                         interval, the bootstrap standard error and the
+                         distribution.
+    """
+    _check_measure(method)
+    if interval not in INTERVALS:
+        raise ValueError(
+            '[ERROR] interval must be one of {}'.format(INTERVALS))
+    if n_resamples < 2 or batch_size < 1:
+        raise ValueError('[ERROR] n_resamples and batch_size must be positive')
+    x = _check_matrix(x, 'x').astype(np.float64)
+    y = _check_matrix(y, 'y').astype(np.float64)
+    if x.shape != y.shape:
+        raise ValueError('[ERROR] x and y must be of the same shape')
+    m = x.shape[1]
+    rng = np.random.default_rng(seed)
+
+    with threads():
+        statistic = _row_coefs(method, x.mean(axis=1)[None],
+                               y.mean(axis=1)[None], decreasing)[0]
+        distribution = np.empty(n_resamples)
+        for start in range(0, n_resamples, batch_size):
+            size = min(batch_size, n_resamples - start)
+            # number of times every topic is drawn in every resample
+            idx = rng.integers(0, m, (size, m))
+            idx += m * np.arange(size)[:, None]
+            w = np.bincount(idx.ravel(), minlength=size * m)
+            w = w.reshape(size, m) / m
+            distribution[start:start+size] = _row_coefs(method, w @ x.T,
+                                                        w @ y.T, decreasing)
+
+        alpha = 1 - confidence
+        if interval == 'percentile':
+            low, high = _percentile(distribution, alpha)
+        else:
+            # leave every topic out once
+            jx = (x.sum(axis=1) - x.T) / (m - 1)
+            jy = (y.sum(axis=1) - y.T) / (m - 1)
+            jackknife = _row_coefs(method, jx, jy, decreasing)
+            low, high = _bca(distribution, statistic, jackknife, alpha)
+
+    return BootstrapResult(float(statistic), float(low), float(high),
+                           float(distribution.std(ddof=1)), distribution)
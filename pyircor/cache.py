@@ -0,0 +1,327 @@
+"""
+Memoization of the Coefficient Functions
+
+Opt-in cache in front of the coefficient functions of `pyircor.tau` and
+`pyircor.tauap`, for applications computing the same correlations over and
+over, as dashboards do when reports are reopened. While a cache is enabled,
+every call is keyed on a digest of the contents of `x` and `y` (BLAKE2 of their
+buffers, dtypes and shapes) and on the other parameters, so that equal vectors
+hit the cache whatever the objects holding them:
+
+    cache.enable(max_entries=10000, max_bytes=2**30,
+                 directory='/var/cache/pyircor')
+    tauap_b(x, y)  # computed
+    tauap_b(x.copy(), y)  # from the cache
+    cache.get_cache().stats()
+
+Two kinds of entries share the cache, evicted in least recently used order once
+there are more than `max_entries` of them or they take more than `max_bytes`:
+
+- results, the value returned for a key,
+- rank views, a `RankedVector` of a copy of every plain vector the cache has
+  seen, so that a new pairing of known vectors is not ranked again.
+
+With a `directory`, results are also saved there, one JSON file per key, and
+read back by any process using the same directory. Only the coefficient, or
+the fields of an `Estimate`, are stored, so that reading a file shared with
+other users never runs code from it. The directory is not bounded, see
+`Cache.clear`. Calls that raise are not cached, and neither are calls with
+`validate=False`, whose inputs are not checked, nor estimates with
+`approximate=True` and no `seed`, which are random. Vectors of other than
+numeric dtypes are passed through, to be rejected by the function itself.
+"""
+
+import collections
+import contextlib
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+
+from . import __version__
+from .approximate import Estimate
+from .ranks import RankedVector, as_ranked
+
+
+_CACHE = None
+
+STATS = ('hits', 'disk_hits', 'misses', 'rank_hits', 'rank_misses',
+         'evictions')
+
+
+def _digest(v):
+    """Digest of the contents of a vector, or None if it cannot be cached"""
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(v, RankedVector):
+        h.update(b'ranked decreasing' if v.decreasing else
+                 b'ranked increasing')
+        a = v.values
+    else:
+        a = np.asarray(v)
+        if a.dtype.kind not in 'biuf':
+            return None
+    h.update(a.dtype.str.encode())
+    h.update(str(a.shape).encode())
+    h.update(np.ascontiguousarray(a).data)
+    return h.hexdigest()
+
+
+def _ranked_nbytes(r):
+    return sum(getattr(r, s).nbytes for s in RankedVector.__slots__
+               if isinstance(getattr(r, s), np.ndarray))
+
+
+class Cache:
+    """Bounded LRU cache of results and rank views, see `enable`
+
+    Inputs:
+        max_entries (int): maximum number of entries kept in memory
+        max_bytes (int): maximum memory of the entries, in bytes
+        directory (str or None): directory persisting the results, or None
+    """
+
+    def __init__(self, max_entries=4096, max_bytes=2 ** 28, directory=None):
+        if not isinstance(max_entries, int) or max_entries < 1:
+            raise ValueError('[ERROR] max_entries must be a positive integer')
+        if not isinstance(max_bytes, int) or max_bytes < 1:
+            raise ValueError('[ERROR] max_bytes must be a positive integer')
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self._entries = collections.OrderedDict()  # key -> (value, nbytes)
+        self._nbytes = 0
+        self._stats = dict.fromkeys(STATS, 0)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'Cache(max_entries={}, max_bytes={}, directory={!r})'.format(
+            self.max_entries, self.max_bytes, self.directory)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _put(self, key, value, nbytes):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self._nbytes += nbytes
+            # the entry just put is kept, even if it is larger than the budget
+            while len(self._entries) > 1 and (
+                    len(self._entries) > self.max_entries or
+                    self._nbytes > self.max_bytes):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._nbytes -= evicted
+                self._stats['evictions'] += 1
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def _load(self, key):
+        try:
+            with open(self._disk_path(key)) as f:
+                data = json.load(f)
+            if 'estimate' in data:
+                return Estimate(float(data['estimate']),
+                                float(data['half_width']),
+                                int(data['n_samples']))
+            return float(data['value'])
+        except (OSError, ValueError, TypeError, KeyError):
+            return None  # missing, partial or foreign files are misses
+
+    def _save(self, key, value):
+        if isinstance(value, Estimate):
+            data = dict(value._asdict())
+        else:
+            data = {'value': float(value)}
+        path = self._disk_path(key)
+        tmp = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def _ranked(self, v, digest, decreasing, arg_str):
+        """`RankedVector` of a plain vector, from the cache or ranked now"""
+        key = 'ranks:{}:{}'.format(digest, int(decreasing))
+        r = self._get(key)
+        if r is not None:
+            self._count('rank_hits')
+            return key, r
+        self._count('rank_misses')
+        # a copy, as the caller may modify the vector once it is cached
+        return key, as_ranked(np.array(v), decreasing, arg_str)
+
+    def call(self, name, signature, func, args, kwargs):
+        """Result of `func(*args, **kwargs)`, from the cache or computed"""
+        extra = {}
+        if 'validate' in kwargs and 'validate' not in signature.parameters:
+            # taken by the `ranks.ranked_inputs` wrapper, not the function
+            # itself
+            extra['validate'] = kwargs.pop('validate')
+        try:
+            bound = signature.bind(*args, **kwargs)
+        except TypeError:
+            return func(*args, **kwargs, **extra)  # let the function raise
+        bound.apply_defaults()
+        # every parameter by keyword, as the wrappers look for some of them
+        # there
+        params = dict(bound.arguments, **extra)
+        x = params.pop('x')
+        y = params.pop('y')
+        # unvalidated inputs may not satisfy the checks a later call has to
+        # make
+        if not params.get('validate', True):
+            return func(x, y, **params)
+        dx = _digest(x)
+        dy = _digest(y)
+        if dx is None or dy is None or (params.get('approximate') and
+                                        params.get('seed') is None):
+            return func(x, y, **params)
+
+        # the version and kernel too, as the files outlive both
+        key = hashlib.blake2b('{}:{}:{}:{}:{}:{}'.format(
+            __version__, name, params.get('method'), sorted(params.items()),
+            dx, dy).encode(), digest_size=16).hexdigest()
+        out = self._get(key)
+        if out is not None:
+            self._count('hits')
+            return out
+        if self.directory is not None:
+            out = self._load(key)
+            if out is not None:
+                self._count('disk_hits')
+                self._put(key, out, sys.getsizeof(out))
+                return out
+        self._count('misses')
+
+        # orientation of the rank views: that of a ranked argument, as the
+        # functions check it against `decreasing` or, for tau, adopt it
+        ranked_args = [v for v in (x, y) if isinstance(v, RankedVector)]
+        if ranked_args:
+            decreasing = ranked_args[0].decreasing
+        else:
+            decreasing = params.get('decreasing', False)
+        ranked = []
+        if not isinstance(x, RankedVector):
+            ranked.append(self._ranked(x, dx, decreasing, 'x'))
+            x = ranked[-1][1]
+        if not isinstance(y, RankedVector):
+            ranked.append(self._ranked(y, dy, decreasing, 'y'))
+            y = ranked[-1][1]
+        out = func(x, y, **params)
+
+        # after the call, to count the views it computed
+        for rank_key, r in ranked:
+            self._put(rank_key, r, _ranked_nbytes(r))
+        self._put(key, out, sys.getsizeof(out))
+        if self.directory is not None:
+            self._save(key, out)
+        return out
+
+    def stats(self):
+        """Hit and miss counts, and current size
+
+        Returns:
+            dict: the number of results found in memory (hits) or on disk
+                  (disk_hits), computed (misses), of vectors whose rank views
+                  were found (rank_hits) or computed (rank_misses), of entries
+                  evicted, and the number of entries and bytes in memory.
+        """
+        with self._lock:
+            out = dict(self._stats)
+            out['entries'] = len(self._entries)
+            out['nbytes'] = self._nbytes
+        return out
+
+    def clear(self, disk=False):
+        """Remove every entry in memory, and optionally the results on disk
+
+        Inputs:
+            disk (bool): whether to also remove the results in `directory`
+        """
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            self._stats = dict.fromkeys(STATS, 0)
+        if disk and self.directory is not None:
+            for f in os.listdir(self.directory):
+                if f.endswith('.json'):
+                    os.remove(os.path.join(self.directory, f))
+
+
+def enable(max_entries=4096, max_bytes=2 ** 28, directory=None):
+    """Cache the coefficient functions, replacing any cache already enabled
+
+    Inputs:
+        max_entries (int): maximum number of entries kept in memory
+        max_bytes (int): maximum memory of the entries, in bytes
+        directory (str or None): directory persisting the results, or None
+
+    Returns:
+        Cache: the cache enabled.
+    """
+    global _CACHE
+    _CACHE = Cache(max_entries, max_bytes, directory)
+    return _CACHE
+
+
+def disable():
+    """Stop caching the coefficient functions, dropping the cache in memory"""
+    global _CACHE
+    _CACHE = None
+
+
+def get_cache():
+    """Cache enabled, or None"""
+    return _CACHE
+
+
+@contextlib.contextmanager
+def caching(max_entries=4096, max_bytes=2 ** 28, directory=None):
+    """Context manager caching the calls within it, see `enable`
+
+    Returns:
+        Cache: the cache enabled within the context.
+    """
+    global _CACHE
+    prev = _CACHE
+    cache = enable(max_entries, max_bytes, directory)
+    try:
+        yield cache
+    finally:
+        _CACHE = prev
+
+
+def cached(name):
+    """Decorator serving the calls of a coefficient function from the cache"""
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = _CACHE
+            if cache is None:
+                return func(*args, **kwargs)
+            return cache.call(name, signature, func, args, kwargs)
+        return wrapper
+    return decorator
@@ -1,19 +1,30 @@
 import numpy as np
-from collections import Iterable
+from collections.abc import Iterable
 
+from .instrument import stage
 
-def is_numeric(obj):
-    # from https://stackoverflow.com/a/500908
-    attrs = ['__add__', '__sub__', '__mul__', '__truediv__', '__pow__']
-    return all(hasattr(obj, attr) for attr in attrs)
 
+# dtypes the kernels are specialised for, other numeric inputs are cast to
+# float64
+KERNEL_DTYPES = (np.int32, np.int64, np.float32, np.float64)
 
+
+def as_kernel_array(x):
+    """View `x` as an array of one of `KERNEL_DTYPES`, copying if needed"""
+    x = np.asarray(x)
+    if x.dtype.type not in KERNEL_DTYPES:
+        x = x.astype(np.float64)
+    return x
+
+
+@stage('validation')
 def _check_types(x, arg_str):
     bad = False
     if isinstance(x, Iterable):
-        x = np.array(x)
-        if is_numeric(x) and x.size > 1:
-            pass
+        # no copy for arrays, including non-contiguous views
+        x = np.asarray(x)
+        if x.dtype.kind in 'biuf' and x.ndim == 1 and x.size > 1:
+            x = as_kernel_array(x)
         else:
             bad = True
     else:
@@ -24,53 +35,3 @@ def _check_types(x, arg_str):
             '[ERROR] input {} must be a numeric vector'.format(arg_str)
         )
     return x
-
-
-def check_types(x, y):
-    x = _check_types(x, 'x')
-    y = _check_types(y, 'y')
-    if len(x) != len(y):
-        raise ValueError('[ERROR] x and y must be of the same length')
-    return x, y
-
-
-def has_ties(x):
-    return len(x) != len(set(x))
-
-
-def check(x, y):
-    x, y = check_types(x, y)
-    if has_ties(x):
-        raise ValueError('[ERROR] x contains ties')
-    if has_ties(y):
-        raise ValueError('[ERROR] y contains ties.')
-    return x, y
-
-
-def check_a(x, y):
-    x, y = check_types(x, y)
-    if has_ties(x):
-        raise ValueError('[ERROR] x contains ties')
-    return x, y
-
-
-def check_b(x, y):
-    return check_types(x, y)
-
-
-def check_inputs(check_type='default'):
-    def real_check_inputs(func):
-        def wrapper(x, y, decreasing=True, *args, **kwargs):
-            if check_type == 'default':
-                x, y = check(x, y)
-            elif check_type == 'a':
-                x, y = check_a(x, y)
-            elif check_type == 'b':
-                x, y = check_b(x, y)
-
-            if decreasing:
-                return func(-x, -y, decreasing=False, *args, **kwargs)
-            else:
-                return func(x, y, *args, **kwargs)
-        return wrapper
-    return real_check_inputs
@@ -0,0 +1,444 @@
+"""
+Command Line Interface
+
+Correlations between the rankings of systems in per-topic evaluation files,
+that is the output of `trec_eval -q`, with one file per system and lines of the
+form
+
+    measure    topic    value
+
+The system is named after the `runid` line of its file, or the file name
+otherwise, and the `all` lines are ignored in favour of the mean over the
+topics evaluated for every system. Rankings are taken either per measure, of
+the systems by their mean score (`--by measure`), or per topic, of the systems
+by their score on a single measure (`--by topic`), and the coefficient is
+computed between every pair of rankings (`pyircor matrix`) or between a
+reference and every ranking (`pyircor reference`):
+
+    pyircor matrix evals/ --method tauap_b -o matrix.csv
+    pyircor reference evals/ --by topic --measure map --reference all \\
+        -o topics.npy
+
+Raw TREC run files are not supported, as runs rank different documents:
+evaluate them first, and correlate the resulting rankings of systems.
+
+Files are parsed line by line in a pool of worker processes, which send back
+the scores of the measures given with `--measure`, or of every measure
+otherwise. Each file is reduced as it arrives: the scores of a system are kept
+as one vector per measure, over the topics of that measure, and without
+`--measure` only the measures evaluated for every system so far are kept.
+
+The coefficients are computed by the same workers, in blocks of rankings read
+from memory-mapped scratch files, where `pyircor matrix` also saves the rank
+views of the rankings, validated and ranked once. Every worker is started, and
+its kernels loaded or compiled, once for the whole command; workers are spawned
+rather than forked, as the thread pools of the numba kernels do not survive a
+fork. Each worker runs its kernels on a single thread, so that `--jobs` bounds
+the cores used.
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import glob
+import multiprocessing
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from . import config
+from .config import threads
+from .matrix import (MEASURES, _check_matrix, _check_measure, _corr_pairs,
+                     _rank_checked, _rank_rows, corr_batch)
+
+
+# rankings and rank views every worker maps, kept across the tasks of a command
+_WORKER = {}
+
+VIEWS = ('order', 'mins', 'dense')
+
+
+def parse_eval_file(path, measures=None):
+    """Scores of a per-topic evaluation file, as written by `trec_eval -q`
+
+    Inputs:
+        path (str): path of the file
+        measures (Iterable of str or None): measures to keep, or all of them
+
+    Returns:
+        str: name of the system, from the `runid` line or the file name
+        dict: {measure: {topic: score}} of the kept measures.
+    """
+    keep = None if measures is None else set(measures)
+    name = os.path.basename(path)
+    scores = {}
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            fields = line.split()
+            if not fields:
+                continue
+            if len(fields) != 3:
+                raise ValueError(
+                    '[ERROR] {}:{}: expected 3 fields, found {}'.format(
+                        path, number, len(fields)))
+            measure, topic, value = fields
+            if measure == 'runid':
+                name = value
+            elif topic != 'all' and (keep is None or measure in keep):
+                try:
+                    scores.setdefault(measure, {})[topic] = float(value)
+                except ValueError:
+                    continue  # non-numeric measures, such as relstring
+    return name, scores
+
+
+def _init_worker(method, decreasing):
+    """Run the kernels on one thread, and load them once for every task"""
+    config.set_config(n_jobs=1)
+    # the signatures of the tasks: the rankings and their views are read-only
+    # maps for `_corr_rows`, the reference and rows are copies for
+    # `_corr_reference`
+    X = np.vstack([np.arange(4.), np.arange(4.)[::-1]])
+    corr_batch(X[0], X, method, decreasing)
+    args = (X,) + _rank_rows(X, decreasing)
+    for a in args:
+        a.flags.writeable = False
+    idx = np.arange(2, dtype=np.int64)
+    _corr_pairs(_check_measure(method)[1], *args, idx, idx, decreasing)
+
+
+def _load(scratch, names):
+    """Arrays `names` of the scratch directory, mapped once per worker"""
+    if _WORKER.get('scratch') != scratch:
+        _WORKER.clear()
+        _WORKER['scratch'] = scratch
+    for name in names:
+        if name not in _WORKER:
+            # plain arrays over the maps, which numba takes as read-only
+            _WORKER[name] = np.asarray(np.load(
+                os.path.join(scratch, name + '.npy'), mmap_mode='r'))
+    return [_WORKER[name] for name in names]
+
+
+def _corr_rows(scratch, rows, method, decreasing):
+    """Coefficients between the rankings `rows` and every ranking
+
+    The rankings are those of the scratch directory, with the rank views saved
+    by `_correlate`, so that no task ranks them again. For the symmetric
+    coefficients only the pairs of the upper triangle are computed, and the
+    rest of the rows is left to `_correlate` to mirror.
+    """
+    args = _load(scratch, ('rankings',) + VIEWS)
+    _, code, symmetric = _check_measure(method)
+    m = len(args[0])
+    rows_idx = np.repeat(np.asarray(rows, np.int64), m)
+    cols_idx = np.tile(np.arange(m, dtype=np.int64), len(rows))
+    out = np.zeros(len(rows_idx))
+    upper = slice(None)
+    if symmetric:
+        upper = cols_idx >= rows_idx
+        rows_idx = rows_idx[upper]
+        cols_idx = cols_idx[upper]
+    elif method == 'tauap_b':
+        # both directions, averaged as `matrix.corr_matrix`
+        rows_idx, cols_idx = (np.concatenate([rows_idx, cols_idx]),
+                              np.concatenate([cols_idx, rows_idx]))
+    with threads():
+        vals = _corr_pairs(code, *args, rows_idx, cols_idx, decreasing)
+    if method == 'tauap_b':
+        vals = (vals[:len(vals) // 2] + vals[len(vals) // 2:]) / 2
+    out[upper] = vals
+    return rows, out.reshape(len(rows), m)
+
+
+def _corr_reference(scratch, rows, reference, method, decreasing):
+    """Coefficients between a reference ranking and the rankings `rows`"""
+    X, = _load(scratch, ('rankings',))
+    return rows, corr_batch(reference, X[rows], method, decreasing)
+
+
+def _expand(paths, pattern):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(f for f in glob.glob(os.path.join(path,
+                                                                  pattern))
+                                if os.path.isfile(f)))
+        else:
+            files.append(path)
+    return files
+
+
+class _Progress:
+    """Counts of the work done, rewritten in place on stderr"""
+
+    def __init__(self, quiet):
+        self.quiet = quiet
+
+    def __call__(self, what, done, total):
+        # about a hundred updates, whatever the total
+        if self.quiet or (done % max(1, total // 100) and done != total):
+            return
+        end = '\n' if done == total else ''
+        print('\r{} {}/{}'.format(what, done, total), end=end, file=sys.stderr,
+              flush=True)
+
+
+class _Scores:
+    """Per-topic scores of every system, reduced as the files are parsed
+
+    Inputs:
+        measures (list of str or None): measures to keep, or those evaluated
+                                        for every system
+
+    Attributes:
+        topics (dict): {measure: {topic: column}} of every topic seen
+        systems (dict): {system: {measure: np.ndarray}} of the scores, by
+                        column of the topic and NaN for the missing ones
+    """
+
+    def __init__(self, measures):
+        self.measures = None if measures is None else list(measures)
+        self.common = None if measures is None else set(measures)
+        self.topics = {}
+        self.systems = {}
+
+    def add(self, name, scores):
+        if name in self.systems:
+            raise ValueError('[ERROR] system {} appears twice'.format(name))
+        if self.measures is None:
+            common = set(scores)
+            if self.common is not None:
+                common &= self.common
+            # measures another system misses are never ranked
+            for dropped in (self.common or set()) - common:
+                del self.topics[dropped]
+                for kept in self.systems.values():
+                    del kept[dropped]
+            self.common = common
+
+        kept = {}
+        for measure in self.common & set(scores):
+            columns = self.topics.setdefault(measure, {})
+            for topic in scores[measure]:
+                columns.setdefault(topic, len(columns))
+            v = np.full(len(columns), np.nan)
+            v[[columns[t] for t in scores[measure]]] = list(
+                scores[measure].values())
+            kept[measure] = v
+        self.systems[name] = kept
+
+    def _matrix(self, measure, names):
+        """(systems, topics) scores of the topics evaluated for every system,
+        and those topics, sorted"""
+        columns = self.topics.get(measure, {})
+        M = np.full((len(names), len(columns)), np.nan)
+        for k, s in enumerate(names):
+            v = self.systems[s].get(measure, [])
+            M[k, :len(v)] = v
+        topics = sorted(t for t, c in columns.items()
+                        if not np.isnan(M[:, c]).any())
+        return M[:, [columns[t] for t in topics]], topics
+
+    def rankings(self, by):
+        """(rankings, systems) matrix of scores, with the labels of the
+        rankings and the names of the systems"""
+        names = sorted(self.systems)
+        if not names:
+            raise ValueError('[ERROR] no evaluation files')
+        measures = self.measures
+        if measures is None:
+            measures = sorted(self.common)
+        if not measures:
+            raise ValueError(
+                '[ERROR] no measure is evaluated for every system')
+
+        if by == 'measure':
+            rows = []
+            for measure in measures:
+                M, topics = self._matrix(measure, names)
+                if not topics:
+                    raise ValueError('[ERROR] no topic of {} is evaluated for '
+                                     'every system'.format(measure))
+                rows.append(M.mean(axis=1))
+            return np.array(rows), list(measures), names
+
+        if len(measures) != 1:
+            raise ValueError('[ERROR] --by topic needs a single --measure')
+        M, topics = self._matrix(measures[0], names)
+        if not topics:
+            raise ValueError('[ERROR] no topic is evaluated for every system')
+        return M.T.copy(), topics, names
+
+
+def _parse_all(pool, files, measures, jobs, progress):
+    scores = _Scores(measures)
+    if pool is None:
+        results = (parse_eval_file(f, measures) for f in files)
+    else:
+        results = pool.map(parse_eval_file, files, [measures] * len(files),
+                           chunksize=max(1, len(files) // (64 * jobs)))
+    for done, (name, system) in enumerate(results, 1):
+        scores.add(name, system)
+        progress('parsed', done, len(files))
+    return scores
+
+
+def _blocks(n, jobs):
+    # strided, so that the blocks take as long with a triangle of pairs
+    count = min(n, 4 * jobs)
+    return [list(range(i, n, count)) for i in range(count)]
+
+
+def _correlate(pool, X, labels, args, progress):
+    if args.command == 'reference':
+        if args.reference == 'all' and args.by == 'topic':
+            reference = X.mean(axis=0)
+        elif args.reference in labels:
+            reference = X[labels.index(args.reference)]
+        else:
+            raise ValueError(
+                '[ERROR] unknown reference {}'.format(args.reference))
+        out = np.empty(len(X))
+    else:
+        out = np.empty((len(X), len(X)))
+
+    decreasing = not args.increasing
+    blocks = _blocks(len(X), args.jobs)
+    with tempfile.TemporaryDirectory(prefix='pyircor-') as scratch:
+        if args.command == 'reference':
+            np.save(os.path.join(scratch, 'rankings.npy'), X)
+            tasks = [(_corr_reference, scratch, rows, reference, args.method,
+                      decreasing) for rows in blocks]
+        else:
+            # validated and ranked once, here, rather than by every task
+            check_type, _, _ = _check_measure(args.method)
+            X = _check_matrix(X, 'X')
+            with threads():
+                views = _rank_checked(X, check_type, 'X', decreasing)
+            for name, a in zip(('rankings',) + VIEWS, (X,) + views):
+                np.save(os.path.join(scratch, name + '.npy'), a)
+            tasks = [(_corr_rows, scratch, rows, args.method, decreasing)
+                     for rows in blocks]
+
+        if pool is None:
+            results = (task[0](*task[1:]) for task in tasks)
+        else:
+            results = concurrent.futures.as_completed(
+                [pool.submit(*task) for task in tasks])
+        for done, res in enumerate(results, 1):
+            rows, values = res if pool is None else res.result()
+            out[rows] = values
+            progress('correlated', done, len(tasks))
+    if args.command == 'matrix' and _check_measure(args.method)[2]:
+        lower = np.tril_indices(len(out), -1)
+        out[lower] = out.T[lower]
+    return out
+
+
+def _write(out, labels, args):
+    if args.output is not None and args.output.endswith('.npy'):
+        np.save(args.output, out)
+        return
+    if args.output in (None, '-'):
+        f = sys.stdout
+    else:
+        f = open(args.output, 'w', newline='')
+    try:
+        writer = csv.writer(f)
+        if out.ndim == 1:
+            writer.writerow(['ranking', args.method])
+            for label, value in zip(labels, out):
+                writer.writerow([label, repr(float(value))])
+        else:
+            writer.writerow([''] + labels)
+            for label, row in zip(labels, out):
+                writer.writerow([label] + [repr(float(v)) for v in row])
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        prog='pyircor',
+        description='Rank correlations between the rankings of systems in '
+                    'per-topic evaluation files (trec_eval -q).')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    matrix = commands.add_parser(
+        'matrix', help='coefficient between every pair of rankings')
+    reference = commands.add_parser(
+        'reference', help='coefficient between a reference and every ranking')
+    reference.add_argument('--reference', required=True,
+                           help="label of the reference ranking, a measure, a "
+                                "topic, or 'all' for the mean over topics "
+                                "with --by topic")
+    for sub in (matrix, reference):
+        sub.add_argument('paths', nargs='+',
+                         help='evaluation files, or directories of them')
+        sub.add_argument('--pattern', default='*',
+                         help='files to read in the directories (default: '
+                              'all)')
+        sub.add_argument('--measure', nargs='+', dest='measures',
+                         help='measures to rank by (default: all those '
+                              'evaluated for every system)')
+        sub.add_argument('--by', choices=('measure', 'topic'),
+                         default='measure',
+                         help='one ranking per measure, by mean score, or per '
+                              'topic (default: measure)')
+        sub.add_argument('--method', choices=tuple(MEASURES),
+                         default='tauap_b',
+                         help='coefficient (default: tauap_b)')
+        sub.add_argument('--increasing', action='store_true',
+                         help='lower scores rank first')
+        sub.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                         help='worker processes (default: all cores)')
+        sub.add_argument('-o', '--output',
+                         help='.csv or .npy file (default: CSV on stdout)')
+        sub.add_argument('-q', '--quiet', action='store_true',
+                         help='do not report progress on stderr')
+    return parser
+
+
+def main(argv=None):
+    """Entry point of the `pyircor` command
+
+    Inputs:
+        argv (list of str or None): arguments, or those of the process
+
+    Returns:
+        int: exit status.
+    """
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error('--jobs must be positive')
+    files = _expand(args.paths, args.pattern)
+    progress = _Progress(args.quiet)
+
+    pool = None
+    if args.jobs > 1:
+        pool = concurrent.futures.ProcessPoolExecutor(
+            args.jobs, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(args.method, not args.increasing))
+    try:
+        scores = _parse_all(pool, files, args.measures, args.jobs,
+                            progress)
+        X, labels, _ = scores.rankings(args.by)
+        out = _correlate(pool, X, labels, args, progress)
+    except (OSError, ValueError) as e:
+        print('pyircor: {}'.format(e), file=sys.stderr)
+        return 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    _write(out, labels, args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+All Coefficients at Once
+
+`all_coefficients` computes the six coefficients of `pyircor.tau` and
+`pyircor.tauap` together, sharing the validation and ranking of both vectors
+and two walks over a binary indexed tree, one in the order of each vector. The
+raw pair counts are returned as well, so that results over shards of the same
+items can be aggregated exactly.
+
+Coefficients that are not defined for the inputs, as is `tau` when there are
+ties, are NaN instead of raising an error.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .config import threads, use_parallel
+from .ranks import check_ranked
+from .tau import _tau_from_counts, _tau_b_from_counts
+from .tauap import (_concordant_above_parallel, _concordant_discordant_above,
+                    _count_above, _tauap_a_value, _tauap_value)
+
+
+Coefficients = namedtuple('Coefficients', [
+    'tau', 'tau_a', 'tau_b', 'tauap', 'tauap_a', 'tauap_b',
+    'n', 'concordant', 'discordant', 'ties_x', 'ties_y',
+])
+Coefficients.__doc__ = """All coefficients between two vectors, and pair counts
+
+`concordant` and `discordant` count the pairs ordered the same and the opposite
+way in both vectors, and `ties_x` and `ties_y` the pairs tied in `x` and in
+`y`, respectively.
+"""
+
+
+def _pair_counts_above(x, y):
+    """Concordant items above every item of `x`, and total discordant pairs"""
+    if not use_parallel(len(x)):
+        return _concordant_discordant_above(y.dense, x.order, x.mins)
+    with threads():
+        c = _concordant_above_parallel(y.dense, x.order, x.mins)
+        reverse = y.dense[y.order[-1]] - y.dense
+        d = _concordant_above_parallel(reverse, x.order, x.mins).sum()
+    return c, d
+
+
+def all_coefficients(x, y, decreasing=True, validate=True):
+    """All Rank Correlation Coefficients between Two Vectors
+
+    Inputs:
+        x (Iterable of numeric or RankedVector): input vector, the true scores
+                                                 for the `_a` coefficients
+        y (Iterable of numeric or RankedVector): another vector for comparison
+        decreasing (bool): whether items are sorted in decreasing order
+        validate (bool): whether to validate the inputs, or trust them
+
+    Returns:
+        Coefficients: the six coefficients and the raw pair counts.
+    """
+    x, y = check_ranked(x, y, 'b', decreasing, validate)
+    n = len(x)
+
+    # concordant items above every item, in the order of y and of x
+    cx = _count_above(x, y)
+    cy, d = _pair_counts_above(x, y)
+    c = int(cy.sum())
+    d = int(d)
+    tx = int((x.tie_sizes - 1).sum()) // 2
+    ty = int((y.tie_sizes - 1).sum()) // 2
+
+    x_ties = tx > 0
+    y_ties = ty > 0
+    tauap_xy = _tauap_value(cx, y)
+    tau_a = np.nan if x_ties else _tau_from_counts(n, c, d)
+    tauap_a = np.nan if x_ties else _tauap_a_value(cx, y)
+    return Coefficients(
+        tau=np.nan if y_ties else tau_a,
+        tau_a=tau_a,
+        tau_b=_tau_b_from_counts(n, c, d, tx, ty),
+        tauap=np.nan if x_ties or y_ties else tauap_xy,
+        tauap_a=tauap_a,
+        tauap_b=(tauap_xy + _tauap_value(cy, x)) / 2,
+        n=n, concordant=c, discordant=d, ties_x=tx, ties_y=ty,
+    )
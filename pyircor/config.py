@@ -0,0 +1,102 @@
+"""
+Global Configuration
+
+Controls the parallel execution of the kernels. A single correlation switches
+to the parallel kernels when the vectors have at least `parallel_min_n` items
+and more than one thread is available, while `corr_matrix` and `corr_batch`
+always run their pairs in parallel. In every case the number of threads is
+given by `n_jobs`, where negative values count backwards from the number of
+threads numba was started with (-1 for all).
+
+The parallel kernels split the work in blocks whose size does not depend on the
+number of threads and reduce them in a fixed order, so the results are
+bit-identical to the serial ones whatever the number of threads.
+
+`memory_budget` bounds the memory, in bytes, of the out-of-core kernels of
+`pyircor.outofcore`, which keep everything else in scratch files.
+"""
+
+import contextlib
+
+import numba as nb
+
+
+_CONFIG = {
+    'n_jobs': -1,
+    'parallel_min_n': 2 ** 17,
+    'memory_budget': 2 ** 30,
+}
+
+
+def get_config():
+    """Current configuration
+
+    Returns:
+        dict: the values of `n_jobs`, `parallel_min_n` and `memory_budget`.
+    """
+    return dict(_CONFIG)
+
+
+def set_config(n_jobs=None, parallel_min_n=None, memory_budget=None):
+    """Set the global configuration
+
+    Inputs:
+        n_jobs (int): number of threads, negative values count backwards from
+                      the number of threads available (-1 for all)
+        parallel_min_n (int): minimum number of items for a single correlation
+                              to use the parallel kernels
+        memory_budget (int): bytes of memory the out-of-core kernels may use
+    """
+    if n_jobs is not None:
+        if not isinstance(n_jobs, int) or n_jobs == 0:
+            raise ValueError('[ERROR] n_jobs must be a non-zero integer')
+        _CONFIG['n_jobs'] = n_jobs
+    if parallel_min_n is not None:
+        if not isinstance(parallel_min_n, int) or parallel_min_n < 0:
+            raise ValueError(
+                '[ERROR] parallel_min_n must be a non-negative integer')
+        _CONFIG['parallel_min_n'] = parallel_min_n
+    if memory_budget is not None:
+        if not isinstance(memory_budget, int) or memory_budget < 2 ** 20:
+            raise ValueError(
+                '[ERROR] memory_budget must be an integer of at least 1 MiB')
+        _CONFIG['memory_budget'] = memory_budget
+
+
+@contextlib.contextmanager
+def config_context(**kwargs):
+    """Context manager temporarily changing the configuration
+
+    See `set_config` for the accepted keywords.
+    """
+    old = get_config()
+    set_config(**kwargs)
+    try:
+        yield
+    finally:
+        _CONFIG.update(old)
+
+
+def n_threads():
+    """Number of threads the kernels use under the current configuration"""
+    available = nb.config.NUMBA_NUM_THREADS
+    n_jobs = _CONFIG['n_jobs']
+    if n_jobs < 0:
+        n_jobs = available + 1 + n_jobs
+    return max(1, min(n_jobs, available))
+
+
+def use_parallel(n):
+    """Whether a correlation over `n` items should use the parallel kernels"""
+    return n >= _CONFIG['parallel_min_n'] and n_threads() > 1
+
+
+@contextlib.contextmanager
+def threads():
+    """Context manager running numba's parallel regions on `n_threads()`"""
+    prev = nb.get_num_threads()
+    nb.set_num_threads(n_threads())
+    try:
+        yield
+    finally:
+        nb.set_num_threads(prev)
@@ -0,0 +1,224 @@
+"""
+Correlation at Every Cutoff
+
+`tau_curve` and `tauap_curve` compute a coefficient restricted to the top k
+items of `y` for every cutoff k = 1..n, in a single sweep down the ranking of
+`y`, to study how the agreement decays with depth. Element k-1 of the result is
+the coefficient of the top k items, NaN for k = 1.
+
+The cutoffs follow `y`, the ranking whose positions AP correlation weighs:
+every item added by the sweep is below all the items already swept, so the
+positions and the concordant counts of those items do not change. The
+contribution of every item is then fixed once it is reached, counted with the
+same binary indexed tree as `tauap`, and the curve is a cumulative sum, in
+O(n log n) overall. The cutoffs of the reference `x` would not allow this:
+an item added in the order of `x` may fall anywhere in `y`, moving the
+positions of the swept items below it, and the contribution of an item is its
+concordant count divided by its position, which no tree shifts in one update.
+The reverse direction of `tauap_b`, which pivots on `x`, has that problem even
+with the cutoffs of `y`, so it is updated item by item in O(n^2), and
+`tauap_curve` warns from `REVERSE_WARN_N` items on with `tauap_b`.
+
+When `y` contains ties, the top k items are only defined when k falls at the
+end of a tie group, and the curve is NaN at the other cutoffs.
+"""
+
+import warnings
+
+import numba as nb
+import numpy as np
+
+from .matrix import _check_measure
+from .ranks import check_ranked
+from .tauap import _concordant_above, _harmonic
+
+
+TAU_METHODS = ('tau', 'tau_a', 'tau_b')
+TAUAP_METHODS = ('tauap', 'tauap_a', 'tauap_b')
+
+# length from which the O(n^2) curve of `tauap_b` takes seconds
+REVERSE_WARN_N = 2 ** 14
+
+
+@nb.njit(cache=True)
+def _tau_sweep(dx, oy, py):
+    """Cumulative pair counts of the top k items of `y`, for every k
+
+    Items are walked in the order `oy` of `y`, one tie group at a time, and the
+    pairs of every item with the items above it are counted with a binary
+    indexed tree over the dense ranks `dx`, as in `tauap._concordant_above`.
+    """
+    n = len(dx)
+    tree = np.zeros(n + 1, np.int64)
+    seen_x = np.zeros(n, np.int64)  # swept items in every tie group of x
+    c = np.empty(n, np.int64)
+    d = np.empty(n, np.int64)
+    tx = np.empty(n, np.int64)
+    ty = np.empty(n, np.int64)
+    c_k = d_k = tx_k = ty_k = 0
+    k = 0
+    while k < n:
+        g = k + 1
+        while g < n and py[oy[g]] == py[oy[k]]:
+            g += 1
+
+        for m in range(k, g):
+            i = oy[m]
+            # items above in y that are above, or tied with, the item in x
+            lt = 0
+            r = dx[i]
+            while r > 0:
+                lt += tree[r]
+                r -= r & -r
+            le = 0
+            r = dx[i] + 1
+            while r > 0:
+                le += tree[r]
+                r -= r & -r
+            c_k += lt
+            d_k += k - le
+            tx_k += seen_x[dx[i]]
+            ty_k += m - k
+            seen_x[dx[i]] += 1
+            c[m] = c_k
+            d[m] = d_k
+            tx[m] = tx_k
+            ty[m] = ty_k
+
+        for m in range(k, g):
+            r = dx[oy[m]] + 1
+            while r <= n:
+                tree[r] += 1
+                r += r & -r
+        k = g
+    return c, d, tx, ty
+
+
+@nb.njit(cache=True, error_model='numpy')
+def _tauap_reverse_sweep(dx, oy, py):
+    """tauap pivoting on `x` of the top k items of `y`, for every k
+
+    Every item added by the sweep is concordant with none of the swept items,
+    which are above it in `y`, but is above some of them in `x`, so their
+    positions in `x` are updated one by one.
+    """
+    n = len(dx)
+    p = np.zeros(n, np.int64)  # swept items above, in x, every swept item
+    c = np.zeros(n, np.int64)  # of which also above in y
+    out = np.full(n, np.nan)
+    k = 0
+    while k < n:
+        g = k + 1
+        while g < n and py[oy[g]] == py[oy[k]]:
+            g += 1
+
+        for m in range(k, g):
+            i = oy[m]
+            for q in range(k):
+                j = oy[q]
+                if dx[j] < dx[i]:
+                    p[m] += 1
+                    c[m] += 1
+                elif dx[i] < dx[j]:
+                    p[q] += 1
+            for q in range(k, g):
+                if dx[oy[q]] < dx[i]:
+                    p[m] += 1
+
+        numerator = 0.
+        n_not_top = 0
+        for q in range(g):
+            if p[q] > 0:
+                numerator += c[q] / p[q]
+                n_not_top += 1
+        out[g-1] = (2 * numerator / n_not_top) - 1
+        k = g
+    return out
+
+
+def _group_ends(y):
+    """Whether every position of `y` ends a tie group, that is, a cutoff"""
+    py = y.mins[y.order]
+    return np.r_[py[1:] != py[:-1], True]
+
+
+def tau_curve(x, y, method='tau', decreasing=True):
+    """Kendall Rank Correlation of the Top k Items of `y`, for Every k
+
+    Inputs:
+        x (Iterable of numeric or RankedVector): input vector, the true scores
+                                                 for `tau_a`
+        y (Iterable of numeric or RankedVector): another vector for comparison,
+                                                 whose top k items are kept
+        method (str): coefficient to compute, 'tau', 'tau_a' or 'tau_b'
+        decreasing (bool): whether items are sorted in decreasing order
+
+    Returns:
+        np.ndarray: (n,) vector with the coefficient of the top k items at k-1.
+    """
+    if method not in TAU_METHODS:
+        raise ValueError(
+            '[ERROR] method must be one of {}'.format(TAU_METHODS))
+    check_type, _, _ = _check_measure(method)
+    x, y = check_ranked(x, y, check_type, decreasing)
+    c, d, tx, ty = _tau_sweep(x.dense, y.order, y.mins)
+    k = np.arange(1, len(x) + 1)
+    nn = k * (k - 1) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if method == 'tau_b':
+            out = (c - d) / np.sqrt(nn - tx) / np.sqrt(nn - ty)
+        else:
+            out = (c - d) / nn
+    out[0] = np.nan
+    out[~_group_ends(y)] = np.nan
+    return out
+
+
+def tauap_curve(x, y, method='tauap', decreasing=True):
+    """AP Rank Correlation of the Top k Items of `y`, for Every k
+
+    Inputs:
+        x (Iterable of numeric or RankedVector): input vector, the true scores
+                                                 for `tauap_a`
+        y (Iterable of numeric or RankedVector): another vector for comparison,
+                                                 whose top k items are kept
+        method (str): coefficient to compute, 'tauap', 'tauap_a' or 'tauap_b'
+        decreasing (bool): whether items are sorted in decreasing order
+
+    Returns:
+        np.ndarray: (n,) vector with the coefficient of the top k items at k-1.
+
+    The curve of `tauap_b` takes O(n^2) time, see the module.
+    """
+    if method not in TAUAP_METHODS:
+        raise ValueError(
+            '[ERROR] method must be one of {}'.format(TAUAP_METHODS))
+    check_type, _, _ = _check_measure(method)
+    x, y = check_ranked(x, y, check_type, decreasing)
+    n = len(x)
+    # per-item counts and tie groups, in the order of y
+    c = _concordant_above(x.dense, y.order, y.mins)[y.order]
+    p = y.mins[y.order]
+    k = np.arange(1, n + 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if method == 'tauap_a':
+            t = y.tie_sizes[y.order]
+            h = _harmonic(n)
+            # as in `tauap._tauap_a_chunk`, averaged over the group positions
+            within = ((t - 1) - p * (h[p + t - 1] - h[p])) / 2
+            above = np.where(p > 0,
+                             c * (h[p + t - 1] - h[np.maximum(p - 1, 0)]), 0)
+            out = 2 / (k - 1) * np.cumsum((within + above) / t) - 1
+        else:
+            out = 2 * np.cumsum(np.where(p > 0, c / np.maximum(p, 1), 0))
+            out = out / np.cumsum(p > 0) - 1
+            if method == 'tauap_b':
+                if n >= REVERSE_WARN_N:
+                    warnings.warn(
+                        'the tauap_b curve takes O(n^2) time, here with n = {}'
+                        .format(n), RuntimeWarning, stacklevel=2)
+                reverse = _tauap_reverse_sweep(x.dense, y.order, y.mins)
+                out = (out + reverse) / 2
+    out[0] = np.nan
+    out[~_group_ends(y)] = np.nan
+    return out
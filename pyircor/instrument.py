@@ -0,0 +1,244 @@
+"""
+Instrumentation of the Coefficient Functions
+
+Opt-in timings of where the coefficient functions of `pyircor.tau` and
+`pyircor.tauap` spend their time. While at least one sink is registered, every
+call emits an event with the time spent in
+
+- validation: the type and shape checks of `check`, used by
+  `ranks.check_ranked`,
+- ranking: the rank views of `RankedVector`, including those the tie checks
+  need,
+- kernel: everything else, that is the counting kernels and the coefficient
+  itself,
+
+together with the size of the inputs and their number of tie groups and
+largest tie group. numba compilations are emitted as events too, cache loads
+are not, except with numba older than 0.53, which does not report them. Sinks
+are either callbacks, registered with `add_hook`, or the `Recorder` of
+`record()`, which aggregates the events per function:
+
+    with instrument.record() as rec:
+        run_evaluation()
+    rec.summary()
+
+When no sink is registered, the instrumented functions only check an empty
+list. Events are dicts, emitted from the thread that made the call; a call made
+from within an instrumented call, as `tauap_test` calling `tauap`, emits its
+own event and is also counted in the stages of the outer one.
+"""
+
+import contextlib
+import functools
+import threading
+import time
+
+try:
+    from numba.core import event as nb_event
+except ImportError:  # numba < 0.53, whose compilations are not reported
+    nb_event = None
+
+
+_SINKS = []
+_LOCAL = threading.local()
+_LOCK = threading.Lock()
+
+STAGES = ('validation', 'ranking', 'kernel')
+
+
+def _compile_starts():
+    starts = getattr(_LOCAL, 'compile_starts', None)
+    if starts is None:
+        starts = _LOCAL.compile_starts = []
+    return starts
+
+
+def _emit(event):
+    for sink in list(_SINKS):
+        sink(event)
+
+
+class _CompileListener(object if nb_event is None else nb_event.Listener):
+    """Emits the numba compilations, not those nested in a caller's one"""
+
+    def on_start(self, event):
+        _compile_starts().append(time.perf_counter())
+
+    def on_end(self, event):
+        starts = _compile_starts()
+        seconds = time.perf_counter() - starts.pop()
+        if starts:
+            return  # part of the compilation of the caller
+        dispatcher = event.data['dispatcher']
+        _emit({
+            'event': 'compile',
+            'function': dispatcher.py_func.__qualname__,
+            'module': dispatcher.py_func.__module__,
+            'signature': str(event.data['args']),
+            'seconds': seconds,
+        })
+
+
+_LISTENER = None if nb_event is None else _CompileListener()
+
+
+def add_hook(callback):
+    """Register a callback receiving every event as a dict
+
+    Inputs:
+        callback (callable): function of one argument, the event
+    """
+    with _LOCK:
+        if not _SINKS and _LISTENER is not None:
+            nb_event.register('numba:compile', _LISTENER)
+        _SINKS.append(callback)
+
+
+def remove_hook(callback):
+    """Unregister a callback of `add_hook`
+
+    Inputs:
+        callback (callable): function previously registered
+    """
+    with _LOCK:
+        if callback not in _SINKS:
+            raise ValueError('[ERROR] callback is not registered')
+        _SINKS.remove(callback)
+        if not _SINKS and _LISTENER is not None:
+            nb_event.unregister('numba:compile', _LISTENER)
+
+
+def enabled():
+    """Whether any sink is registered, that is whether calls are recorded"""
+    return bool(_SINKS)
+
+
+def stage(name):
+    """Decorator adding the time of a function to the `name` stage of a call"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _SINKS:
+                return func(*args, **kwargs)
+            calls = getattr(_LOCAL, 'calls', None)
+            if not calls:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                # an outer call also spends this time, in the same stage
+                for call in calls:
+                    call[name] += elapsed
+        return wrapper
+    return decorator
+
+
+def inputs(x, y):
+    """Keep the ranked inputs of the current call, to describe their ties"""
+    if not _SINKS:
+        return
+    calls = getattr(_LOCAL, 'calls', None)
+    if calls and calls[-1]['inputs'] is None:
+        calls[-1]['inputs'] = (x, y)
+
+
+def _describe(prefix, v, event):
+    event['groups_' + prefix] = int(v.dense[v.order[-1]]) + 1
+    event['max_tie_' + prefix] = int(v.tie_sizes.max())
+
+
+def instrumented(name):
+    """Decorator emitting an event for every call of a coefficient function"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _SINKS:
+                return func(*args, **kwargs)
+            calls = getattr(_LOCAL, 'calls', None)
+            if calls is None:
+                calls = _LOCAL.calls = []
+            call = {'validation': 0., 'ranking': 0., 'inputs': None}
+            calls.append(call)
+            start = time.perf_counter()
+            try:
+                out = func(*args, **kwargs)
+            finally:
+                total = time.perf_counter() - start
+                calls.pop()
+
+            event = {
+                'event': 'call',
+                'function': name,
+                'validation': call['validation'],
+                'ranking': call['ranking'],
+                'kernel': max(0., total - call['validation'] -
+                              call['ranking']),
+                'total': total,
+            }
+            # estimates from samples do not rank the inputs, nor does this
+            if call['inputs'] is not None and not kwargs.get('approximate'):
+                x, y = call['inputs']
+                event['n'] = len(x)
+                # after the timings, as these may compute more rank views
+                _describe('x', x, event)
+                _describe('y', y, event)
+            _emit(event)
+            return out
+        return wrapper
+    return decorator
+
+
+class Recorder:
+    """Sink keeping every event, see `record`
+
+    Attributes:
+        events (list of dict): events in the order they were emitted
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, event):
+        self.events.append(event)
+
+    def summary(self):
+        """Aggregate the events per coefficient function
+
+        Returns:
+            dict: for every function, the number of calls, the total seconds
+                  in every stage, and the total items; plus the number and
+                  seconds of the numba compilations under 'compile'.
+        """
+        out = {}
+        compile_ = {'count': 0, 'seconds': 0.}
+        for event in self.events:
+            if event['event'] == 'compile':
+                compile_['count'] += 1
+                compile_['seconds'] += event['seconds']
+                continue
+            agg = out.setdefault(event['function'], dict(
+                {'count': 0, 'total': 0., 'items': 0},
+                **{s: 0. for s in STAGES}))
+            agg['count'] += 1
+            agg['items'] += event.get('n', 0)
+            for key in STAGES + ('total',):
+                agg[key] += event[key]
+        out['compile'] = compile_
+        return out
+
+
+@contextlib.contextmanager
+def record():
+    """Context manager recording the events of the calls within it
+
+    Returns:
+        Recorder: the recorded events and their summary.
+    """
+    recorder = Recorder()
+    add_hook(recorder)
+    try:
+        yield recorder
+    finally:
+        remove_hook(recorder)
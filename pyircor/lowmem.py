@@ -0,0 +1,277 @@
+"""
+Low-memory AP Correlations
+
+`tauap`, `tauap_a` and `tauap_b` for vectors that fit in memory but whose rank
+views do not, as the regular functions keep several int64 views of both vectors
+(order, min and dense ranks, tie group sizes) plus the counts of every item,
+about 80 bytes per item.
+
+Here every call works in four integer buffers: the orders of `x` and `y`, the
+dense ranks of one of them and a binary indexed tree, int32 as long as the
+vectors have less than 2**31 - 1 items. The orders are computed with a merge
+sort of the indices into the buffers, and the items are walked in the order of
+`y`, where the min ranks and tie group sizes are the bounds of the runs of
+equal scores, so that the counts of every item are used as soon as they are
+known instead of being stored. The vectors are neither copied nor negated.
+
+The peak memory of a call is then `Workspace(n).nbytes`, that is 16 bytes per
+item (32 from 2**31 - 1 items), on top of the inputs. A `Workspace` can be
+passed to reuse the buffers across calls, which then allocate nothing
+proportional to n. The results are the same as those of `pyircor.tauap` up to
+rounding, as the sums are taken in a different order.
+"""
+
+import numba as nb
+import numpy as np
+
+from .check import _check_types
+
+
+# indices up to this length fit in int32, and so do the counts of the tree
+INT32_MAX_N = 2 ** 31 - 1
+
+# runs sorted by insertion before merging
+RUN = 16
+
+
+class Workspace:
+    """Reusable buffers of the low-memory kernels
+
+    Inputs:
+        n (int): maximum length of the vectors
+    """
+    __slots__ = ('n', 'order_x', 'order_y', 'dense', 'tree')
+
+    def __init__(self, n):
+        if not isinstance(n, (int, np.integer)) or n < 2:
+            raise ValueError('[ERROR] n must be an integer of at least 2')
+        self.n = int(n)
+        dtype = np.int32 if n < INT32_MAX_N else np.int64
+        self.order_x = np.empty(n, dtype)
+        self.order_y = np.empty(n, dtype)
+        self.dense = np.empty(n, dtype)
+        self.tree = np.empty(n + 1, dtype)
+
+    def __repr__(self):
+        return 'Workspace(n={}, dtype={})'.format(self.n, self.tree.dtype)
+
+    @property
+    def nbytes(self):
+        """int: memory of the buffers, in bytes"""
+        return (self.order_x.nbytes + self.order_y.nbytes + self.dense.nbytes +
+                self.tree.nbytes)
+
+    def _views(self, n):
+        if n > self.n:
+            raise ValueError('[ERROR] the workspace holds {} items, not {}'
+                             .format(self.n, n))
+        return (self.order_x[:n], self.order_y[:n], self.dense[:n],
+                self.tree[:n+1])
+
+
+@nb.njit(cache=True)
+def _before(a, i, j, decreasing):
+    """Whether item i sorts strictly before item j"""
+    if decreasing:
+        return a[i] > a[j]
+    return a[i] < a[j]
+
+
+@nb.njit(cache=True)
+def _argsort_into(a, decreasing, order, tmp):
+    """Stable order of `a`, top item first, into `order`, with scratch `tmp`
+
+    Runs of `RUN` items are sorted by insertion and then merged bottom-up,
+    swapping the roles of `order` and `tmp` at every pass.
+    """
+    n = len(a)
+    for i in range(n):
+        order[i] = i
+    for lo in range(0, n, RUN):
+        hi = min(lo + RUN, n)
+        for k in range(lo + 1, hi):
+            v = order[k]
+            m = k
+            while m > lo and _before(a, v, order[m-1], decreasing):
+                order[m] = order[m-1]
+                m -= 1
+            order[m] = v
+
+    src = order
+    dst = tmp
+    swapped = False
+    width = RUN
+    while width < n:
+        for lo in range(0, n, 2 * width):
+            mid = min(lo + width, n)
+            hi = min(lo + 2 * width, n)
+            i = lo
+            j = mid
+            for k in range(lo, hi):
+                # ties are taken from the left, keeping the sort stable
+                if i < mid and (j >= hi or
+                                not _before(a, src[j], src[i], decreasing)):
+                    dst[k] = src[i]
+                    i += 1
+                else:
+                    dst[k] = src[j]
+                    j += 1
+        src, dst = dst, src
+        swapped = not swapped
+        width *= 2
+    if swapped:
+        order[:] = src
+
+
+@nb.njit(cache=True)
+def _dense_into(a, order, dense):
+    """Dense ranks of `a` into `dense`, returning whether it contains ties"""
+    n = len(a)
+    d = 0
+    dense[order[0]] = 0
+    for k in range(1, n):
+        if a[order[k]] != a[order[k-1]]:
+            d += 1
+        dense[order[k]] = d
+    return d < n - 1
+
+
+@nb.njit(cache=True, error_model='numpy')
+def _walk(dx, y, oy, tree, accuracy):
+    """tauap, or tauap_a with `accuracy`, walking the items in the order of `y`
+
+    Same walk as `tauap._concordant_above`, with the terms of
+    `tauap._tauap_chunk` or `tauap._tauap_a_chunk` summed as soon as every
+    count is known. The harmonic sums of `tauap_a` are accumulated along the
+    walk, as the tie groups come in order. Also returns whether `y` contains
+    ties.
+    """
+    n = len(dx)
+    tree[:] = 0
+    numerator = 0.
+    n_not_top = 0
+    h_prev = 0.  # h[p - 1]
+    h_p = 0.  # h[p]
+    ties = False
+    k = 0
+    while k < n:
+        g = k + 1
+        while g < n and y[oy[g]] == y[oy[k]]:
+            g += 1
+        t = g - k
+        ties = ties or t > 1
+        h_end = h_p  # h[p + t - 1]
+        for m in range(k + 1, g):
+            h_end += 1 / m
+
+        for m in range(k, g):
+            i = oy[m]
+            s = 0
+            r = dx[i]
+            while r > 0:
+                s += tree[r]
+                r -= r & -r
+            if accuracy:
+                v = ((t - 1) - k * (h_end - h_p)) / 2
+                if k > 0:
+                    v += s * (h_end - h_prev)
+                numerator += v / t
+            elif k > 0:
+                numerator += s / k
+                n_not_top += 1
+
+        for m in range(k, g):
+            r = dx[oy[m]] + 1
+            while r <= n:
+                tree[r] += 1
+                r += r & -r
+        # h[g - 1] and h[g] for the next group, starting at position g
+        h_prev = h_end
+        h_p = h_end + 1 / g
+        k = g
+
+    if accuracy:
+        return (2 / (n - 1) * numerator) - 1, ties
+    return (2 * numerator / n_not_top) - 1, ties
+
+
+@nb.njit(cache=True)
+def _tauap_lowmem(x, y, decreasing, code, order_x, order_y, dense, tree):
+    """AP correlation in the given buffers, with the codes of `matrix.MEASURES`
+
+    Returns the coefficient and whether `x` and `y` contain ties.
+    """
+    # dense is free until the ranks are computed, so it is the sorts' scratch
+    _argsort_into(x, decreasing, order_x, dense)
+    _argsort_into(y, decreasing, order_y, dense)
+    ties_x = _dense_into(x, order_x, dense)
+    out, ties_y = _walk(dense, y, order_y, tree, code == 3)
+    if code == 4:
+        _dense_into(y, order_y, dense)
+        out = (out + _walk(dense, x, order_x, tree, False)[0]) / 2
+    return out, ties_x, ties_y
+
+
+def _run(x, y, decreasing, code, check_type, workspace):
+    x = _check_types(x, 'x')
+    y = _check_types(y, 'y')
+    if len(x) != len(y):
+        raise ValueError('[ERROR] x and y must be of the same length')
+    if workspace is None:
+        workspace = Workspace(len(x))
+
+    out, ties_x, ties_y = _tauap_lowmem(x, y, decreasing, code,
+                                        *workspace._views(len(x)))
+    if check_type in ('default', 'a') and ties_x:
+        raise ValueError('[ERROR] x contains ties')
+    if check_type == 'default' and ties_y:
+        raise ValueError('[ERROR] y contains ties.')
+    return float(out)
+
+
+def tauap(x, y, decreasing=True, workspace=None):
+    """AP Rank Correlation Coefficient, in Low Memory
+
+    Inputs:
+        x (array-like of numeric): input vector
+        y (array-like of numeric): another vector for comparison
+        decreasing (bool): whether items are sorted in decreasing order
+        workspace (Workspace or None): buffers to reuse, of at least the length
+                                       of the vectors
+
+    Returns:
+        float: the correlation coefficient.
+    """
+    return _run(x, y, decreasing, 2, 'default', workspace)
+
+
+def tauap_a(x, y, decreasing=True, workspace=None):
+    """AP-a Rank Correlation Coefficient, in Low Memory
+
+    Inputs:
+        x (array-like of numeric): true scores
+        y (array-like of numeric): estimated scores for comparison
+        decreasing (bool): whether items are sorted in decreasing order
+        workspace (Workspace or None): buffers to reuse, of at least the length
+                                       of the vectors
+
+    Returns:
+        float: the correlation coefficient.
+    """
+    return _run(x, y, decreasing, 3, 'a', workspace)
+
+
+def tauap_b(x, y, decreasing=True, workspace=None):
+    """AP-b Rank Correlation Coefficient, in Low Memory
+
+    Inputs:
+        x (array-like of numeric): input vector
+        y (array-like of numeric): another vector for comparison
+        decreasing (bool): whether items are sorted in decreasing order
+        workspace (Workspace or None): buffers to reuse, of at least the length
+                                       of the vectors
+
+    Returns:
+        float: the correlation coefficient.
+    """
+    return _run(x, y, decreasing, 4, 'b', workspace)
@@ -0,0 +1,215 @@
+"""
+Correlation Matrices
+
+`corr_matrix` computes a rank correlation coefficient between every pair of
+rows of a matrix, as is for instance the case when comparing the rankings of
+the same systems produced under different evaluation conditions. Every row is
+validated and ranked only once, and the pairs are computed in parallel with the
+threads set in `pyircor.config`.
+
+`corr_batch` computes the coefficient between one reference ranking and every
+row of a matrix of candidates, as is for instance the case when scoring every
+checkpoint of a model against the ground truth. The reference is validated and
+sorted only once, and the candidates are computed in parallel.
+
+Asymmetric coefficients (`tauap` and `tauap_a`) are not symmetrized: the
+element `(i, j)` of the result is the coefficient with `X[i]` as `x` and `X[j]`
+as `y`.
+"""
+
+import numba as nb
+import numpy as np
+
+from .config import threads
+from .check import as_kernel_array
+from .ranks import _rank_views, _tie_sizes, as_ranked
+from .tau import _tau_counts_ranked, _tau_from_counts, _tau_b_from_counts
+from .tauap import _concordant_above, _tauap_from_counts, _tauap_a_from_counts
+
+
+# coefficient -> (tie check as in `ranks.check_ranked`, kernel code, symmetric)
+MEASURES = {
+    'tau': ('default', 0, True),
+    'tau_a': ('a', 0, True),
+    'tau_b': ('b', 1, True),
+    'tauap': ('default', 2, False),
+    'tauap_a': ('a', 3, False),
+    'tauap_b': ('b', 4, False),  # one direction, symmetrized afterwards
+}
+
+
+def _check_measure(method):
+    if method not in MEASURES:
+        raise ValueError(
+            '[ERROR] method must be one of {}'.format(tuple(MEASURES))
+        )
+    return MEASURES[method]
+
+
+def _check_matrix(X, arg_str):
+    X = np.asarray(X)
+    if X.dtype.kind not in 'biuf' or X.ndim != 2 or X.shape[1] < 2:
+        raise ValueError(
+            '[ERROR] input {} must be a 2-d numeric array'.format(arg_str)
+        )
+    return as_kernel_array(X)
+
+
+@nb.njit(cache=True, parallel=True)
+def _rank_rows(X, decreasing):
+    """Order, min ranks and dense ranks of every row"""
+    m, n = X.shape
+    order = np.empty((m, n), np.int64)
+    mins = np.empty((m, n), np.int64)
+    dense = np.empty((m, n), np.int64)
+    for i in nb.prange(m):
+        order[i], mins[i], dense[i] = _rank_views(X[i], decreasing)
+    return order, mins, dense
+
+
+@nb.njit(cache=True)
+def _pair_coef(code, ox, px, dx, y, oy, py, decreasing):
+    """Coefficient between `x` and `y`, given the rank views they need"""
+    n = len(y)
+    if code == 0:
+        c, d, _, _ = _tau_counts_ranked(ox, px, y, decreasing)
+        return _tau_from_counts(n, c, d)
+    elif code == 1:
+        c, d, tx, ty = _tau_counts_ranked(ox, px, y, decreasing)
+        return _tau_b_from_counts(n, c, d, tx, ty)
+
+    c = _concordant_above(dx, oy, py)
+    if code == 3:
+        return _tauap_a_from_counts(c, py, _tie_sizes(oy, py))
+    return _tauap_from_counts(c, py)
+
+
+@nb.njit(cache=True, parallel=True)
+def _corr_pairs(code, X, order, mins, dense, rows_idx, cols_idx, decreasing):
+    """Coefficients between the rows `X[rows_idx[k]]` and `X[cols_idx[k]]`"""
+    out = np.empty(len(rows_idx))
+    for k in nb.prange(len(rows_idx)):
+        i = rows_idx[k]
+        j = cols_idx[k]
+        out[k] = _pair_coef(code, order[i], mins[i], dense[i],
+                            X[j], order[j], mins[j], decreasing)
+    return out
+
+
+@nb.njit(cache=True, parallel=True)
+def _corr_batch(code, ox, px, dx, Y, decreasing):
+    """Coefficients between the reference `x` and every row of `Y`
+
+    Also returns whether each row of `Y` contains ties. The `tau` codes do not
+    need to rank the rows at all, as `x` is already sorted.
+    """
+    k, n = Y.shape
+    out = np.empty(k)
+    ties = np.zeros(k, np.bool_)
+    for j in nb.prange(k):
+        y = Y[j]
+        if code <= 1:
+            c, d, tx, ty = _tau_counts_ranked(ox, px, y, decreasing)
+            ties[j] = ty > 0
+            if code == 0:
+                out[j] = _tau_from_counts(n, c, d)
+            else:
+                out[j] = _tau_b_from_counts(n, c, d, tx, ty)
+            continue
+
+        oy, py, dy = _rank_views(y, decreasing)
+        ties[j] = dy[oy[n-1]] < n - 1
+        cx = _concordant_above(dx, oy, py)
+        if code == 2:
+            out[j] = _tauap_from_counts(cx, py)
+        elif code == 3:
+            out[j] = _tauap_a_from_counts(cx, py, _tie_sizes(oy, py))
+        else:
+            cy = _concordant_above(dy, ox, px)
+            out[j] = (_tauap_from_counts(cx, py) +
+                      _tauap_from_counts(cy, px)) / 2
+    return out, ties
+
+
+def _rank_checked(X, check_type, arg_str, decreasing):
+    """Rank the rows of `X`, raising if the tie check fails"""
+    order, mins, dense = _rank_rows(X, decreasing)
+    if check_type != 'b':
+        has_ties = dense.max(axis=1) + 1 < X.shape[1]
+        if np.any(has_ties):
+            raise ValueError(
+                '[ERROR] rows {} of {} contain ties'.format(
+                    np.flatnonzero(has_ties).tolist(), arg_str)
+            )
+    return order, mins, dense
+
+
+def corr_matrix(X, method='tauap_b', decreasing=True):
+    """Correlation Coefficients between All Pairs of Rows
+
+    Inputs:
+        X (array-like of numeric): (m, n) matrix with one ranking per row
+        method (str): coefficient to compute, one of 'tau', 'tau_a', 'tau_b',
+                      'tauap', 'tauap_a' or 'tauap_b'
+        decreasing (bool): whether items are sorted in decreasing order
+
+    Returns:
+        np.ndarray: (m, m) matrix of correlation coefficients, where element
+                    (i, j) is the coefficient with `X[i]` as `x` and `X[j]`
+                    as `y`.
+    """
+    check_type, code, symmetric = _check_measure(method)
+    X = _check_matrix(X, 'X')
+    m = X.shape[0]
+    if symmetric:
+        rows_idx, cols_idx = np.triu_indices(m)
+    else:
+        rows_idx, cols_idx = np.indices((m, m)).reshape(2, -1)
+    with threads():
+        order, mins, dense = _rank_checked(X, check_type, 'X', decreasing)
+        vals = _corr_pairs(code, X, order, mins, dense,
+                           rows_idx.astype(np.int64),
+                           cols_idx.astype(np.int64), decreasing)
+
+    out = np.empty((m, m))
+    out[rows_idx, cols_idx] = vals
+    if symmetric:
+        out[cols_idx, rows_idx] = vals
+    elif method == 'tauap_b':
+        out = (out + out.T) / 2
+    return out
+
+
+def corr_batch(x, Y, method='tauap_b', decreasing=True):
+    """Correlation Coefficients between a Reference and Many Candidates
+
+    Inputs:
+        x (Iterable of numeric or RankedVector): (n,) reference vector, the
+                                 true scores for the `_a` coefficients
+        Y (array-like of numeric): (k, n) matrix with one candidate per row
+        method (str): coefficient to compute, one of 'tau', 'tau_a', 'tau_b',
+                      'tauap', 'tauap_a' or 'tauap_b'
+        decreasing (bool): whether items are sorted in decreasing order
+
+    Returns:
+        np.ndarray: (k,) vector with the coefficient between `x` and every
+                    row of `Y`.
+    """
+    check_type, code, _ = _check_measure(method)
+    x = as_ranked(x, decreasing, 'x')
+    Y = _check_matrix(Y, 'Y')
+    if x.values.ndim != 1 or len(x) != Y.shape[1]:
+        raise ValueError(
+            '[ERROR] x and the rows of Y must be of the same length')
+    if check_type != 'b' and x.has_ties:
+        raise ValueError('[ERROR] x contains ties')
+
+    # the reference is ranked once, or not at all if already a RankedVector
+    with threads():
+        out, ties = _corr_batch(code, x.order, x.mins, x.dense, Y, decreasing)
+    if check_type == 'default' and np.any(ties):
+        raise ValueError(
+            '[ERROR] rows {} of Y contain ties'.format(
+                np.flatnonzero(ties).tolist())
+        )
+    return out
@@ -0,0 +1,429 @@
+"""
+Out-of-core Correlations
+
+`tau`, `tau_b` and `tauap` for vectors larger than memory, typically `.npy`
+files opened with `np.load(path, mmap_mode='r')`. The vectors are read in
+chunks, and every ranking is an external merge sort through scratch files, so
+that the memory used stays within `memory_budget` bytes, see `pyircor.config`,
+whatever the length of the vectors.
+
+Every sort works on records of float64 columns, the first one or two being the
+sort keys and the last one optionally accumulating counts. Chunks that fit in
+the budget are sorted in memory into runs, which are then merged pairwise, one
+buffered block at a time, from one scratch file into the other until a single
+run is left. Merging counts, at no extra cost, the discordant pairs as in
+Knight's algorithm for `tau`, and the concordant items above every item for
+`tauap`.
+
+Scratch files are only mapped one block at a time, so they do not add to the
+resident memory of the process. Inputs are read the same way when they are
+`np.memmap` objects over a whole file, as returned by `np.load`, and sliced
+otherwise. Scores are compared as float64, so integers above 2**53 may be
+considered tied.
+"""
+
+import mmap
+import os
+import shutil
+import tempfile
+
+import numba as nb
+import numpy as np
+
+from .config import get_config
+from .tau import _tau_from_counts, _tau_b_from_counts
+
+
+@nb.njit(cache=True)
+def _le(a, i, b, j, nkeys):
+    """Whether record a[i] sorts before or with b[j] on the first nkeys keys"""
+    for k in range(nkeys):
+        if a[i, k] != b[j, k]:
+            return a[i, k] < b[j, k]
+    return True
+
+
+@nb.njit(cache=True)
+def _merge_block(a, b, out, ia, ib, io, a_done, b_done, a_len, a_taken, nkeys,
+                 mode):
+    """Merge the sorted blocks a[ia:] and b[ib:] of two runs into out[io:]
+
+    Stops when `out` is full, or when a block runs out while its run has more
+    records, `a_done` and `b_done` telling whether the runs have no more
+    records. `a_len` is the length of the left run and `a_taken` the records
+    already taken from it. With mode 1 the records of the left run still to be
+    taken when a record of the right run is taken, that is the inversions, are
+    counted. With mode 2 the records of the left run already taken are added to
+    the last column of every record of the right run.
+    """
+    inversions = 0
+    w = out.shape[1]
+    while io < len(out):
+        a_avail = ia < len(a)
+        b_avail = ib < len(b)
+        if (not a_avail and not a_done) or (not b_avail and not b_done):
+            break
+        if not a_avail and not b_avail:
+            break
+        if a_avail and (not b_avail or _le(a, ia, b, ib, nkeys)):
+            out[io] = a[ia]
+            ia += 1
+            a_taken += 1
+        else:
+            out[io] = b[ib]
+            if mode == 1:
+                inversions += a_len - a_taken
+            elif mode == 2:
+                out[io, w-1] += a_taken
+            ib += 1
+        io += 1
+    return ia, ib, io, a_taken, inversions
+
+
+@nb.njit(cache=True)
+def _sort_records(recs, nkeys, mode):
+    """Sort records in memory with a bottom-up merge sort, as `_merge_block`"""
+    n = len(recs)
+    src = recs
+    dst = np.empty_like(recs)
+    inversions = 0
+    swapped = False
+    width = 1
+    while width < n:
+        for lo in range(0, n, 2 * width):
+            mid = min(lo + width, n)
+            hi = min(lo + 2 * width, n)
+            _, _, _, _, inv = _merge_block(src[lo:mid], src[mid:hi],
+                                           dst[lo:hi], 0, 0, 0, True, True,
+                                           mid - lo, 0, nkeys, mode)
+            inversions += inv
+        src, dst = dst, src
+        swapped = not swapped
+        width *= 2
+    if swapped:
+        recs[:] = src
+    return inversions
+
+
+@nb.njit(cache=True)
+def _tied_pairs_block(recs, ncols, prev, run):
+    """Tied pairs in a block of sorted records, on the first ncols columns
+
+    `prev` is the last record of the previous block and `run` the length of its
+    tie group, which may continue in this block. Returns the pairs and the
+    updated `run`.
+    """
+    pairs = 0
+    for i in range(len(recs)):
+        same = run > 0
+        for k in range(ncols):
+            if recs[i, k] != prev[k]:
+                same = False
+        if same:
+            pairs += run
+            run += 1
+        else:
+            run = 1
+        prev[:] = recs[i]
+    return pairs, run
+
+
+@nb.njit(cache=True)
+def _tauap_block(recs):
+    """Numerator of tauap over (key, position, concordant above) records"""
+    numerator = 0.
+    for i in range(len(recs)):
+        if recs[i, 1] > 0:
+            numerator += recs[i, 2] / recs[i, 1]
+    return numerator
+
+
+class _Scratch:
+    """Scratch files of float64 records, mapped one window at a time"""
+
+    def __init__(self, scratch_dir):
+        self.dir = tempfile.mkdtemp(prefix='pyircor-', dir=scratch_dir)
+        self.count = 0
+
+    def new(self, n, w):
+        path = os.path.join(self.dir, '{}.bin'.format(self.count))
+        self.count += 1
+        with open(path, 'wb') as f:
+            f.truncate(n * w * 8)
+        return path
+
+    @staticmethod
+    def read(path, w, start, stop):
+        window = np.memmap(path, np.float64, 'r', start * w * 8,
+                           (stop - start, w))
+        recs = np.array(window)
+        del window
+        return recs
+
+    @staticmethod
+    def write(path, w, start, recs):
+        window = np.memmap(path, np.float64, 'r+', start * w * 8, recs.shape)
+        window[:] = recs
+        window.flush()
+        del window
+
+    def close(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+def _reader(a):
+    """Function reading a[start:stop] as float64, mapping only that window"""
+    if isinstance(a, np.memmap) and isinstance(a.base, mmap.mmap) and \
+            a.flags.c_contiguous and a.filename is not None:
+        def read(start, stop):
+            window = np.memmap(a.filename, a.dtype, 'r',
+                               a.offset + start * a.itemsize, (stop - start,))
+            out = np.array(window, np.float64)
+            del window
+            return out
+        return read
+    return lambda start, stop: np.asarray(a[start:stop], np.float64)
+
+
+def _check_vector(a, arg_str):
+    a = np.asarray(a) if not isinstance(a, np.memmap) else a
+    if a.dtype.kind not in 'biuf' or a.ndim != 1 or a.size < 2:
+        raise ValueError(
+            '[ERROR] input {} must be a numeric vector'.format(arg_str))
+    return a
+
+
+def _check_inputs(x, y, budget):
+    x = _check_vector(x, 'x')
+    y = _check_vector(y, 'y')
+    if len(x) != len(y):
+        raise ValueError('[ERROR] x and y must be of the same length')
+    if budget is None:
+        budget = get_config()['memory_budget']
+    return x, y, budget
+
+
+class _Sorter:
+    """External merge sort of records within a memory budget"""
+
+    def __init__(self, scratch, budget):
+        self.scratch = scratch
+        self.budget = budget
+
+    def rows(self, w):
+        # records in memory at once: a chunk, its merge buffer and the mapped
+        # window
+        return max(1024, self.budget // (w * 8 * 6))
+
+    def sort(self, n, w, fill, nkeys, mode):
+        """Sort the records produced by `fill(start, stop)` in chunks
+
+        Returns the path of the sorted records and the inversions counted
+        (mode 1).
+        """
+        rows = self.rows(w)
+        src = self.scratch.new(n, w)
+        inversions = 0
+        for start in range(0, n, rows):
+            stop = min(start + rows, n)
+            recs = fill(start, stop)
+            inversions += _sort_records(recs, nkeys, mode)
+            self.scratch.write(src, w, start, recs)
+            del recs
+
+        width = rows
+        if width >= n:
+            return src, inversions
+        dst = self.scratch.new(n, w)
+        block = max(1, rows // 2)
+        while width < n:
+            for lo in range(0, n, 2 * width):
+                mid = min(lo + width, n)
+                hi = min(lo + 2 * width, n)
+                inversions += self._merge_runs(src, dst, w, lo, mid, hi, block,
+                                               nkeys, mode)
+            src, dst = dst, src
+            width *= 2
+        os.remove(dst)
+        return src, inversions
+
+    def _merge_runs(self, src, dst, w, lo, mid, hi, block, nkeys, mode):
+        read = self.scratch.read
+        a_pos = min(lo + block, mid)
+        b_pos = min(mid + block, hi)
+        a = read(src, w, lo, a_pos)
+        b = read(src, w, mid, b_pos)
+        out = np.empty((block, w))
+        ia = ib = io = 0
+        a_taken = 0
+        out_pos = lo
+        inversions = 0
+        while True:
+            ia, ib, io, a_taken, inv = _merge_block(
+                a, b, out, ia, ib, io, a_pos == mid, b_pos == hi, mid - lo,
+                a_taken, nkeys, mode)
+            inversions += inv
+            done = (ia == len(a) and a_pos == mid and
+                    ib == len(b) and b_pos == hi)
+            if io == len(out) or done:
+                self.scratch.write(dst, w, out_pos, out[:io])
+                out_pos += io
+                io = 0
+            if done:
+                return inversions
+            if ia == len(a) and a_pos < mid:
+                a = read(src, w, a_pos, min(a_pos + block, mid))
+                a_pos = min(a_pos + block, mid)
+                ia = 0
+            if ib == len(b) and b_pos < hi:
+                b = read(src, w, b_pos, min(b_pos + block, hi))
+                b_pos = min(b_pos + block, hi)
+                ib = 0
+
+    def tied_pairs(self, path, n, w, ncols):
+        """Tied pairs in sorted records, comparing the first ncols columns"""
+        rows = self.rows(w)
+        prev = np.zeros(w)
+        run = 0
+        pairs = 0
+        for start in range(0, n, rows):
+            p, run = _tied_pairs_block(self.scratch.read(path, w, start,
+                                                         min(start + rows, n)),
+                                       ncols, prev, run)
+            pairs += p
+        return pairs
+
+    def column(self, path, n, w, col):
+        """Function producing records with column `col` of sorted records"""
+        def fill(start, stop):
+            recs = self.scratch.read(path, w, start, stop)
+            return np.ascontiguousarray(recs[:, col:col+1])
+        return fill
+
+
+def _tau_counts(x, y, budget, scratch_dir):
+    """Concordant, discordant and tied pairs by Knight's algorithm"""
+    n = len(x)
+    read_x = _reader(x)
+    read_y = _reader(y)
+    scratch = _Scratch(scratch_dir)
+    try:
+        sorter = _Sorter(scratch, budget)
+
+        def fill(start, stop):
+            return np.column_stack([read_x(start, stop), read_y(start, stop)])
+
+        # sort by x and then y, so that pairs tied in x are not discordant
+        xy, _ = sorter.sort(n, 2, fill, 2, 0)
+        tx = sorter.tied_pairs(xy, n, 2, 1)
+        txy = sorter.tied_pairs(xy, n, 2, 2)
+        # every inversion of the y in that order is a discordant pair
+        ys, d = sorter.sort(n, 1, sorter.column(xy, n, 2, 1), 1, 1)
+        os.remove(xy)
+        ty = sorter.tied_pairs(ys, n, 1, 1)
+    finally:
+        scratch.close()
+
+    nn = n * (n-1) // 2
+    c = nn - tx - ty + txy - d
+    return c, d, tx, ty
+
+
+def tau(x, y, budget=None, scratch_dir=None):
+    """Kendall :math:`\\tau` Rank Correlation Coefficient, out of core
+
+    Inputs:
+        x (array-like of numeric): input vector, typically an `np.memmap`
+        y (array-like of numeric): another vector for comparison
+        budget (int): bytes of memory to use, `memory_budget` of the
+                      configuration if None
+        scratch_dir (str): directory for the scratch files, the default
+                           temporary directory if None
+
+    Returns:
+        float: the correlation coefficient.
+    """
+    x, y, budget = _check_inputs(x, y, budget)
+    c, d, tx, ty = _tau_counts(x, y, budget, scratch_dir)
+    if tx > 0:
+        raise ValueError('[ERROR] x contains ties')
+    if ty > 0:
+        raise ValueError('[ERROR] y contains ties')
+    return _tau_from_counts(len(x), c, d)
+
+
+def tau_b(x, y, budget=None, scratch_dir=None):
+    """Kendall :math:`\\tau_b` Rank Correlation Coefficient, out of core
+
+    Inputs:
+        x (array-like of numeric): input vector, typically an `np.memmap`
+        y (array-like of numeric): another vector for comparison
+        budget (int): bytes of memory to use, `memory_budget` of the
+                      configuration if None
+        scratch_dir (str): directory for the scratch files, the default
+                           temporary directory if None
+
+    Returns:
+        float: the correlation coefficient.
+    """
+    x, y, budget = _check_inputs(x, y, budget)
+    c, d, tx, ty = _tau_counts(x, y, budget, scratch_dir)
+    return _tau_b_from_counts(len(x), c, d, tx, ty)
+
+
+def tauap(x, y, decreasing=True, budget=None, scratch_dir=None):
+    """AP Rank Correlation Coefficient, out of core
+
+    Items are sorted by `y`, and then the `x` in that order are merge sorted,
+    counting for every item the items above it in `y` that are also above it in
+    `x`.
+
+    Inputs:
+        x (array-like of numeric): input vector, typically an `np.memmap`
+        y (array-like of numeric): another vector for comparison
+        decreasing (bool): whether items are sorted in decreasing order
+        budget (int): bytes of memory to use, `memory_budget` of the
+                      configuration if None
+        scratch_dir (str): directory for the scratch files, the default
+                           temporary directory if None
+
+    Returns:
+        float: the correlation coefficient.
+    """
+    x, y, budget = _check_inputs(x, y, budget)
+    n = len(x)
+    sign = -1. if decreasing else 1.
+    read_x = _reader(x)
+    read_y = _reader(y)
+    scratch = _Scratch(scratch_dir)
+    try:
+        sorter = _Sorter(scratch, budget)
+
+        def fill_y(start, stop):
+            return np.column_stack([sign * read_y(start, stop),
+                                    sign * read_x(start, stop)])
+
+        # keys of x in the order of y, top first
+        yx, _ = sorter.sort(n, 2, fill_y, 1, 0)
+        if sorter.tied_pairs(yx, n, 2, 1) > 0:
+            raise ValueError('[ERROR] y contains ties')
+
+        def fill_x(start, stop):
+            recs = np.zeros((stop - start, 3))
+            recs[:, 0] = scratch.read(yx, 2, start, stop)[:, 1]
+            recs[:, 1] = np.arange(start, stop)
+            return recs
+
+        # every item gets the items before it in y that are also before it in x
+        xs, _ = sorter.sort(n, 3, fill_x, 1, 2)
+        os.remove(yx)
+        if sorter.tied_pairs(xs, n, 3, 1) > 0:
+            raise ValueError('[ERROR] x contains ties')
+        rows = sorter.rows(3)
+        numerator = 0.
+        for start in range(0, n, rows):
+            block = scratch.read(xs, 3, start, min(start + rows, n))
+            numerator += _tauap_block(block)
+    finally:
+        scratch.close()
+    return (2 * numerator / (n - 1)) - 1
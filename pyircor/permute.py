@@ -1,31 +1,399 @@
+"""
+Permutation Tests
+
+`permutation_test` tests whether a rank correlation coefficient is
+significantly different from zero, that is from independence, by recomputing it
+after randomly permuting `y`. `paired_permutation_test` tests whether two
+rankings `y1` and `y2` differ in their correlation with the same `x`, by
+randomly swapping the scores of every item between them.
+
+Permutations are drawn in batches from a seeded generator, so that a test is
+reproducible given its `seed` and `batch_size`, and every batch is evaluated
+with `matrix.corr_batch`, in parallel and with `x` ranked only once. In
+`permutation_test`, `y` is ranked only once too, as the rank views of a
+permutation of `y` are the permutation of its views. When `tol` is given, the
+test stops as soon as the half-width of the confidence interval of the p-value
+is below it.
+
+`expected_over_ties` gives the expected coefficient when ties are broken at
+random, in closed form, and `permute_ties` enumerates every tie-breaking for
+small inputs.
+"""
+
+from collections import namedtuple
+
+import numba as nb
 import numpy as np
-from scipy import stats 
+from scipy import stats
+
+from .config import threads
+from .matrix import _check_measure, corr_batch
+from .ranks import _tie_sizes, as_ranked, check_ranked
+from .tau import (_pair_counts, _tau_counts_ranked, _tau_from_counts,
+                  _tau_b_from_counts, tau)
+from .tauap import (_concordant_above, _harmonic, _tauap_from_counts,
+                    _tauap_a_from_counts, tauap)
+
+
+PermutationTestResult = namedtuple('PermutationTestResult', [
+    'statistic', 'pvalue', 'n_permutations', 'ci_low', 'ci_high',
+])
+PermutationTestResult.__doc__ = """Result of a permutation test
+
+`ci_low` and `ci_high` bound the confidence interval of the p-value, given the
+number of permutations drawn.
+"""
+
+ALTERNATIVES = ('two-sided', 'greater', 'less')
+
+
+@nb.njit(cache=True, parallel=True)
+def _permuted_coefs(code, ox, px, dx, oy, py, dy, perms):
+    """Coefficients between `x` and every permutation `y[perms[b]]`"""
+    k, n = perms.shape
+    out = np.empty(k)
+    for b in nb.prange(k):
+        perm = perms[b]
+        inv = np.empty(n, np.int64)
+        for i in range(n):
+            inv[perm[i]] = i
+        # views of y[perm]; the order within tie groups does not matter here
+        oyp = inv[oy]
+        pyp = py[perm]
+        dyp = dy[perm]
+        if code <= 1:
+            c, d, tx, ty = _tau_counts_ranked(ox, px, dyp, False)
+            if code == 0:
+                out[b] = _tau_from_counts(n, c, d)
+            else:
+                out[b] = _tau_b_from_counts(n, c, d, tx, ty)
+            continue
+
+        cx = _concordant_above(dx, oyp, pyp)
+        if code == 2:
+            out[b] = _tauap_from_counts(cx, pyp)
+        elif code == 3:
+            out[b] = _tauap_a_from_counts(cx, pyp, _tie_sizes(oyp, pyp))
+        else:
+            cy = _concordant_above(dyp, ox, px)
+            out[b] = (_tauap_from_counts(cx, pyp) +
+                      _tauap_from_counts(cy, px)) / 2
+    return out
+
+
+def _wilson(hits, n, confidence):
+    """Wilson score interval of a binomial proportion"""
+    z = stats.norm.ppf(.5 + confidence / 2)
+    p = hits / n
+    center = (p + z**2 / (2 * n)) / (1 + z**2 / n)
+    half = z / (1 + z**2 / n) * np.sqrt(p * (1 - p) / n + z**2 / (4 * n**2))
+    return max(0., center - half), min(1., center + half)
+
+
+def _extreme(null, statistic, alternative):
+    """Number of null statistics at least as extreme as the observed one"""
+    eps = 1e-12 * max(1., abs(statistic))  # do not miss ties to rounding
+    if alternative == 'two-sided':
+        return int(np.sum(np.abs(null) >= abs(statistic) - eps))
+    elif alternative == 'greater':
+        return int(np.sum(null >= statistic - eps))
+    return int(np.sum(null <= statistic + eps))
+
+
+def _run(statistic, draw, n_permutations, batch_size, alternative, tol,
+         confidence):
+    """Draw batches of null statistics until `n_permutations` or `tol`"""
+    if alternative not in ALTERNATIVES:
+        raise ValueError(
+            '[ERROR] alternative must be one of {}'.format(ALTERNATIVES))
+    if n_permutations < 1 or batch_size < 1:
+        raise ValueError(
+            '[ERROR] n_permutations and batch_size must be positive')
+
+    hits = 0
+    done = 0
+    while done < n_permutations:
+        null = draw(min(batch_size, n_permutations - done))
+        hits += _extreme(null, statistic, alternative)
+        done += len(null)
+        low, high = _wilson(hits, done, confidence)
+        if tol is not None and (high - low) / 2 <= tol:
+            break
+
+    # the observed statistic counts as one of the permutations
+    pvalue = (hits + 1) / (done + 1)
+    return PermutationTestResult(float(statistic), pvalue, done, float(low),
+                                 float(high))
+
+
+def permutation_test(x, y, method='tauap', decreasing=True,
+                     n_permutations=10000, batch_size=1000,
+                     alternative='two-sided', tol=None, confidence=.99,
+                     seed=None):
+    """Permutation Test of Independence
+
+    Inputs:
+        x (Iterable of numeric or RankedVector): input vector, the true scores
+                                                 for the `_a` coefficients
+        y (Iterable of numeric or RankedVector): another vector for comparison
+        method (str): coefficient to test, one of 'tau', 'tau_a', 'tau_b',
+                      'tauap', 'tauap_a' or 'tauap_b'
+        decreasing (bool): whether items are sorted in decreasing order
+        n_permutations (int): maximum number of permutations
+        batch_size (int): number of permutations evaluated at once
+        alternative (str): 'two-sided', 'greater' or 'less' than zero
+        tol (float): stop once the half-width of the confidence interval of the
+                     p-value is below this, or never if None
+        confidence (float): confidence level of the interval of the p-value
+        seed (int or None): seed of the permutations
+
+    Returns:
+        PermutationTestResult: the coefficient, its p-value, the number of
+                               permutations and the interval of the p-value.
+    """
+    check_type, code, _ = _check_measure(method)
+    x, y = check_ranked(x, y, check_type, decreasing)
+    statistic = corr_batch(x, y.values[None], method, decreasing)[0]
+    rng = np.random.default_rng(seed)
+
+    def draw(size):
+        perms = np.argsort(rng.random((size, len(y))), axis=1)
+        with threads():
+            return _permuted_coefs(code, x.order, x.mins, x.dense,
+                                   y.order, y.mins, y.dense, perms)
+
+    return _run(statistic, draw, n_permutations, batch_size, alternative, tol,
+                confidence)
+
+
+def paired_permutation_test(x, y1, y2, method='tauap', decreasing=True,
+                            n_permutations=10000, batch_size=1000,
+                            alternative='two-sided', tol=None, confidence=.99,
+                            seed=None):
+    """Paired Permutation Test of the Difference between Two Correlations
+
+    Tests whether the coefficient of `x` with `y1` differs from the coefficient
+    of `x` with `y2`. Under the null hypothesis the scores of every item are
+    exchangeable between `y1` and `y2`, so they are swapped at random. Swapped
+    scores may produce ties, which `method='tauap'` and `'tau'` reject.
+
+    Inputs:
+        x (Iterable of numeric or RankedVector): input vector, the true scores
+                                                 for the `_a` coefficients
+        y1 (Iterable of numeric): first vector for comparison
+        y2 (Iterable of numeric): second vector for comparison
+        method (str): coefficient to test, one of 'tau', 'tau_a', 'tau_b',
+                      'tauap', 'tauap_a' or 'tauap_b'
+        decreasing (bool): whether items are sorted in decreasing order
+        n_permutations (int): maximum number of permutations
+        batch_size (int): number of permutations evaluated at once
+        alternative (str): 'two-sided', 'greater' or 'less', for the difference
+                           of the first coefficient minus the second
+        tol (float): stop once the half-width of the confidence interval of the
+                     p-value is below this, or never if None
+        confidence (float): confidence level of the interval of the p-value
+        seed (int or None): seed of the permutations
+
+    Returns:
+        PermutationTestResult: the difference of coefficients, its p-value,
+                               the number of permutations and the interval of
+                               the p-value.
+    """
+    _check_measure(method)
+    x = as_ranked(x, decreasing, 'x')
+    y1 = np.asarray(y1)
+    y2 = np.asarray(y2)
+    if y1.shape != y2.shape:
+        raise ValueError('[ERROR] y1 and y2 must be of the same length')
+    observed = corr_batch(x, np.vstack([y1, y2]), method, decreasing)
+    statistic = observed[0] - observed[1]
+    rng = np.random.default_rng(seed)
+
+    def draw(size):
+        swap = rng.random((size, len(y1))) < .5
+        Y1 = np.where(swap, y2, y1)
+        Y2 = np.where(swap, y1, y2)
+        return (corr_batch(x, Y1, method, decreasing) -
+                corr_batch(x, Y2, method, decreasing))
+
+    return _run(statistic, draw, n_permutations, batch_size, alternative, tol,
+                confidence)
+
+
+@nb.njit(cache=True)
+def _next_permutation(a, lo, hi):
+    """Next lexicographic permutation of a[lo:hi] in place
+
+    Returns False, leaving the segment sorted again, after the last
+    permutation.
+    """
+    i = hi - 2
+    while i >= lo and a[i] >= a[i+1]:
+        i -= 1
+    if i >= lo:
+        j = hi - 1
+        while a[j] <= a[i]:
+            j -= 1
+        a[i], a[j] = a[j], a[i]
+    # reverse the tail, which is in decreasing order
+    k, m = i + 1, hi - 1
+    while k < m:
+        a[k], a[m] = a[m], a[k]
+        k += 1
+        m -= 1
+    return i >= lo
 
 
 def permute_ties(x, decreasing=True):
+    """Every Tie-breaking of a Vector
+
+    Generates the rankings obtained by breaking the ties of `x` in every
+    possible way, that is the product of the permutations of every tie group,
+    without recursion and with constant memory. Their number is the product of
+    the factorials of the tie group sizes, so this is only practical for small
+    inputs.
+
+    Inputs:
+        x (Iterable of numeric or RankedVector): input vector
+        decreasing (bool): whether items are sorted in decreasing order
+
+    Returns:
+        generator of ndarray: the 0-based position of every item, 0 being the
+                              top one, so to be compared with
+                              `decreasing=False`.
     """
+    x = as_ranked(x, decreasing, 'x')
+    order = x.order.copy()
+    bounds = np.r_[np.flatnonzero(np.diff(x.mins[order])) + 1, len(order)]
+    starts = np.r_[0, bounds[:-1]]
+    # odometer over the groups, every group starting from its sorted items
+    for lo, hi in zip(starts, bounds):
+        order[lo:hi].sort()
+    groups = [(lo, hi) for lo, hi in zip(starts, bounds) if hi - lo > 1]
+    positions = np.empty(len(order), np.int64)
+    while True:
+        positions[order] = np.arange(len(order))
+        yield positions.copy()
+        for lo, hi in reversed(groups):
+            if _next_permutation(order, lo, hi):
+                break
+        else:
+            return
+
+
+@nb.njit(cache=True)
+def _expected_above(dx, oy, py):
+    """Expected concordant items above every item, counted in halves
+
+    Items are walked in the order `oy` of `y` as in `_concordant_above`. For
+    every item, `above` counts the items in higher groups of `y` that are also
+    higher in `x`, and `within` those in the same group of `y` that are higher
+    in `x`, where an item tied in `x` counts as half, as it is higher in half
+    of the tie-breakings.
+    """
+    n = len(dx)
+    tree = np.zeros(n + 1, np.int64)
+    above = np.empty(n, np.int64)
+    within = np.empty(n, np.int64)
+    k = 0
+    while k < n:
+        g = k + 1
+        while g < n and py[oy[g]] == py[oy[k]]:
+            g += 1
+
+        group = np.sort(dx[oy[k:g]])
+        for m in range(k, g):
+            i = oy[m]
+            # items strictly higher and tied in x among the higher groups of y
+            lt = 0
+            r = dx[i]
+            while r > 0:
+                lt += tree[r]
+                r -= r & -r
+            le = 0
+            r = dx[i] + 1
+            while r > 0:
+                le += tree[r]
+                r -= r & -r
+            above[i] = lt + le
+            lo = np.searchsorted(group, dx[i], 'left')
+            hi = np.searchsorted(group, dx[i], 'right')
+            within[i] = 2 * lo + (hi - lo - 1)
+
+        for m in range(k, g):
+            r = dx[oy[m]] + 1
+            while r <= n:
+                tree[r] += 1
+                r += r & -r
+        k = g
+    return above, within
+
+
+@nb.njit(cache=True)
+def _expected_tauap(above, within, py, t):
+    """Expected tauap from the counts of `_expected_above`"""
+    n = len(py)
+    h = _harmonic(n)
+    c_all = 0.
+    for i in range(n):
+        p = py[i]
+        ti = t[i]
+        # the item is at any of the positions p+1..p+t of its group at random
+        if p > 0:
+            c_all += above[i] / 2 * (h[p + ti - 1] - h[p - 1]) / ti
+        # and a tied item is above it in m of the t-1 cases at position p+m+1
+        if ti > 1:
+            s = (ti - 1) - p * (h[p + ti - 1] - h[p])
+            c_all += within[i] / 2 * s / (ti * (ti - 1))
+    return (2 / (n - 1) * c_all) - 1
+
+
+EXPECTED_METHODS = ('tau', 'tauap')
+
+
+def expected_over_ties(x, y, method='tauap', decreasing=True,
+                       exhaustive=False):
+    """Expected Coefficient over the Tie-breakings
+
+    Expectation of `tau` or `tauap` when the ties of both `x` and `y` are
+    broken uniformly at random. For `tau` it is the number of concordant minus
+    discordant pairs over the number of pairs, as tied pairs are concordant in
+    half of the tie-breakings. For `tauap` it is computed in O(n log n),
+    counting the items above every item in `x` and `y` and averaging over its
+    positions within its tie group of `y`. When `x` has no ties, these are
+    `tau_a` and `tauap_a`.
+
+    Inputs:
+        x (Iterable of numeric or RankedVector): input vector
+        y (Iterable of numeric or RankedVector): another vector for comparison
+        method (str): coefficient, 'tau' or 'tauap'
+        decreasing (bool): whether items are sorted in decreasing order
+        exhaustive (bool): whether to average the coefficient over every
+                           tie-breaking, enumerated with `permute_ties`,
+                           instead. Only practical for small inputs
+
+    Returns:
+        float: the expected correlation coefficient.
     """
-    if decreasing:
-        x = -x
-    
-    ranks = stats.rankdata(x, 'ordinal')
-    groups = stats.rankdata(x, 'min')
-    _permute_ties(ranks, groups)
-
-
-def _permute_ties(ranks, groups, prev=0, l=[]):
-    if len(ranks) == 1:
-        # only one item remaining. Contatenate and add
-        l = np.concatenate([np.array(l), ranks, groups])
-    else:
-        # work out the next item. Obtain tied items and their ranks
-        same_group = np.where(groups == groups[0])[0]
-        group_ranks = ranks[same_group]
-        # recursively process the res, rotating within the same group
-        for i in range(len(same_group)):
-            ranks2 = ranks[1:]
-            ranks2[same_group[1:] - 1] = group_ranks[-i]
-            groups2 = groups[1:]
-            prev2 = np.r_[prev, group_ranks[i]]
-            l = _permute_ties(ranks2, groups2, prev2, l)
-    return l
+    if method not in EXPECTED_METHODS:
+        raise ValueError('[ERROR] method must be one of {}'
+                         .format(', '.join(EXPECTED_METHODS)))
+    x, y = check_ranked(x, y, 'b', decreasing)
+    if exhaustive:
+        total = 0.
+        count = 0
+        for rx in permute_ties(x, decreasing):
+            for ry in permute_ties(y, decreasing):
+                if method == 'tau':
+                    total += tau(rx, ry, validate=False)
+                else:
+                    total += tauap(rx, ry, decreasing=False, validate=False)
+                count += 1
+        return total / count
+
+    if method == 'tau':
+        n = len(x)
+        c, d, _, _ = _pair_counts(x, y)
+        return _tau_from_counts(n, c, d)
+    above, within = _expected_above(x.dense, y.order, y.mins)
+    return _expected_tauap(above, within, y.mins, y.tie_sizes)
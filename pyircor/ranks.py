@@ -0,0 +1,236 @@
+"""
+Rank Views of Score Vectors
+
+Helpers computing, in a single sort, the different rank representations that
+the correlation kernels work on. Ranks are 0-based, with rank 0 for the top
+item, that is the largest score when sorting in decreasing order and the
+smallest one otherwise. The scores are never negated nor copied to sort them in
+decreasing order.
+
+`RankedVector` wraps a validated score vector and caches its rank views, so
+that a vector entering many comparisons is validated and ranked only once.
+Every coefficient function accepts it in place of a plain vector.
+"""
+
+import functools
+
+import numba as nb
+import numpy as np
+
+from .check import _check_types, as_kernel_array
+from .instrument import inputs, stage
+
+
+@nb.njit(cache=True)
+def _rank_views(a, decreasing):
+    """Sort order, min ranks and dense ranks of a vector
+
+    Inputs:
+        a (np.ndarray of numeric): input vector
+        decreasing (bool): whether items are sorted in decreasing order
+
+    Returns:
+        np.ndarray of int64: stable order of the items, top item first
+        np.ndarray of int64: 0-based min rank (ties.method='min') of every item
+        np.ndarray of int64: 0-based dense rank (index of the tie group)
+    """
+    n = len(a)
+    order = np.argsort(a, kind='mergesort')
+    if decreasing:
+        # reverse the order, then every tie group back to its original order
+        order = order[::-1].copy()
+        k = 0
+        while k < n:
+            g = k + 1
+            while g < n and a[order[g]] == a[order[k]]:
+                g += 1
+            order[k:g] = order[k:g][::-1].copy()
+            k = g
+    mins = np.empty(n, np.int64)
+    dense = np.empty(n, np.int64)
+    start = 0
+    d = -1
+    for k in range(n):
+        i = order[k]
+        if k == 0 or a[i] != a[order[k-1]]:
+            start = k
+            d += 1
+        mins[i] = start
+        dense[i] = d
+    return order, mins, dense
+
+
+@nb.njit(cache=True)
+def _tie_sizes(order, mins):
+    """Size of the tie group of every item, from the order and min ranks"""
+    n = len(order)
+    t = np.empty(n, np.int64)
+    k = 0
+    while k < n:
+        g = k + 1
+        while g < n and mins[order[g]] == mins[order[k]]:
+            g += 1
+        for m in range(k, g):
+            t[order[m]] = g - k
+        k = g
+    return t
+
+
+class RankedVector:
+    """Score vector with cached rank views
+
+    The views are computed on first use and kept for the lifetime of the
+    object. All ranks are 0-based, that is `stats.rankdata(keys, method) - 1`.
+    The scores are kept as given, without copy, unless their dtype is not one
+    the kernels are specialised for.
+
+    Inputs:
+        x (Iterable of numeric): input vector
+        decreasing (bool): whether items are sorted in decreasing order
+    """
+    __slots__ = ('values', 'decreasing', '_order', '_mins', '_dense',
+                 '_ordinal', '_tie_sizes')
+
+    def __init__(self, x, decreasing=True):
+        self._set_values(_check_types(x, 'x'), decreasing)
+
+    @classmethod
+    def _from_checked(cls, x, decreasing):
+        obj = cls.__new__(cls)
+        obj._set_values(x, decreasing)
+        return obj
+
+    def _set_values(self, x, decreasing):
+        self.values = as_kernel_array(x)
+        self.decreasing = decreasing
+        self._order = self._mins = self._dense = None
+        self._ordinal = self._tie_sizes = None
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return 'RankedVector(n={}, decreasing={})'.format(len(self),
+                                                          self.decreasing)
+
+    @stage('ranking')
+    def _rank(self):
+        self._order, self._mins, self._dense = _rank_views(self.values,
+                                                           self.decreasing)
+
+    @property
+    def keys(self):
+        """np.ndarray: scores to sort ascending, negated if decreasing"""
+        return -self.values if self.decreasing else self.values
+
+    @property
+    def order(self):
+        """np.ndarray: stable sort permutation, top item first"""
+        if self._order is None:
+            self._rank()
+        return self._order
+
+    @property
+    def mins(self):
+        """np.ndarray: min ranks (ties.method='min')"""
+        if self._mins is None:
+            self._rank()
+        return self._mins
+
+    @property
+    def dense(self):
+        """np.ndarray: dense ranks, that is the index of the tie group"""
+        if self._dense is None:
+            self._rank()
+        return self._dense
+
+    @property
+    def ordinal(self):
+        """np.ndarray: ordinal ranks (ties.method='first')"""
+        if self._ordinal is None:
+            self._ordinal = np.empty(len(self), np.int64)
+            self._ordinal[self.order] = np.arange(len(self))
+        return self._ordinal
+
+    @property
+    def tie_sizes(self):
+        """np.ndarray: size of the tie group of every item"""
+        if self._tie_sizes is None:
+            self._count_ties()
+        return self._tie_sizes
+
+    @stage('ranking')
+    def _count_ties(self):
+        self._tie_sizes = _tie_sizes(self.order, self.mins)
+
+    @property
+    def average(self):
+        """np.ndarray: average ranks (ties.method='average')"""
+        return self.mins + (self.tie_sizes - 1) / 2
+
+    @property
+    def has_ties(self):
+        """bool: whether the vector contains ties"""
+        return self.dense[self.order[-1]] < len(self) - 1
+
+
+def as_ranked(x, decreasing=True, arg_str='x', validate=True):
+    """Validate and wrap `x` as a `RankedVector`, unless it already is one
+
+    With `validate=False` the input is trusted to be a numeric vector.
+    """
+    if isinstance(x, RankedVector):
+        if x.decreasing != decreasing:
+            raise ValueError(
+                '[ERROR] {} was ranked with decreasing={}'.format(
+                    arg_str, x.decreasing)
+            )
+        return x
+    if validate:
+        x = _check_types(x, arg_str)
+    return RankedVector._from_checked(x, decreasing)
+
+
+def check_ranked(x, y, check_type='default', decreasing=None, validate=True):
+    """Validate a pair of inputs, returning `RankedVector`
+
+    `check_type` is 'default' when neither vector may contain ties, 'a' when
+    only `y` may, and 'b' when both may. When `decreasing` is None, the
+    orientation is taken from the inputs that are already ranked, and is
+    otherwise irrelevant (as for Kendall tau). With `validate=False` the inputs
+    are trusted to be numeric vectors satisfying `check_type`, and only their
+    lengths are checked.
+    """
+    if decreasing is None:
+        ranked = [v for v in (x, y) if isinstance(v, RankedVector)]
+        decreasing = ranked[0].decreasing if ranked else False
+    x = as_ranked(x, decreasing, 'x', validate)
+    y = as_ranked(y, decreasing, 'y', validate)
+    if len(x) != len(y):
+        raise ValueError('[ERROR] x and y must be of the same length')
+
+    if validate:
+        if check_type in ('default', 'a') and x.has_ties:
+            raise ValueError('[ERROR] x contains ties')
+        if check_type == 'default' and y.has_ties:
+            raise ValueError('[ERROR] y contains ties.')
+    inputs(x, y)
+    return x, y
+
+
+def ranked_inputs(check_type='default'):
+    """Decorator validating and ranking the inputs of a coefficient function
+
+    The decorated function receives `x` and `y` as `RankedVector` in the
+    orientation given by `decreasing`, and accepts `validate=False` to trust
+    pre-checked inputs.
+    """
+    def real_ranked_inputs(func):
+        @functools.wraps(func)
+        def wrapper(x, y, decreasing=True, *args, validate=True, **kwargs):
+            # estimates from samples do not sort the inputs to look for ties
+            checks = 'b' if kwargs.get('approximate') else check_type
+            x, y = check_ranked(x, y, checks, decreasing, validate)
+            return func(x, y, decreasing, *args, **kwargs)
+        return wrapper
+    return real_ranked_inputs
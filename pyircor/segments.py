@@ -0,0 +1,125 @@
+"""
+Segmented Correlations
+
+`corr_segments` computes one rank correlation coefficient per group of a flat
+table, as is for instance the case of the scores of the documents retrieved for
+every query of a run. The groups are given as CSR-style offsets into flat `x`
+and `y` vectors, so that group `g` is made of the items `offsets[g]` to
+`offsets[g+1] - 1`, and `group_offsets` computes them from a column of group
+ids sorted by group.
+
+All groups are ranked and computed in a single numba pass, in parallel with the
+threads set in `pyircor.config`, working on slices of the flat vectors. NumPy
+arrays and Arrow arrays without nulls are used without copy as long as their
+dtype is one the kernels are specialised for.
+"""
+
+import numba as nb
+import numpy as np
+
+from .check import _check_types
+from .config import threads
+from .matrix import _check_measure, _pair_coef
+from .ranks import _rank_views
+from .tau import _tau_counts_ranked, _tau_from_counts, _tau_b_from_counts
+
+
+@nb.njit(cache=True, parallel=True)
+def _corr_segments(code, x, y, offsets, decreasing):
+    """Coefficients between `x` and `y` in every group
+
+    Also returns whether each group contains ties in `x` and in `y`. Groups of
+    less than two items are NaN.
+    """
+    k = len(offsets) - 1
+    out = np.full(k, np.nan)
+    ties_x = np.zeros(k, np.bool_)
+    ties_y = np.zeros(k, np.bool_)
+    for g in nb.prange(k):
+        a = offsets[g]
+        n = offsets[g+1] - a
+        if n < 2:
+            continue
+        xg = x[a:a+n]
+        yg = y[a:a+n]
+        ox, px, dx = _rank_views(xg, decreasing)
+        ties_x[g] = dx[ox[n-1]] < n - 1
+        if code <= 1:
+            c, d, tx, ty = _tau_counts_ranked(ox, px, yg, decreasing)
+            ties_y[g] = ty > 0
+            if code == 0:
+                out[g] = _tau_from_counts(n, c, d)
+            else:
+                out[g] = _tau_b_from_counts(n, c, d, tx, ty)
+            continue
+
+        oy, py, dy = _rank_views(yg, decreasing)
+        ties_y[g] = dy[oy[n-1]] < n - 1
+        out[g] = _pair_coef(code, ox, px, dx, yg, oy, py, decreasing)
+        if code == 4:
+            reverse = _pair_coef(code, oy, py, dy, xg, ox, px, decreasing)
+            out[g] = (out[g] + reverse) / 2
+    return out, ties_x, ties_y
+
+
+def _check_offsets(offsets, n):
+    offsets = np.asarray(offsets)
+    if (offsets.dtype.kind not in 'iu' or offsets.ndim != 1 or
+            len(offsets) < 2 or offsets[0] != 0 or offsets[-1] != n or
+            np.any(np.diff(offsets) < 0)):
+        raise ValueError('[ERROR] offsets must be non-decreasing integers '
+                         'from 0 to the length of x')
+    return offsets.astype(np.int64, copy=False)
+
+
+def group_offsets(ids):
+    """CSR-style Offsets of the Groups of a Sorted Column of Ids
+
+    Inputs:
+        ids (array-like): group id of every item, with the items of every group
+                          contiguous
+
+    Returns:
+        np.ndarray of int64: (groups + 1,) offsets of the groups.
+    """
+    ids = np.asarray(ids)
+    if ids.ndim != 1 or len(ids) == 0:
+        raise ValueError('[ERROR] ids must be a non-empty vector')
+    starts = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+    return np.r_[0, starts, len(ids)].astype(np.int64)
+
+
+def corr_segments(x, y, offsets, method='tauap_b', decreasing=True):
+    """Correlation Coefficients within Every Group
+
+    Inputs:
+        x (array-like of numeric): flat vector with the items of every group,
+                                   the true scores for the `_a` coefficients
+        y (array-like of numeric): flat vector for comparison
+        offsets (array-like of int): (groups + 1,) offsets of the groups in `x`
+                                     and `y`, from 0 to their length
+        method (str): coefficient to compute, one of 'tau', 'tau_a', 'tau_b',
+                      'tauap', 'tauap_a' or 'tauap_b'
+        decreasing (bool): whether items are sorted in decreasing order
+
+    Returns:
+        np.ndarray: (groups,) vector with the coefficient of every group, NaN
+                    for groups of less than two items.
+    """
+    check_type, code, _ = _check_measure(method)
+    x = _check_types(x, 'x')
+    y = _check_types(y, 'y')
+    if len(x) != len(y):
+        raise ValueError('[ERROR] x and y must be of the same length')
+    offsets = _check_offsets(offsets, len(x))
+
+    with threads():
+        out, ties_x, ties_y = _corr_segments(code, x, y, offsets, decreasing)
+    if check_type != 'b':
+        ties = ties_x | ties_y if check_type == 'default' else ties_x
+        if np.any(ties):
+            raise ValueError(
+                '[ERROR] groups {} contain ties'.format(
+                    np.flatnonzero(ties).tolist())
+            )
+    return out
@@ -5,29 +5,89 @@ Kendall `\tau` Rank Correlation Coefficients
 items. `\tau_a` and `tau_b` are the versions developed to cope with ties under the
 scenarios of accuracy and agreement, respectively. See the references for details.
 
+By default the coefficients are computed in O(n log n) with the merge sort
+algorithm by Knight [2]. The original pairwise kernels are kept as reference
+and can be selected with `method='naive'`. Large inputs are processed with
+parallel kernels, see `pyircor.config`. With `approximate=True` the
+coefficients are instead estimated from random pairs until their confidence
+interval is narrower than `tol`, see `pyircor.approximate`.
+
 .. [1] M.G. Kendall (1970). Rank Correlation Methods. Charles Griffin & Company Limited.
+
+.. [2] W.R. Knight (1966). A Computer Method for Calculating Kendall's Tau
+    with Ungrouped Data. Journal of the American Statistical Association.
 """
 
 import numba as nb
 import numpy as np
-from .check import check, check_a, check_b
+from .approximate import tau as _approx_tau, tau_b as _approx_tau_b
+from .cache import cached
+from .config import threads, use_parallel
+from .instrument import instrumented
+from .ranks import _rank_views, check_ranked
+from .tauap import _concordant_above_parallel
+
+
+METHODS = ('fast', 'naive')
+
 
+def _check_method(method):
+    if method not in METHODS:
+        raise ValueError(
+            '[ERROR] method must be one of {}'.format(METHODS)
+        )
 
-def tau(x, y):
+
+@cached('tau')
+@instrumented('tau')
+def tau(x, y, method='fast', validate=True, approximate=False, tol=.01,
+        confidence=.95, seed=None):
     """Kendall :math:`\tau` Rank Correlation Coefficients
 
     Inputs:
-        x (Iterable of numeric): input vector
-        y (Iterable of numeric): another vector for comparison
-    
+        x (Iterable of numeric or RankedVector): input vector
+        y (Iterable of numeric or RankedVector): another vector for comparison
+        method (str): 'fast' for the merge sort algorithm, 'naive' for the
+                      pairwise reference implementation
+        validate (bool): whether to validate the inputs, or trust them
+        approximate (bool): whether to estimate the coefficient from random
+                            pairs, without checking for ties
+        tol (float): half-width of the confidence interval of the estimate
+        confidence (float): confidence level of the interval of the estimate
+        seed (int or None): seed of the random pairs
+
     Returns:
-        float: the correlation coefficient.
+        float: the correlation coefficient, or an `approximate.Estimate`.
+    """
+    _check_method(method)
+    if approximate:
+        x, y = check_ranked(x, y, 'b', validate=validate)
+        return _approx_tau(x.values, y.values, tol, confidence, seed=seed)
+    x, y = check_ranked(x, y, 'default', validate=validate)
+    if method == 'naive':
+        return _tau(x.keys, y.keys)
+    c, d, _, _ = _pair_counts(x, y)
+    return _tau_from_counts(len(x), c, d)
+
+
+def _pair_counts(x, y):
+    """Concordant, discordant and tied pair counts of two `RankedVector`
+
+    Large inputs count the concordant and discordant pairs with the parallel
+    kernel of `tauap`, walking `y` in the order of `x` one tie group at a time.
     """
-    x, y = check(x, y)
-    return _tau(x, y)
+    if not use_parallel(len(x)):
+        return _tau_counts_ranked(x.order, x.mins, y.values, y.decreasing)
+    with threads():
+        c = _concordant_above_parallel(y.dense, x.order, x.mins).sum()
+        reverse = y.dense[y.order[-1]] - y.dense
+        d = _concordant_above_parallel(reverse, x.order, x.mins).sum()
+    tx = (x.tie_sizes - 1).sum() // 2
+    ty = (y.tie_sizes - 1).sum() // 2
+    return c, d, tx, ty
 
 
-@nb.njit('f8(f8[:], f8[:])')
+@nb.njit(cache=True)
 def _tau(x, y):
     """Helper function for faster computation"""
     n = len(x)
@@ -41,35 +101,62 @@ def _tau(x, y):
     return numerator / nn
 
 
-def tau_a(x, y):
+@cached('tau_a')
+@instrumented('tau_a')
+def tau_a(x, y, method='fast', validate=True):
     """Kendall :math:`\tau_a` Rank Correlation Coefficients
 
     Inputs:
-        x (Iterable of numeric): true scores
-        y (Iterable of numeric): estimated scores for comparison
-    
+        x (Iterable of numeric or RankedVector): true scores
+        y (Iterable of numeric or RankedVector): estimated scores for
+                                 comparison
+        method (str): 'fast' for the merge sort algorithm, 'naive' for the
+                      pairwise reference implementation
+        validate (bool): whether to validate the inputs, or trust them
+
     Returns:
         float: the correlation coefficient.
     """
-    x, y = check_a(x, y)
-    return _tau(x, y)
+    _check_method(method)
+    x, y = check_ranked(x, y, 'a', validate=validate)
+    if method == 'naive':
+        return _tau(x.keys, y.keys)
+    c, d, _, _ = _pair_counts(x, y)
+    return _tau_from_counts(len(x), c, d)
 
 
-def tau_b(x, y):
+@cached('tau_b')
+@instrumented('tau_b')
+def tau_b(x, y, method='fast', validate=True, approximate=False, tol=.01,
+          confidence=.95, seed=None):
     """Kendall :math:`\tau_b` Rank Correlation Coefficients
 
     Inputs:
-        x (Iterable of numeric): input vector
-        y (Iterable of numeric): another vector for comparison
-    
+        x (Iterable of numeric or RankedVector): input vector
+        y (Iterable of numeric or RankedVector): another vector for comparison
+        method (str): 'fast' for the merge sort algorithm, 'naive' for the
+                      pairwise reference implementation
+        validate (bool): whether to validate the inputs, or trust them
+        approximate (bool): whether to estimate the coefficient from random
+                            pairs
+        tol (float): half-width of the confidence interval of the estimate
+        confidence (float): confidence level of the interval of the estimate
+        seed (int or None): seed of the random pairs
+
     Returns:
-        float: the correlation coefficient.
+        float: the correlation coefficient, or an `approximate.Estimate`.
     """
-    x, y = check_b(x, y)
-    return _tau_b(x, y)
+    _check_method(method)
+    x, y = check_ranked(x, y, 'b', validate=validate)
+    if approximate:
+        return _approx_tau_b(x.values, y.values, tol, confidence, seed=seed)
+    if method == 'naive':
+        return _tau_b(x.keys, y.keys)
+    c, d, tx, ty = _pair_counts(x, y)
+    return _tau_b_from_counts(len(x), c, d, tx, ty)
 
 
-@nb.njit('f8(f8[:], f8[:])')
+@nb.njit(cache=True)
 def _tau_b(x, y):
     """Helper function for faster computation"""
     n = len(x)
@@ -86,4 +173,129 @@ def _tau_b(x, y):
                 ty += 1
 
     nn = n * (n-1) / 2
-    return numerator / (nn - tx)**.5 / (nn - ty)**.5
\ No newline at end of file
+    return numerator / (nn - tx)**.5 / (nn - ty)**.5
+
+
+@nb.njit(cache=True)
+def _tau_from_counts(n, c, d):
+    """Kendall tau (or tau_a) from the concordant and discordant pair counts"""
+    nn = n * (n-1) / 2
+    return (c - d) / nn
+
+
+@nb.njit(cache=True, error_model='numpy')
+def _tau_b_from_counts(n, c, d, tx, ty):
+    """Kendall tau_b from the pair counts, `tx` and `ty` the tied pairs"""
+    nn = n * (n-1) / 2
+    return (c - d) / (nn - tx)**.5 / (nn - ty)**.5
+
+
+@nb.njit(cache=True)
+def _tied_pairs(a):
+    """Number of tied pairs in a sorted vector"""
+    n = len(a)
+    ties = 0
+    i = 0
+    while i < n:
+        j = i + 1
+        while j < n and a[j] == a[i]:
+            j += 1
+        t = j - i
+        ties += t * (t-1) // 2
+        i = j
+    return ties
+
+
+@nb.njit(cache=True)
+def _sort_count_swaps(a, buf):
+    """Sort `a` in place with a bottom-up merge sort, counting the swaps
+
+    `buf` is a scratch array of the same length. The number of swaps is the
+    number of pairs `i < j` with `a[i] > a[j]` in the original order.
+    """
+    n = len(a)
+    src = a
+    dst = buf
+    swaps = 0
+    width = 1
+    while width < n:
+        for lo in range(0, n, 2 * width):
+            mid = min(lo + width, n)
+            hi = min(lo + 2 * width, n)
+            i = lo
+            j = mid
+            k = lo
+            while i < mid and j < hi:
+                if src[j] < src[i]:
+                    dst[k] = src[j]
+                    swaps += mid - i
+                    j += 1
+                else:
+                    dst[k] = src[i]
+                    i += 1
+                k += 1
+            while i < mid:
+                dst[k] = src[i]
+                i += 1
+                k += 1
+            while j < hi:
+                dst[k] = src[j]
+                j += 1
+                k += 1
+        src, dst = dst, src
+        width *= 2
+
+    if src is not a:
+        a[:] = src
+    return swaps
+
+
+@nb.njit(cache=True)
+def _tau_counts_ranked(ox, px, y, decreasing):
+    """Pair counts by Knight's algorithm, with `x` already sorted
+
+    `ox` and `px` are the order and the 0-based min ranks of `x`, so that the
+    same `x` can be compared with many `y` while being sorted only once. They
+    follow `decreasing`, and so is `y` read.
+
+    Returns the number of concordant and discordant pairs, and the number of
+    pairs tied in `x` and in `y`, respectively.
+    """
+    n = len(y)
+    # sort by x, breaking ties by y, sorting each tie group of x on its own
+    ys = y[ox]
+    if decreasing:
+        for k in range(n):
+            ys[k] = -ys[k]
+    tx = 0
+    txy = 0
+    k = 0
+    while k < n:
+        g = k + 1
+        while g < n and px[ox[g]] == px[ox[k]]:
+            g += 1
+        t = g - k
+        if t > 1:
+            ys[k:g] = np.sort(ys[k:g])
+            tx += t * (t-1) // 2
+            txy += _tied_pairs(ys[k:g])
+        k = g
+
+    # within tied x the y are already sorted, so every swap is discordant
+    d = _sort_count_swaps(ys, np.empty_like(ys))
+    ty = _tied_pairs(ys)
+
+    nn = n * (n-1) // 2
+    c = nn - tx - ty + txy - d
+    return c, d, tx, ty
+
+
+@nb.njit(cache=True)
+def _tau_counts(x, y):
+    """Pair counts by Knight's algorithm
+
+    Returns the number of concordant and discordant pairs, and the number of
+    pairs tied in `x` and in `y`, respectively.
+    """
+    ox, px, _ = _rank_views(x, False)
+    return _tau_counts_ranked(ox, px, y, False)
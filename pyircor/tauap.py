@@ -6,6 +6,15 @@ contain tied items. `tauap_a` and `tauap_b` are the versions developed by Urbano
 Marrero to cope with ties under the scenarios of accuracy and agreement, respectively. See the
 references for details.
 
+By default the coefficients walk the items in the order of `y`, one tie group
+at a time, and count the concordant items above each one with a binary indexed
+(Fenwick) tree over the ranks of `x`, which takes O(n log n). The original
+pairwise kernels are kept as reference and can be selected with
+`method='naive'`. Large inputs are processed with parallel kernels, see
+`pyircor.config`. With `approximate=True`, `tauap` is instead estimated from
+random pivots until its confidence interval is narrower than `tol`, see
+`pyircor.approximate`.
+
 Note that the sorting order is decreasing by default, as should be for instance if the scores
 represent the effectiveness of systems. When the sorting order is ascending, as is for instance when the vectors represent ranks, the parameter
 `decreasing` must be set to `False`
@@ -17,29 +26,58 @@ represent the effectiveness of systems. When the sorting order is ascending, as
 """
 
 import numpy as np
-from scipy import stats
 import numba as nb
 
-from .check import check_inputs
+from .approximate import tauap as _approx_tauap
+from .cache import cached
+from .config import threads, use_parallel
+from .instrument import instrumented
+from .ranks import as_ranked, ranked_inputs
+
+
+METHODS = ('fast', 'naive')
+
+
+def _check_method(method):
+    if method not in METHODS:
+        raise ValueError(
+            '[ERROR] method must be one of {}'.format(METHODS)
+        )
 
 
-@check_inputs('default')
-def tauap(x, y, decreasing=True):
+@cached('tauap')
+@instrumented('tauap')
+@ranked_inputs('default')
+def tauap(x, y, decreasing=True, method='fast', approximate=False, tol=.01,
+          confidence=.95, seed=None):
     """AP Rank Correlation Coefficient
 
     Inputs:
-        x (Iterable of numeric): input vector
-        y (Iterable of numeric): another vector for comparison
-    
+        x (Iterable of numeric or RankedVector): input vector
+        y (Iterable of numeric or RankedVector): another vector for comparison
+        decreasing (bool): whether items are sorted in decreasing order
+        method (str): 'fast' for the Fenwick tree algorithm, 'naive' for the
+                      pairwise reference implementation
+        validate (bool): whether to validate the inputs, or trust them
+        approximate (bool): whether to estimate the coefficient from random
+                            pivots, without checking for ties
+        tol (float): half-width of the confidence interval of the estimate
+        confidence (float): confidence level of the interval of the estimate
+        seed (int or None): seed of the random pivots
+
     Returns:
-        float: the correlation coefficient.   
+        float: the correlation coefficient, or an `approximate.Estimate`.
     """
-    rx = stats.rankdata(x)
-    ry = stats.rankdata(y)
-    return _tauap(x, y, rx, ry)
+    _check_method(method)
+    if approximate:
+        return _approx_tauap(x.values, y.values, decreasing, tol, confidence,
+                             seed=seed)
+    if method == 'naive':
+        return _tauap(x.keys, y.keys, x.average + 1, y.average + 1)
+    return _tauap_value(_count_above(x, y), y)
         
 
-@nb.njit('f8(f8[:], f8[:], f8[:], f8[:])')
+@nb.njit(cache=True)
 def _tauap(x, y, rx, ry):
     """Helper function for faster computation"""
     n = len(rx)
@@ -54,25 +92,365 @@ def _tauap(x, y, rx, ry):
     return (2 * numerator / (n-1)) - 1
 
 
-@check_inputs('a')
-def tauap_a(x, y, decreasing=True):
+@nb.njit(cache=True)
+def _concordant_above(dx, oy, py):
+    """Number of concordant items above every item
+
+    Items are walked in the order `oy` of `y`, one tie group of `y` at a time.
+    For every item, the items in the groups already visited (strictly above it
+    in `y`) that also have a strictly lower dense rank `dx` in `x` are counted
+    with a binary indexed tree over `dx`.
+    """
+    n = len(dx)
+    tree = np.zeros(n + 1, np.int64)
+    c = np.empty(n, np.int64)
+    k = 0
+    while k < n:
+        # the tie group of `y` starting at position k
+        g = k + 1
+        while g < n and py[oy[g]] == py[oy[k]]:
+            g += 1
+
+        for m in range(k, g):
+            i = oy[m]
+            s = 0
+            r = dx[i]
+            while r > 0:
+                s += tree[r]
+                r -= r & -r
+            c[i] = s
+
+        # only insert once the whole group is counted, as ties are not above
+        for m in range(k, g):
+            r = dx[oy[m]] + 1
+            while r <= n:
+                tree[r] += 1
+                r += r & -r
+        k = g
+    return c
+
+
+@nb.njit(cache=True)
+def _concordant_discordant_above(dx, oy, py):
+    """Concordant items above every item, and the total of discordant ones
+
+    Same walk as `_concordant_above`, also counting the items in the groups
+    above with a strictly higher dense rank `dx`, that is the discordant pairs.
+    """
+    n = len(dx)
+    tree = np.zeros(n + 1, np.int64)
+    c = np.empty(n, np.int64)
+    d = 0
+    k = 0
+    while k < n:
+        g = k + 1
+        while g < n and py[oy[g]] == py[oy[k]]:
+            g += 1
+
+        for m in range(k, g):
+            i = oy[m]
+            s = 0
+            r = dx[i]
+            while r > 0:
+                s += tree[r]
+                r -= r & -r
+            c[i] = s
+            # the k items above, minus those with a lower or the same rank
+            s = 0
+            r = dx[i] + 1
+            while r > 0:
+                s += tree[r]
+                r -= r & -r
+            d += k - s
+        for m in range(k, g):
+            r = dx[oy[m]] + 1
+            while r <= n:
+                tree[r] += 1
+                r += r & -r
+        k = g
+    return c, d
+
+
+@nb.njit(cache=True, parallel=True)
+def _concordant_above_parallel(dx, oy, py):
+    """Number of concordant items above every item, in parallel blocks
+
+    Same result as `_concordant_above`. The dense ranks `dx` are split in K
+    buckets and the order of `y` in K blocks, aligned to the tie groups of `y`,
+    with K about the square root of n. The concordant items above an item are
+    then
+
+    - those in the same bucket, counted walking every bucket on its own with a
+      binary indexed tree over the ranks within the bucket, plus
+    - those in a lower bucket, counted from the histograms of the blocks above
+      plus a binary indexed tree over the buckets walking every block on its
+      own.
+
+    Buckets and blocks are processed in parallel, and the counts are integers,
+    so the result does not depend on the number of threads.
+    """
+    n = len(dx)
+    K = max(1, int(np.sqrt(n)))
+    W = (n + K - 1) // K  # bucket width, so that dx // W < K
+    c = np.zeros(n, np.int64)
+
+    # stable counting sort of the order of y by bucket
+    bstart = np.zeros(K + 1, np.int64)
+    for m in range(n):
+        bstart[dx[oy[m]] // W + 1] += 1
+    for k in range(K):
+        bstart[k + 1] += bstart[k]
+    pos = bstart[:K].copy()
+    by_bucket = np.empty(n, np.int64)
+    for m in range(n):
+        i = oy[m]
+        k = dx[i] // W
+        by_bucket[pos[k]] = i
+        pos[k] += 1
+
+    # concordant items above within the same bucket
+    for k in nb.prange(K):
+        tree = np.zeros(W + 1, np.int64)
+        a = bstart[k]
+        e = bstart[k + 1]
+        while a < e:
+            g = a + 1
+            while g < e and py[by_bucket[g]] == py[by_bucket[a]]:
+                g += 1
+            for m in range(a, g):
+                i = by_bucket[m]
+                s = 0
+                r = dx[i] - k * W
+                while r > 0:
+                    s += tree[r]
+                    r -= r & -r
+                c[i] += s
+            for m in range(a, g):
+                r = dx[by_bucket[m]] - k * W + 1
+                while r <= W:
+                    tree[r] += 1
+                    r += r & -r
+            a = g
+
+    # blocks of the order of y, never splitting a tie group
+    L = (n + K - 1) // K
+    bounds = np.empty(K + 1, np.int64)
+    bounds[0] = 0
+    for b in range(1, K + 1):
+        s = min(max(b * L, bounds[b-1]), n)
+        while 0 < s < n and py[oy[s]] == py[oy[s-1]]:
+            s += 1
+        bounds[b] = s
+
+    # above[b, k]: items in blocks above b with bucket lower than k
+    above = np.zeros((K, K + 1), np.int64)
+    for b in nb.prange(K):
+        for m in range(bounds[b], bounds[b+1]):
+            above[b, dx[oy[m]] // W + 1] += 1
+    for k in nb.prange(K + 1):
+        acc = 0
+        for b in range(K):
+            v = above[b, k]
+            above[b, k] = acc
+            acc += v
+    for b in nb.prange(K):
+        for k in range(K):
+            above[b, k + 1] += above[b, k]
+
+    # concordant items above in lower buckets
+    for b in nb.prange(K):
+        tree = np.zeros(K + 1, np.int64)
+        a = bounds[b]
+        e = bounds[b+1]
+        while a < e:
+            g = a + 1
+            while g < e and py[oy[g]] == py[oy[a]]:
+                g += 1
+            for m in range(a, g):
+                i = oy[m]
+                s = above[b, dx[i] // W]
+                r = dx[i] // W
+                while r > 0:
+                    s += tree[r]
+                    r -= r & -r
+                c[i] += s
+            for m in range(a, g):
+                r = dx[oy[m]] // W + 1
+                while r <= K:
+                    tree[r] += 1
+                    r += r & -r
+            a = g
+    return c
+
+
+# floating point sums are reduced over chunks of fixed size, in order, so that
+# the serial and parallel versions of the kernels give bit-identical results
+CHUNK = 4096
+
+
+@nb.njit(cache=True)
+def _tauap_chunk(c, py, b):
+    """Partial numerator of tauap and items not in the top group, in chunk b"""
+    numerator = 0.
+    n_not_top = 0
+    for i in range(b * CHUNK, min(len(c), (b + 1) * CHUNK)):
+        if py[i] > 0:
+            numerator += c[i] / py[i]  # divide by p-1 instead of i-1
+            n_not_top += 1
+    return numerator, n_not_top
+
+
+@nb.njit(cache=True, error_model='numpy')
+def _tauap_reduce(numerator, n_not_top):
+    """Sum the partial results of the chunks in order"""
+    total = 0.
+    count = 0
+    for b in range(len(numerator)):
+        total += numerator[b]
+        count += n_not_top[b]
+    return (2 * total / count) - 1
+
+
+@nb.njit(cache=True, error_model='numpy')
+def _tauap_from_counts(c, py):
+    """tauap (or tauap_b in one direction) from the concordant counts above
+
+    Items in the top tie group of `y` are ignored, so that with no ties this is
+    the original `tauap` and with ties it is the `tauap_b` of `x` with respect
+    to `y`.
+    """
+    n_chunks = (len(c) + CHUNK - 1) // CHUNK
+    numerator = np.empty(n_chunks)
+    n_not_top = np.empty(n_chunks, np.int64)
+    for b in range(n_chunks):
+        numerator[b], n_not_top[b] = _tauap_chunk(c, py, b)
+    return _tauap_reduce(numerator, n_not_top)
+
+
+@nb.njit(cache=True, error_model='numpy', parallel=True)
+def _tauap_from_counts_parallel(c, py):
+    """Parallel version of `_tauap_from_counts`"""
+    n_chunks = (len(c) + CHUNK - 1) // CHUNK
+    numerator = np.empty(n_chunks)
+    n_not_top = np.empty(n_chunks, np.int64)
+    for b in nb.prange(n_chunks):
+        numerator[b], n_not_top[b] = _tauap_chunk(c, py, b)
+    return _tauap_reduce(numerator, n_not_top)
+
+
+@nb.njit(cache=True)
+def _harmonic(n):
+    """Prefix harmonic sums, h[k] = 1 + 1/2 + ... + 1/k"""
+    h = np.zeros(n + 1)
+    for k in range(1, n + 1):
+        h[k] = h[k-1] + 1 / k
+    return h
+
+
+@nb.njit(cache=True)
+def _tauap_a_chunk(c, py, t, h, b):
+    """Partial sum of tauap_a in chunk b"""
+    c_all = 0.
+    for i in range(b * CHUNK, min(len(c), (b + 1) * CHUNK)):
+        p = py[i]
+        ti = t[i]
+        # term II: concordants within the group across permutations, that is
+        # the sum of m / (p + m) for m = 1..t-1, shared among the t items
+        v = ((ti - 1) - p * (h[p + ti - 1] - h[p])) / 2
+        # term I: concordants above the group, averaged over the t positions
+        if p > 0:
+            v += c[i] * (h[p + ti - 1] - h[p - 1])
+        c_all += v / ti
+    return c_all
+
+
+@nb.njit(cache=True)
+def _tauap_a_reduce(partial, n):
+    """Sum the partial results of the chunks in order"""
+    c_all = 0.
+    for b in range(len(partial)):
+        c_all += partial[b]
+    return (2 / (n - 1) * c_all) - 1
+
+
+@nb.njit(cache=True)
+def _tauap_a_from_counts(c, py, t):
+    """tauap_a from the concordant counts above every item
+
+    `t` is the size of the tie group of `y` of every item. The expectation over
+    the positions a group may take is computed from prefix harmonic sums.
+    """
+    n = len(c)
+    h = _harmonic(n)
+    n_chunks = (n + CHUNK - 1) // CHUNK
+    partial = np.empty(n_chunks)
+    for b in range(n_chunks):
+        partial[b] = _tauap_a_chunk(c, py, t, h, b)
+    return _tauap_a_reduce(partial, n)
+
+
+@nb.njit(cache=True, parallel=True)
+def _tauap_a_from_counts_parallel(c, py, t):
+    """Parallel version of `_tauap_a_from_counts`"""
+    n = len(c)
+    h = _harmonic(n)
+    n_chunks = (n + CHUNK - 1) // CHUNK
+    partial = np.empty(n_chunks)
+    for b in nb.prange(n_chunks):
+        partial[b] = _tauap_a_chunk(c, py, t, h, b)
+    return _tauap_a_reduce(partial, n)
+
+
+def _count_above(x, y):
+    """Concordant items above every item of `y`, serial or in parallel"""
+    if use_parallel(len(x)):
+        with threads():
+            return _concordant_above_parallel(x.dense, y.order, y.mins)
+    return _concordant_above(x.dense, y.order, y.mins)
+
+
+def _tauap_value(c, y):
+    if use_parallel(len(c)):
+        with threads():
+            return _tauap_from_counts_parallel(c, y.mins)
+    return _tauap_from_counts(c, y.mins)
+
+
+def _tauap_a_value(c, y):
+    if use_parallel(len(c)):
+        with threads():
+            return _tauap_a_from_counts_parallel(c, y.mins, y.tie_sizes)
+    return _tauap_a_from_counts(c, y.mins, y.tie_sizes)
+
+
+@cached('tauap_a')
+@instrumented('tauap_a')
+@ranked_inputs('a')
+def tauap_a(x, y, decreasing=True, method='fast'):
     """AP-a Rank Correlation Coefficients
 
     Inputs:
-        x (Iterable of numeric): true scores
-        y (Iterable of numeric): estimated scores for comparison
-    
+        x (Iterable of numeric or RankedVector): true scores
+        y (Iterable of numeric or RankedVector): estimated scores for
+                                 comparison
+        decreasing (bool): whether items are sorted in decreasing order
+        method (str): 'fast' for the Fenwick tree algorithm, 'naive' for the
+                      pairwise reference implementation
+        validate (bool): whether to validate the inputs, or trust them
+
     Returns:
         float: the correlation coefficient.
     """
-    rx = stats.rankdata(x)
-    ry = stats.rankdata(y, 'ordinal')  # ties.method='first'
-    p = stats.rankdata(y, 'min') - 1
-    t = np.bincount(p)[p]  # uses large memory to speed up
-    return _tauap_a(rx, ry, p, t)
+    _check_method(method)
+    if method == 'fast':
+        return _tauap_a_value(_count_above(x, y), y)
+
+    rx = x.average + 1
+    ry = y.ordinal + 1  # ties.method='first'
+    return _tauap_a(rx, ry, y.mins, y.tie_sizes)
 
 
-@nb.njit('f8(f8[:], i8[:], i8[:], i8[:])')
+@nb.njit(cache=True)
 def _tauap_a(rx, ry, p, t):
     """
     """
@@ -107,29 +485,43 @@ def _tauap_a(rx, ry, p, t):
     return (2 / (n - 1) * c_all) - 1
 
 
-@check_inputs('b')
-def tauap_b(x, y, decreasing=True):
+@cached('tauap_b')
+@instrumented('tauap_b')
+@ranked_inputs('b')
+def tauap_b(x, y, decreasing=True, method='fast'):
     """AP-b Rank Correlation Coefficient
 
     Inputs:
-        x (Iterable of numeric): input vector
-        y (Iterable of numeric): another vector for comparison
-    
+        x (Iterable of numeric or RankedVector): input vector
+        y (Iterable of numeric or RankedVector): another vector for comparison
+        decreasing (bool): whether items are sorted in decreasing order
+        method (str): 'fast' for the Fenwick tree algorithm, 'naive' for the
+                      pairwise reference implementation
+        validate (bool): whether to validate the inputs, or trust them
+
     Returns:
-        float: the correlation coefficient.   
+        float: the correlation coefficient.
     """
-    return (tauap_b_ties(x, y) + tauap_b_ties(y, x)) / 2
+    # both directions reuse the rank views of each vector
+    return (tauap_b_ties(x, y, decreasing, method) +
+            tauap_b_ties(y, x, decreasing, method)) / 2
 
 
-def tauap_b_ties(x, y, decreasing=True):
+def tauap_b_ties(x, y, decreasing=True, method='fast'):
     """Helper function"""
-    rx = stats.rankdata(x)
-    ry = stats.rankdata(y, 'ordinal')  # ties.method = 'first'
-    p = stats.rankdata(y, 'min') - 1 # ties.method = 'min'
+    _check_method(method)
+    x = as_ranked(x, decreasing, 'x')
+    y = as_ranked(y, decreasing, 'y')
+    if method == 'fast':
+        return _tauap_value(_count_above(x, y), y)
+
+    rx = x.average + 1
+    ry = y.ordinal + 1  # ties.method = 'first'
+    p = y.mins  # ties.method = 'min'
     return _tauap_b_ties(rx, ry, p)
 
 
-@nb.njit('f8(f8[:], i8[:], i8[:])', error_model='numpy')
+@nb.njit(cache=True, error_model='numpy')
 def _tauap_b_ties(rx, ry, p):
     """Helper function for faster computation"""
     c_all = 0
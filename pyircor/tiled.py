@@ -0,0 +1,327 @@
+"""
+Tiled Correlation Matrices
+
+`corr_matrix` of `pyircor.matrix` for a number of rankings whose pairs take
+too long for one process, or for one uninterrupted run. The matrix is split in
+square tiles of `tile` rows and columns, computed by a pool of worker
+processes, and every finished tile is saved as a file, so that an interrupted
+job resumes from the tiles it has not finished yet. A job is a directory
+holding
+
+- meta.json: the method, order, shape and tile size, and a digest of the
+  rankings,
+- rankings.npy, order.npy, mins.npy, dense.npy: the rankings and their rank
+  views, validated and ranked once by `create`,
+- tiles/I-J.npy: the finished tile of row block I and column block J, I <= J,
+- matrix.npy: the (m, m) result, written by `assemble` once every tile is
+  finished.
+
+Workers map the rankings and rank views read-only, so they share them through
+the page cache, and run their kernels on a single thread, so that `n_workers`
+bounds the cores used. Only the tiles of the upper triangle are computed, each
+holding both directions for `tauap` and `tauap_a`. Tiles are saved under a
+temporary name and renamed, so a tile file is either complete or absent, and
+none is ever written twice at the same path by two processes, even when
+several nodes split the tiles of a job on a shared filesystem. The temporary
+files left by a killed worker are removed when its node runs the job again:
+
+    tiled.create('/shared/job', X, method='tauap_b')
+    tiled.run('/shared/job', node=k, nodes=4)  # on each of 4 nodes
+    M = tiled.assemble('/shared/job')
+
+`corr_matrix` does the three steps on one node, resuming the job if the
+directory already holds it.
+"""
+
+import concurrent.futures
+import hashlib
+import json
+import multiprocessing
+import os
+
+import numpy as np
+
+from . import config
+from .config import threads
+from .matrix import _check_matrix, _check_measure, _corr_pairs, _rank_checked
+
+
+VIEWS = ('rankings', 'order', 'mins', 'dense')
+
+# job directory and description -> its arrays, mapped once by every worker
+_WORKER = {}
+
+
+def _digest(X):
+    return hashlib.sha1(np.ascontiguousarray(X).view(np.uint8)).hexdigest()
+
+
+def _read_meta(path):
+    try:
+        with open(os.path.join(path, 'meta.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise ValueError(
+            '[ERROR] {} is not a tiled job, see create'.format(path))
+
+
+def _tile_path(path, i, j):
+    return os.path.join(path, 'tiles', '{}-{}.npy'.format(i, j))
+
+
+def _n_blocks(meta):
+    return -(-meta['m'] // meta['tile'])
+
+
+def tiles(meta):
+    """Every tile (I, J) of a job, I <= J, in the order they are scheduled
+
+    Inputs:
+        meta (dict): description of the job, as returned by `create`
+
+    Returns:
+        list of tuple: the row and column blocks of every tile.
+    """
+    b = _n_blocks(meta)
+    return [(i, j) for i in range(b) for j in range(i, b)]
+
+
+def create(path, X, method='tauap_b', decreasing=True, tile=256):
+    """Create a tiled job, or check that an existing one is the same
+
+    Inputs:
+        path (str): directory of the job, created if it does not exist
+        X (array-like of numeric): (m, n) matrix with one ranking per row
+        method (str): coefficient to compute, one of 'tau', 'tau_a', 'tau_b',
+                      'tauap', 'tauap_a' or 'tauap_b'
+        decreasing (bool): whether items are sorted in decreasing order
+        tile (int): number of rows and columns of a tile
+
+    Returns:
+        dict: description of the job, as saved in its meta.json.
+    """
+    check_type, _, _ = _check_measure(method)
+    if not isinstance(tile, (int, np.integer)) or tile < 1:
+        raise ValueError('[ERROR] tile must be a positive integer')
+    X = _check_matrix(X, 'X')
+    meta = {
+        'method': method,
+        'decreasing': bool(decreasing),
+        'm': X.shape[0],
+        'n': X.shape[1],
+        'tile': int(tile),
+        'digest': _digest(X),
+    }
+    if os.path.exists(os.path.join(path, 'meta.json')):
+        if _read_meta(path) != meta:
+            raise ValueError('[ERROR] {} holds another job'.format(path))
+        return meta
+
+    with threads():
+        views = (X,) + _rank_checked(X, check_type, 'X', decreasing)
+    os.makedirs(os.path.join(path, 'tiles'), exist_ok=True)
+    for name, a in zip(VIEWS, views):
+        np.save(os.path.join(path, name + '.npy'), a)
+    # written last, so that a job with a meta.json has all of its arrays
+    tmp = os.path.join(path, 'meta.json.{}.tmp'.format(os.getpid()))
+    with open(tmp, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(path, 'meta.json'))
+    return meta
+
+
+def pending(path):
+    """Tiles of a job that are not finished yet
+
+    Inputs:
+        path (str): directory of the job
+
+    Returns:
+        list of tuple: the row and column blocks of every missing tile.
+    """
+    meta = _read_meta(path)
+    return [t for t in tiles(meta) if not os.path.exists(_tile_path(path, *t))]
+
+
+def _remove_stale(path, own):
+    """Remove the temporary files of the tiles in `own` left by killed runs"""
+    tiles_dir = os.path.join(path, 'tiles')
+    for name in os.listdir(tiles_dir):
+        # I-J.PID.tmp
+        parts = name.split('.')
+        if len(parts) == 3 and parts[2] == 'tmp' and parts[0] in own:
+            try:
+                os.remove(os.path.join(tiles_dir, name))
+            except FileNotFoundError:
+                pass
+
+
+def _init_worker():
+    """Run the kernels on one thread, as the workers share the cores"""
+    config.set_config(n_jobs=1)
+
+
+def _compute_tile(path, i, j):
+    """Compute and save the tile (i, j) of the job at `path`"""
+    # the job, not only its directory, as a job may be created again at the
+    # same path
+    meta = _read_meta(path)
+    if _WORKER.get('path') != path or _WORKER.get('meta') != meta:
+        _WORKER.clear()
+        _WORKER['path'] = path
+        _WORKER['meta'] = meta
+        for name in VIEWS:
+            # plain arrays over the maps, which numba takes as read-only
+            _WORKER[name] = np.asarray(np.load(
+                os.path.join(path, name + '.npy'), mmap_mode='r'))
+    _, code, symmetric = _check_measure(meta['method'])
+    t = meta['tile']
+    rows = np.arange(i * t, min((i + 1) * t, meta['m']), dtype=np.int64)
+    cols = np.arange(j * t, min((j + 1) * t, meta['m']), dtype=np.int64)
+    rows_idx = np.repeat(rows, len(cols))
+    cols_idx = np.tile(cols, len(rows))
+    if not symmetric and i != j:
+        # a diagonal tile already holds both directions of its pairs
+        rows_idx, cols_idx = (np.concatenate([rows_idx, cols_idx]),
+                              np.concatenate([cols_idx, rows_idx]))
+
+    args = (_WORKER['rankings'], _WORKER['order'], _WORKER['mins'],
+            _WORKER['dense'])
+    with threads():
+        vals = _corr_pairs(code, *args, rows_idx, cols_idx,
+                           meta['decreasing'])
+    # [(i, j)] or [(i, j), (j, i).T]
+    block = vals.reshape(-1, len(rows), len(cols))
+    if meta['method'] == 'tauap_b':
+        # the mean of both directions, as `matrix.corr_matrix`
+        if i == j:
+            block = (block + block.transpose(0, 2, 1)) / 2
+        else:
+            block = (block[:1] + block[1:]) / 2
+    elif symmetric and i == j:
+        # the upper triangle mirrored, as `matrix.corr_matrix`, rather than the
+        # coefficients of the swapped pairs, which may differ in the last bit
+        block[0] = np.triu(block[0]) + np.triu(block[0], 1).T
+
+    out = _tile_path(path, i, j)
+    tmp = '{}.{}.tmp'.format(out[:-len('.npy')], os.getpid())
+    try:
+        with open(tmp, 'wb') as f:
+            np.save(f, block)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, out)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return i, j
+
+
+def run(path, n_workers=None, node=0, nodes=1, progress=None):
+    """Compute the unfinished tiles of a job
+
+    Tiles are shared between nodes by their index in `tiles`, node k computing
+    the tiles whose index is k modulo `nodes`. The temporary files of these
+    tiles, left by a run that was killed, are removed first, so a node must
+    not run the same job twice at once.
+
+    Inputs:
+        path (str): directory of the job, as made by `create`
+        n_workers (int or None): worker processes, all the cores by default,
+                                 or 1 to compute the tiles in this process
+        node (int): index of this node, from 0 to `nodes - 1`
+        nodes (int): number of nodes sharing the job
+        progress (callable or None): called with the tiles finished and the
+                                     tiles to compute after every tile
+
+    Returns:
+        int: the number of tiles computed.
+    """
+    if not isinstance(nodes, int) or nodes < 1 or not 0 <= node < nodes:
+        raise ValueError('[ERROR] node must be in 0..nodes-1')
+    meta = _read_meta(path)
+    own = [t for k, t in enumerate(tiles(meta)) if k % nodes == node]
+    _remove_stale(path, {'{}-{}'.format(*t) for t in own})
+    todo = [t for t in own if not os.path.exists(_tile_path(path, *t))]
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = min(n_workers, len(todo))
+
+    if n_workers <= 1:
+        for done, t in enumerate(todo, 1):
+            _compute_tile(path, *t)
+            if progress is not None:
+                progress(done, len(todo))
+        return len(todo)
+
+    # spawned rather than forked, as the thread pools of the kernels do not
+    # survive a fork
+    with concurrent.futures.ProcessPoolExecutor(
+            n_workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker) as pool:
+        futures = [pool.submit(_compute_tile, path, *t) for t in todo]
+        finished = concurrent.futures.as_completed(futures)
+        for done, future in enumerate(finished, 1):
+            future.result()
+            if progress is not None:
+                progress(done, len(todo))
+    return len(todo)
+
+
+def assemble(path):
+    """Assemble the finished tiles of a job into its matrix
+
+    Inputs:
+        path (str): directory of the job, every tile of which is finished
+
+    Returns:
+        np.memmap: (m, m) matrix of correlation coefficients, where element
+                   (i, j) is the coefficient with `X[i]` as `x` and `X[j]` as
+                   `y`, mapped from matrix.npy in the directory of the job.
+    """
+    missing = pending(path)
+    if missing:
+        raise ValueError(
+            '[ERROR] {} tiles are not finished'.format(len(missing)))
+    meta = _read_meta(path)
+    t = meta['tile']
+    tmp = os.path.join(path, 'matrix.npy.{}.tmp'.format(os.getpid()))
+    out = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float64,
+                                    shape=(meta['m'], meta['m']))
+    for i, j in tiles(meta):
+        block = np.load(_tile_path(path, i, j))
+        rows = slice(i * t, i * t + block.shape[1])
+        cols = slice(j * t, j * t + block.shape[2])
+        out[rows, cols] = block[0]
+        if i != j:
+            # the second direction, or the same one if the coefficient is
+            # symmetric
+            out[cols, rows] = block[-1].T
+    out.flush()
+    del out
+    os.replace(tmp, os.path.join(path, 'matrix.npy'))
+    return np.load(os.path.join(path, 'matrix.npy'), mmap_mode='r')
+
+
+def corr_matrix(X, path, method='tauap_b', decreasing=True, tile=256,
+                n_workers=None, progress=None):
+    """Correlation Coefficients between All Pairs of Rows, in Resumable Tiles
+
+    Inputs:
+        X (array-like of numeric): (m, n) matrix with one ranking per row
+        path (str): directory of the job, resumed if it already holds the same
+                    one
+        method (str): coefficient to compute, one of 'tau', 'tau_a', 'tau_b',
+                      'tauap', 'tauap_a' or 'tauap_b'
+        decreasing (bool): whether items are sorted in decreasing order
+        tile (int): number of rows and columns of a tile
+        n_workers (int or None): worker processes, all the cores by default
+        progress (callable or None): see `run`
+
+    Returns:
+        np.memmap: (m, m) matrix of correlation coefficients, as `assemble`.
+    """
+    create(path, X, method, decreasing, tile)
+    run(path, n_workers, progress=progress)
+    return assemble(path)
@@ -0,0 +1,108 @@
+"""
+Ahead-of-time Warm-up of the Kernels
+
+The numba kernels are compiled lazily, on their first call, and persisted in
+numba's on-disk cache, so that later processes load them instead of compiling
+them again. The cache lives in the `__pycache__` directory of the package, or
+in `NUMBA_CACHE_DIR` if that variable is set, as is needed when the package is
+installed in a read-only location.
+
+`warmup` calls every kernel once on small inputs of the types the public
+functions use, so that running
+
+    python -m pyircor.warmup
+
+once, for instance while building a container image, fills the cache for every
+later process. Modules adding kernels add a call to the list in `warmup`.
+"""
+
+import time
+
+import numpy as np
+
+from . import (asymptotic, bootstrap, coefficients, curve, lowmem, matrix,
+               online, outofcore, permute, segments, tau, tauap)
+from .ranks import RankedVector
+
+
+def _online(x, y):
+    live = online.OnlineCorrelation(x)
+    for item, score in enumerate(y):
+        live.insert(item, score)
+    live.update(0, y[-1] + 1)
+    live.remove(0)
+    return live.tau_b()
+
+
+def warmup():
+    """Compile every kernel, filling numba's on-disk cache
+
+    Returns:
+        dict: seconds spent on the first call of every function.
+    """
+    x = np.arange(8, dtype=np.float64)
+    y = x[[1, 0, 2, 4, 3, 5, 7, 6]]
+    x_ties = np.round(x / 3)
+    y_ties = np.round(y / 3)
+    X = np.vstack([x, y])
+
+    rx = RankedVector(x)
+    ry = RankedVector(y_ties)
+    calls = [
+        ('tau', lambda: tau.tau(x, y)),
+        ('tau_a', lambda: tau.tau_a(x, y_ties)),
+        ('tau_b', lambda: tau.tau_b(x_ties, y_ties)),
+        ('tau_naive', lambda: tau.tau(x, y, method='naive')),
+        ('tau_b_naive', lambda: tau.tau_b(x_ties, y_ties, method='naive')),
+        ('tauap', lambda: tauap.tauap(x, y)),
+        ('tauap_a', lambda: tauap.tauap_a(x, y_ties)),
+        ('tauap_b', lambda: tauap.tauap_b(x_ties, y_ties)),
+        ('tauap_naive', lambda: tauap.tauap(x, y, method='naive')),
+        ('tauap_a_naive', lambda: tauap.tauap_a(x, y_ties, method='naive')),
+        ('tauap_b_naive', lambda: tauap.tauap_b(x_ties, y_ties,
+                                                method='naive')),
+        ('parallel', lambda: (
+            tauap._concordant_above_parallel(rx.dense, ry.order, ry.mins),
+            tauap._tauap_from_counts_parallel(ry.mins, ry.mins),
+            tauap._tauap_a_from_counts_parallel(ry.mins, ry.mins,
+                                                ry.tie_sizes),
+        )),
+        ('dtypes', lambda: [
+            (tau.tau_b(x.astype(dtype), y_ties.astype(dtype)),
+             tauap.tauap_a(x.astype(dtype), y_ties.astype(dtype)),
+             tauap.tauap_b(x_ties.astype(dtype), y_ties.astype(dtype)))
+            for dtype in (np.int32, np.int64, np.float32)
+        ]),
+        ('corr_matrix', lambda: matrix.corr_matrix(X, method='tau')),
+        ('corr_batch', lambda: matrix.corr_batch(x, X, method='tau')),
+        ('all_coefficients', lambda: coefficients.all_coefficients(x, y)),
+        ('permutation_test', lambda: permute.permutation_test(
+            x, y, n_permutations=10, batch_size=10, seed=0)),
+        ('expected_over_ties', lambda: [
+            permute.expected_over_ties(x_ties, y_ties, method)
+            for method in permute.EXPECTED_METHODS
+        ] + list(permute.permute_ties(y_ties))),
+        ('bootstrap_ci', lambda: bootstrap.bootstrap_ci(
+            X, X[::-1].copy(), n_resamples=10, batch_size=10, seed=0)),
+        ('online', lambda: _online(x, y)),
+        ('curve', lambda: (curve.tau_curve(x, y),
+                           curve.tauap_curve(x_ties, y_ties, 'tauap_b'))),
+        ('corr_segments', lambda: segments.corr_segments(
+            x_ties, y_ties, [0, 4, 8])),
+        ('outofcore', lambda: (outofcore.tau_b(x_ties, y_ties),
+                               outofcore.tauap(x, y))),
+        ('lowmem', lambda: (lowmem.tauap(x, y), lowmem.tauap_a(x, y_ties),
+                            lowmem.tauap_b(x_ties, y_ties))),
+        ('asymptotic', lambda: asymptotic.batch_test(x, X)),
+    ]
+    timings = {}
+    for name, call in calls:
+        start = time.perf_counter()
+        call()
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+if __name__ == '__main__':
+    for name, seconds in warmup().items():
+        print('{:<16}{:.3f}s'.format(name, seconds))
@@ -35,11 +35,11 @@ setup(
         'Programming Language :: Python :: 3.8',
     ],
     description="Python implementation of the R package `ircor`",
-    # entry_points={
-    #     'console_scripts': [
-    #         'pyircor=pyircor.cli:main',
-    #     ],
-    # },
+    entry_points={
+        'console_scripts': [
+            'pyircor=pyircor.cli:main',
+        ],
+    },
     install_requires=requirements,
     license="MIT license",
     long_description=readme + '\n\n' + history,
@@ -0,0 +1,83 @@
+import unittest
+
+import numpy as np
+
+from pyircor import approximate
+from pyircor.tau import tau, tau_b
+from pyircor.tauap import tauap
+
+
+class TestApproximate(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(1234)
+        self.x = rng.rand(20000)
+        self.y = self.x + rng.rand(20000)
+        self.x_ties = np.round(self.x * 10)
+        self.y_ties = np.round(self.y * 10)
+
+    def assertWithin(self, estimate, exact):
+        self.assertLessEqual(estimate.half_width, .02)
+        # twice the half-width, so that the test fails about never
+        self.assertLess(abs(estimate.estimate - exact),
+                        2 * estimate.half_width)
+
+    def test_tau(self):
+        for bound in approximate.BOUNDS:
+            est = approximate.tau(self.x, self.y, tol=.02, bound=bound,
+                                  seed=42)
+            self.assertWithin(est, tau(self.x, self.y))
+        est = tau(self.x, self.y, approximate=True, tol=.02, seed=42)
+        self.assertWithin(est, tau(self.x, self.y))
+
+    def test_tau_b(self):
+        exact = tau_b(self.x_ties, self.y_ties)
+        for bound in approximate.BOUNDS:
+            est = approximate.tau_b(self.x_ties, self.y_ties, tol=.02,
+                                    bound=bound, seed=42)
+            self.assertWithin(est, exact)
+        est = tau_b(self.x_ties, self.y_ties, approximate=True, tol=.02,
+                    seed=42)
+        self.assertWithin(est, exact)
+
+    def test_tauap(self):
+        for decreasing in [True, False]:
+            exact = tauap(self.x, self.y, decreasing)
+            for bound in approximate.BOUNDS:
+                est = approximate.tauap(self.x, self.y, decreasing, tol=.02,
+                                        bound=bound, seed=42)
+                self.assertWithin(est, exact)
+            est = tauap(self.x, self.y, decreasing, approximate=True, tol=.02,
+                        seed=42)
+            self.assertWithin(est, exact)
+
+    def test_seed(self):
+        a = tauap(self.x, self.y, approximate=True, seed=7)
+        b = tauap(self.x, self.y, approximate=True, seed=7)
+        self.assertEqual(a, b)
+
+    def test_max_samples(self):
+        est = approximate.tau(self.x, self.y, tol=.001, batch_size=1000,
+                              max_samples=5000, seed=42)
+        self.assertEqual(est.n_samples, 5000)
+        self.assertGreater(est.half_width, .001)
+
+    def test_ties_not_checked(self):
+        # the exact coefficient rejects ties, the estimate does not look
+        with self.assertRaises(ValueError):
+            tau(self.x_ties, self.y_ties)
+        tau(self.x_ties, self.y_ties, approximate=True, tol=.05)
+        tauap(self.x_ties, self.y_ties, approximate=True, tol=.05)
+
+    def test_options(self):
+        with self.assertRaises(ValueError):
+            approximate.tau(self.x, self.y, tol=0)
+        with self.assertRaises(ValueError):
+            approximate.tau(self.x, self.y, confidence=1)
+        with self.assertRaises(ValueError):
+            approximate.tau(self.x, self.y, bound='chernoff')
+        with self.assertRaises(ValueError):
+            approximate.tau(self.x, self.y[:10])
+
+
+if __name__ == '__main__':
+    unittest.main()
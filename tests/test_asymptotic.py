@@ -0,0 +1,86 @@
+import unittest
+
+import numpy as np
+from scipy import stats
+
+from pyircor import asymptotic
+from pyircor.matrix import corr_batch
+
+
+class TestAsymptotic(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(1234)
+        self.x = rng.rand(100)
+        self.y = self.x + 2 * rng.rand(100)
+        self.x_ties = np.round(self.x * 8)
+        self.y_ties = np.round(self.y * 4)
+        self.Y = np.round(rng.rand(20, 100) * 6)
+
+    def test_tau_test(self):
+        res = asymptotic.tau_test(self.x, self.y)
+        expected = stats.kendalltau(self.x, self.y, method='asymptotic')
+        self.assertAlmostEqual(res.statistic, expected.statistic)
+        self.assertAlmostEqual(res.pvalue, expected.pvalue)
+        n = len(self.x)
+        self.assertAlmostEqual(res.variance,
+                               2 * (2 * n + 5) / (9 * n * (n - 1)))
+
+    def test_tau_b_test(self):
+        res = asymptotic.tau_b_test(self.x_ties, self.y_ties)
+        expected = stats.kendalltau(self.x_ties, self.y_ties,
+                                    method='asymptotic')
+        self.assertAlmostEqual(res.statistic, expected.statistic)
+        self.assertAlmostEqual(res.pvalue, expected.pvalue)
+        self.assertAlmostEqual(res.zscore,
+                               res.statistic / np.sqrt(res.variance))
+
+        for alternative in ['greater', 'less']:
+            res = asymptotic.tau_b_test(self.x_ties, self.y_ties, alternative)
+            expected = stats.kendalltau(self.x_ties, self.y_ties,
+                                        method='asymptotic',
+                                        alternative=alternative)
+            self.assertAlmostEqual(res.pvalue, expected.pvalue)
+
+    def test_tauap_variance(self):
+        # exact null variance against the permutation distribution
+        rng = np.random.RandomState(4321)
+        for n in [4, 10]:
+            x = np.arange(n, dtype=float)
+            perms = np.argsort(rng.rand(100000, n), axis=1).astype(float)
+            null = corr_batch(x, perms, 'tauap')
+            self.assertAlmostEqual(null.var(), asymptotic._tauap_variance(n),
+                                   2)
+
+    def test_tauap_test(self):
+        res = asymptotic.tauap_test(self.x, self.y)
+        self.assertLess(res.pvalue, .001)
+        res_inc = asymptotic.tauap_test(-self.x, -self.y, decreasing=False)
+        self.assertAlmostEqual(res.zscore, res_inc.zscore)
+        res = asymptotic.tauap_test(self.x, -self.y, alternative='greater')
+        self.assertGreater(res.pvalue, .999)
+
+    def test_batch_test(self):
+        for method, test, x in [('tau', asymptotic.tau_test, self.x),
+                                ('tau_b', asymptotic.tau_b_test, self.x_ties),
+                                ('tauap', asymptotic.tauap_test, self.x)]:
+            Y = np.argsort(self.Y, axis=1) if method != 'tau_b' else self.Y
+            res = asymptotic.batch_test(x, Y, method)
+            for k, y in enumerate(Y):
+                expected = test(x, y)
+                for field in expected._fields:
+                    self.assertAlmostEqual(getattr(res, field)[k],
+                                           getattr(expected, field))
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            asymptotic.tau_test(self.x_ties, self.y_ties)
+        with self.assertRaises(ValueError):
+            asymptotic.tau_b_test(self.x, self.y, alternative='both')
+        with self.assertRaises(ValueError):
+            asymptotic.tau_b_test(self.x[:2], self.y[:2])
+        with self.assertRaises(ValueError):
+            asymptotic.batch_test(self.x, self.Y, 'tauap_b')
+
+
+if __name__ == '__main__':
+    unittest.main()
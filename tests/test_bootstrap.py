@@ -0,0 +1,75 @@
+import unittest
+
+import numpy as np
+
+from pyircor.bootstrap import bootstrap_ci
+from pyircor.tau import tau_b
+from pyircor.tauap import tauap_a, tauap_b
+
+
+class TestBootstrap(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1234)
+        base = rng.random(30)[:, None]
+        self.x = base + rng.random((30, 40))
+        self.y = base + .5 * rng.random((30, 40))
+
+    def test_statistic(self):
+        for method, coef in [('tauap_b', tauap_b), ('tauap_a', tauap_a),
+                             ('tau_b', tau_b)]:
+            x = np.round(self.x) if method == 'tau_b' else self.x
+            res = bootstrap_ci(x, self.y, method, n_resamples=50, seed=1)
+            self.assertAlmostEqual(res.statistic, coef(x.mean(axis=1),
+                                                       self.y.mean(axis=1)))
+            self.assertEqual(len(res.distribution), 50)
+            self.assertTrue(np.all(np.abs(res.distribution) <= 1))
+            self.assertTrue(-1 <= res.ci_low <= res.statistic <=
+                            res.ci_high <= 1)
+
+    def test_coverage(self):
+        # systems with known mean scores, measured with noise over topics
+        rng = np.random.default_rng(0)
+        mx = np.linspace(0, 1, 20)
+        my = mx + .5 * rng.random(20)
+        true = tauap_b(mx, my)
+        for interval in ['bca', 'percentile']:
+            covered = 0
+            for seed in range(100):
+                x = mx[:, None] + .1 * rng.standard_normal((20, 30))
+                y = my[:, None] + .1 * rng.standard_normal((20, 30))
+                res = bootstrap_ci(x, y, n_resamples=400, interval=interval,
+                                   confidence=.9, seed=seed)
+                covered += res.ci_low <= true <= res.ci_high
+            self.assertGreaterEqual(covered, 70)
+
+    def test_intervals(self):
+        for interval in ['bca', 'percentile']:
+            res = bootstrap_ci(self.x, self.y, n_resamples=500,
+                               interval=interval, seed=1)
+            self.assertLess(res.ci_low, res.ci_high)
+            self.assertLess(res.ci_low, res.statistic)
+            self.assertGreater(res.ci_high, res.statistic)
+            self.assertGreater(res.standard_error, 0)
+            wider = bootstrap_ci(self.x, self.y, n_resamples=500,
+                                 interval=interval, confidence=.99, seed=1)
+            self.assertLessEqual(wider.ci_low, res.ci_low)
+            self.assertGreaterEqual(wider.ci_high, res.ci_high)
+
+    def test_reproducible(self):
+        res1 = bootstrap_ci(self.x, self.y, n_resamples=100, seed=7)
+        res2 = bootstrap_ci(self.x, self.y, n_resamples=100, seed=7)
+        self.assertEqual(res1[:4], res2[:4])
+        np.testing.assert_array_equal(res1.distribution, res2.distribution)
+        res3 = bootstrap_ci(self.x, self.y, n_resamples=100, seed=8)
+        self.assertFalse(np.array_equal(res1.distribution, res3.distribution))
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            bootstrap_ci(self.x, self.y[:, :10])
+        with self.assertRaises(ValueError):
+            bootstrap_ci(self.x, self.y, interval='unknown')
+        with self.assertRaises(ValueError):
+            bootstrap_ci(self.x, self.y, method='unknown')
+        with self.assertRaises(ValueError):
+            # rounded means are tied
+            bootstrap_ci(np.round(self.x), self.y, 'tauap', n_resamples=20)
@@ -0,0 +1,180 @@
+import glob
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from pyircor import cache, tau, tauap
+from pyircor.approximate import Estimate
+from pyircor.ranks import RankedVector
+
+
+FUNCS = [tau.tau, tau.tau_a, tau.tau_b, tauap.tauap, tauap.tauap_a,
+         tauap.tauap_b]
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(1234)
+        self.x = rng.rand(50)
+        self.y = rng.rand(50)
+        self.x_ties = np.round(self.x * 5)
+        self.y_ties = np.round(self.y * 5)
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        cache.disable()
+        shutil.rmtree(self.dir)
+
+    def inputs(self, func):
+        if func.__name__.endswith('_b'):
+            return self.x_ties, self.y_ties
+        return self.x, self.y
+
+    def test_results(self):
+        ref = [f(*self.inputs(f)) for f in FUNCS]
+        with cache.caching() as c:
+            for _ in range(2):
+                self.assertEqual([f(*self.inputs(f)) for f in FUNCS], ref)
+            self.assertEqual(c.stats()['misses'], 6)
+            self.assertEqual(c.stats()['hits'], 6)
+
+            # equal contents hit, whatever the object holding them
+            x, y = self.inputs(tauap.tauap_b)
+            self.assertEqual(tauap.tauap_b(list(x), y.copy()), ref[-1])
+            self.assertEqual(tauap.tauap_b(x.copy(), y), ref[-1])
+            self.assertEqual(c.stats()['hits'], 8)
+            # ranked vectors and other parameters are keyed apart
+            self.assertEqual(tauap.tauap_b(RankedVector(x), y), ref[-1])
+            self.assertEqual(c.stats()['hits'], 8)
+            self.assertEqual(tauap.tauap(self.x, self.y, False),
+                             tauap.tauap(self.x, self.y, decreasing=False))
+            self.assertNotEqual(tauap.tauap(self.x, self.y, False), ref[3])
+        self.assertIsNone(cache.get_cache())
+
+    def test_ranked_argument(self):
+        # one ranked and one plain vector, as without the cache
+        for f in FUNCS:
+            x, y = self.inputs(f)
+            for decreasing in [True, False]:
+                kwargs = {'decreasing': decreasing} if f in FUNCS[3:] else {}
+                ref = f(RankedVector(x, decreasing), y, **kwargs)
+                with cache.caching():
+                    for _ in range(2):
+                        self.assertEqual(
+                            f(RankedVector(x, decreasing), y, **kwargs), ref)
+                        self.assertEqual(
+                            f(x, RankedVector(y, decreasing), **kwargs),
+                            f(x, y, **kwargs))
+
+    def test_ranks(self):
+        with cache.caching() as c:
+            tauap.tauap_b(self.x_ties, self.y_ties)
+            self.assertEqual(c.stats()['rank_misses'], 2)
+            # a new pairing of known vectors is not ranked again
+            tauap.tauap_a(self.x, self.y_ties)
+            tauap.tauap_b(self.y_ties, self.x_ties)
+            self.assertEqual(c.stats()['rank_misses'], 3)
+            self.assertEqual(c.stats()['rank_hits'], 3)
+
+            # the cache keeps copies, not the vectors of the caller
+            x = self.x_ties.copy()
+            ref = tauap.tauap_b(x, self.y_ties)
+            x[:] = self.y_ties
+            self.assertEqual(tauap.tauap_b(self.x_ties, self.y_ties), ref)
+
+    def test_errors(self):
+        with cache.caching() as c:
+            for _ in range(2):
+                with self.assertRaises(ValueError):
+                    tauap.tauap(self.x_ties, self.y)
+                with self.assertRaises(ValueError):
+                    tau.tau(['a', 'b'], ['c', 'd'])
+            self.assertEqual(c.stats()['hits'], 0)
+
+            # random estimates are not cached, seeded ones are
+            tau.tau_b(self.x_ties, self.y_ties, approximate=True, tol=.1)
+            tau.tau_b(self.x_ties, self.y_ties, approximate=True, tol=.1)
+            self.assertEqual(c.stats()['hits'], 0)
+            a = tau.tau_b(self.x_ties, self.y_ties, approximate=True, tol=.1,
+                          seed=1)
+            b = tau.tau_b(self.x_ties, self.y_ties, approximate=True, tol=.1,
+                          seed=1)
+            self.assertEqual(a, b)
+            self.assertEqual(c.stats()['hits'], 1)
+        with self.assertRaises(ValueError):
+            cache.Cache(max_entries=0)
+
+    def test_unvalidated(self):
+        # a result of unchecked inputs is not served to a call that checks them
+        with cache.caching() as c:
+            for f in [tau.tau, tauap.tauap]:
+                f(self.x_ties, self.y, validate=False)
+                with self.assertRaises(ValueError):
+                    f(self.x_ties, self.y)
+                f(self.x, self.y)
+                self.assertEqual(f(self.x, self.y, validate=False),
+                                 f(self.x, self.y))
+            # the calls raising and the first valid ones
+            self.assertEqual(c.stats()['misses'], 4)
+            self.assertEqual(c.stats()['hits'], 2)
+
+    def test_eviction(self):
+        with cache.caching(max_entries=4) as c:
+            for f in FUNCS:
+                f(*self.inputs(f))
+            self.assertEqual(len(c), 4)
+            self.assertGreater(c.stats()['evictions'], 0)
+        with cache.caching(max_bytes=1000) as c:
+            tauap.tauap(self.x, self.y)
+            tauap.tauap(self.y, self.x)
+            self.assertLessEqual(c.stats()['nbytes'], 1000 + 400 * 8)
+
+    def test_disk(self):
+        def estimate():
+            return tau.tau_b(self.x_ties, self.y_ties, approximate=True,
+                             tol=.1, seed=1)
+
+        with cache.caching(directory=self.dir) as c:
+            ref = tauap.tauap_b(self.x_ties, self.y_ties)
+            ref_estimate = estimate()
+        # plain JSON, rebuilt into the type the function returns
+        files = glob.glob(os.path.join(self.dir, '*'))
+        self.assertEqual(len(files), 2)
+        for path in files:
+            self.assertTrue(path.endswith('.json'))
+            with open(path) as f:
+                json.load(f)
+        with cache.caching(directory=self.dir) as c:
+            self.assertEqual(tauap.tauap_b(self.x_ties, self.y_ties), ref)
+            self.assertIsInstance(estimate(), Estimate)
+            self.assertEqual(estimate(), ref_estimate)
+            self.assertEqual(c.stats()['disk_hits'], 2)
+            self.assertEqual(c.stats()['misses'], 0)
+            # nor served to another version or kernel
+            c.clear()
+            with mock.patch.object(cache, '__version__', '0.0.0'):
+                tauap.tauap_b(self.x_ties, self.y_ties)
+            tauap.tauap_b(self.x_ties, self.y_ties, method='naive')
+            self.assertEqual(c.stats()['misses'], 2)
+            self.assertEqual(c.stats()['disk_hits'], 0)
+
+            # unreadable files are misses
+            for path in files:
+                with open(path, 'w') as f:
+                    f.write('{"value"')
+            c.clear()
+            self.assertEqual(tauap.tauap_b(self.x_ties, self.y_ties), ref)
+            self.assertEqual(c.stats()['misses'], 1)
+            c.clear(disk=True)
+            self.assertEqual(os.listdir(self.dir), [])
+            self.assertEqual(tauap.tauap_b(self.x_ties, self.y_ties), ref)
+            self.assertEqual(c.stats()['misses'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
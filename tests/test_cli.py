@@ -0,0 +1,153 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from pyircor import cli, config
+from pyircor.matrix import (MEASURES, _corr_batch, _corr_pairs, corr_batch,
+                            corr_matrix)
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        rng = np.random.RandomState(1234)
+        self.scores = {}
+        for s in range(12):
+            quality = rng.rand()
+            name = 'run{:02d}'.format(s)
+            scores = np.clip(quality + .3 * rng.randn(3, 20), 0, 1).round(4)
+            self.scores[name] = scores
+            path = os.path.join(self.dir, 'eval{}.txt'.format(s))
+            with open(path, 'w') as f:
+                f.write('runid\tall\t{}\n'.format(name))
+                for t in range(20):
+                    for m, measure in enumerate(['map', 'ndcg', 'P_10']):
+                        f.write('{}\t{}\t{}\n'.format(measure, 401 + t,
+                                                      scores[m, t]))
+                f.write('map\tall\t0.5\n')
+                f.write('relstring\t401\tRRN\n')
+        names = sorted(self.scores)
+        # rankings by mean score, in the sorted order of the measures
+        self.means = np.array([[self.scores[s][m].mean() for s in names]
+                               for m in [2, 0, 1]])
+        self.topics = np.array([[self.scores[s][0, t] for s in names]
+                                for t in range(20)])
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_cli(self, *args):
+        return cli.main(list(args) + ['-q'])
+
+    def test_parse(self):
+        name, scores = cli.parse_eval_file(
+            os.path.join(self.dir, 'eval0.txt'), ['map'])
+        self.assertEqual(name, 'run00')
+        self.assertEqual(list(scores), ['map'])
+        self.assertEqual(len(scores['map']), 20)
+        self.assertNotIn('all', scores['map'])
+
+    def test_scores(self):
+        scores = cli._Scores(None)
+        scores.add('a', {'map': {'1': .1, '2': .2}, 'P_10': {'1': .3}})
+        scores.add('b', {'map': {'3': .1, '2': .5}})
+        # P_10 is dropped as soon as a system misses it
+        self.assertEqual(list(scores.topics), ['map'])
+        self.assertEqual(list(scores.systems['a']), ['map'])
+        X, topics, names = scores.rankings('topic')
+        np.testing.assert_array_equal(X, [[.2, .5]])
+        self.assertEqual(topics, ['2'])
+        self.assertEqual(names, ['a', 'b'])
+        with self.assertRaises(ValueError):
+            scores.add('a', {'map': {'1': .1}})
+
+    def test_matrix(self):
+        out = os.path.join(self.dir, 'matrix.csv')
+        self.assertEqual(self.run_cli('matrix', self.dir, '--pattern', 'eval*',
+                                      '-j', '1', '-o', out), 0)
+        with open(out) as f:
+            header = f.readline().strip().split(',')
+            values = np.loadtxt(f, delimiter=',', usecols=range(1, 4))
+        self.assertEqual(header, ['', 'P_10', 'map', 'ndcg'])
+        np.testing.assert_allclose(values, corr_matrix(self.means, 'tauap_b'))
+
+    def test_methods(self):
+        out = os.path.join(self.dir, 'matrix.npy')
+        for method in MEASURES:
+            for increasing in ([], ['--increasing']):
+                self.assertEqual(self.run_cli(
+                    'matrix', self.dir, '--pattern', 'eval*', '--method',
+                    method, '-j', '1', '-o', out, *increasing), 0)
+                np.testing.assert_array_equal(
+                    np.load(out),
+                    corr_matrix(self.means, method, not increasing))
+
+    def test_pairs(self):
+        # every pair once for the symmetric coefficients, twice for tauap_b
+        pairs = []
+
+        def corr_pairs(code, X, order, mins, dense, rows_idx, *args):
+            pairs.append(len(rows_idx))
+            return _corr_pairs(code, X, order, mins, dense, rows_idx, *args)
+
+        out = os.path.join(self.dir, 'matrix.npy')
+        with mock.patch.object(cli, '_corr_pairs', corr_pairs):
+            for method in ['tau_b', 'tauap_b']:
+                self.assertEqual(self.run_cli(
+                    'matrix', self.dir, '--pattern', 'eval*', '--method',
+                    method, '-j', '1', '-o', out), 0)
+                np.testing.assert_array_equal(
+                    np.load(out), corr_matrix(self.means, method))
+        self.assertEqual([sum(pairs[:3]), sum(pairs[3:])], [6, 18])
+
+    def test_pool(self):
+        out = os.path.join(self.dir, 'topics.npy')
+        self.assertEqual(self.run_cli('matrix', self.dir, '--pattern', 'eval*',
+                                      '--by', 'topic', '--measure', 'map',
+                                      '--method', 'tau_b', '-j', '2', '-o',
+                                      out), 0)
+        np.testing.assert_allclose(np.load(out),
+                                   corr_matrix(self.topics, 'tau_b'))
+
+    def test_warm_up(self):
+        out = os.path.join(self.dir, 'topics.npy')
+        with config.config_context():
+            cli._init_worker('tauap_b', True)
+            signatures = (list(_corr_pairs.signatures),
+                          list(_corr_batch.signatures))
+            for extra in ([], ['--reference', 'all']):
+                command = 'reference' if extra else 'matrix'
+                self.assertEqual(self.run_cli(
+                    command, self.dir, '--pattern', 'eval*', '--by', 'topic',
+                    '--measure', 'map', '-j', '1', '-o', out, *extra), 0)
+        # the tasks run on the signatures the workers are warmed up with
+        self.assertEqual((list(_corr_pairs.signatures),
+                          list(_corr_batch.signatures)), signatures)
+
+    def test_reference(self):
+        out = os.path.join(self.dir, 'reference.npy')
+        self.assertEqual(self.run_cli('reference', self.dir, '--pattern',
+                                      'eval*', '--by', 'topic', '--measure',
+                                      'map', '--reference', 'all', '-j', '1',
+                                      '-o', out), 0)
+        expected = corr_batch(self.topics.mean(axis=0), self.topics, 'tauap_b')
+        np.testing.assert_allclose(np.load(out), expected)
+
+    def test_errors(self):
+        self.assertEqual(self.run_cli('reference', self.dir, '--pattern',
+                                      'eval*', '--reference', 'P_20', '-j',
+                                      '1'), 1)
+        self.assertEqual(self.run_cli('matrix', self.dir, '--pattern', 'eval*',
+                                      '--by', 'topic', '-j', '1'), 1)
+        with open(os.path.join(self.dir, 'eval0.txt'), 'a') as f:
+            f.write('map 401\n')
+        self.assertEqual(self.run_cli('matrix', self.dir, '--pattern', 'eval*',
+                                      '-j', '1'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import math
+import unittest
+
+import numpy as np
+
+import pyircor
+from pyircor import tau, tauap
+
+
+class TestAllCoefficients(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(1234)
+        self.x = rng.rand(50)
+        self.y = rng.rand(50)
+        self.x_ties = np.round(self.x * 5)
+        self.y_ties = np.round(self.y * 5)
+
+    def test_no_ties(self):
+        for decreasing in [True, False]:
+            res = pyircor.all_coefficients(self.x, self.y,
+                                           decreasing=decreasing)
+            self.assertAlmostEqual(res.tau, tau.tau(self.x, self.y))
+            self.assertAlmostEqual(res.tau_a, tau.tau_a(self.x, self.y))
+            self.assertAlmostEqual(res.tau_b, tau.tau_b(self.x, self.y))
+            for name in ['tauap', 'tauap_a', 'tauap_b']:
+                func = getattr(tauap, name)
+                self.assertAlmostEqual(
+                    getattr(res, name),
+                    func(self.x, self.y, decreasing=decreasing))
+
+    def test_ties(self):
+        res = pyircor.all_coefficients(self.x, self.y_ties)
+        self.assertTrue(math.isnan(res.tau))
+        self.assertTrue(math.isnan(res.tauap))
+        self.assertAlmostEqual(res.tau_a, tau.tau_a(self.x, self.y_ties))
+        self.assertAlmostEqual(res.tauap_a, tauap.tauap_a(self.x, self.y_ties))
+
+        res = pyircor.all_coefficients(self.x_ties, self.y_ties)
+        self.assertTrue(math.isnan(res.tau_a))
+        self.assertTrue(math.isnan(res.tauap_a))
+        self.assertAlmostEqual(res.tau_b, tau.tau_b(self.x_ties, self.y_ties))
+        self.assertAlmostEqual(res.tauap_b,
+                               tauap.tauap_b(self.x_ties, self.y_ties))
+
+    def test_counts(self):
+        # raw pair counts against a brute force count
+        res = pyircor.all_coefficients(self.x_ties, self.y_ties)
+        sx = np.sign(self.x_ties[:, None] - self.x_ties[None, :])
+        sy = np.sign(self.y_ties[:, None] - self.y_ties[None, :])
+        upper = np.triu(np.ones_like(sx, dtype=bool), 1)
+        self.assertEqual(res.n, 50)
+        self.assertEqual(res.concordant, np.sum((sx * sy > 0) & upper))
+        self.assertEqual(res.discordant, np.sum((sx * sy < 0) & upper))
+        self.assertEqual(res.ties_x, np.sum((sx == 0) & upper))
+        self.assertEqual(res.ties_y, np.sum((sy == 0) & upper))
@@ -0,0 +1,63 @@
+import unittest
+
+import numba as nb
+import numpy as np
+
+from pyircor import config, tau, tauap
+from pyircor.ranks import RankedVector
+
+
+class TestConfig(unittest.TestCase):
+    def test_set_config(self):
+        with config.config_context(n_jobs=1, parallel_min_n=10):
+            self.assertEqual(config.get_config(),
+                             {'n_jobs': 1, 'parallel_min_n': 10,
+                              'memory_budget': 2 ** 30})
+            self.assertEqual(config.n_threads(), 1)
+            self.assertFalse(config.use_parallel(100))
+        self.assertEqual(config.get_config()['n_jobs'], -1)
+        self.assertEqual(config.n_threads(), nb.config.NUMBA_NUM_THREADS)
+
+        with self.assertRaises(ValueError):
+            config.set_config(n_jobs=0)
+        with self.assertRaises(ValueError):
+            config.set_config(parallel_min_n=-1)
+        with self.assertRaises(ValueError):
+            config.set_config(memory_budget=1000)
+
+    def test_parallel_kernels(self):
+        # the parallel kernels must give exactly the serial results
+        rng = np.random.RandomState(1234)
+        for n in [2, 3, 17, 1000, 20000]:
+            for levels in [0, 3, 50]:
+                x = RankedVector(rng.rand(n))
+                if levels:
+                    y = RankedVector(np.round(rng.rand(n) * levels))
+                else:
+                    y = RankedVector(rng.rand(n))
+                c = tauap._concordant_above(x.dense, y.order, y.mins)
+                c_par = tauap._concordant_above_parallel(x.dense, y.order,
+                                                         y.mins)
+                np.testing.assert_array_equal(c, c_par)
+
+                self.assertEqual(tauap._tauap_from_counts(c, y.mins),
+                                 tauap._tauap_from_counts_parallel(c, y.mins))
+                self.assertEqual(
+                    tauap._tauap_a_from_counts(c, y.mins, y.tie_sizes),
+                    tauap._tauap_a_from_counts_parallel(c, y.mins,
+                                                        y.tie_sizes))
+
+    def test_thread_counts(self):
+        # results must be bit-identical whatever the number of threads
+        rng = np.random.RandomState(1234)
+        x = rng.rand(5000)
+        x_ties = np.round(rng.rand(5000) * 20)
+        y_ties = np.round(rng.rand(5000) * 20)
+        expected = None
+        for n_jobs in range(1, nb.config.NUMBA_NUM_THREADS + 1):
+            with config.config_context(n_jobs=n_jobs, parallel_min_n=0):
+                res = [tau.tau_a(x, y_ties), tau.tau_b(x_ties, y_ties),
+                       tauap.tauap_a(x, y_ties), tauap.tauap_b(x_ties, y_ties)]
+            if expected is None:
+                expected = res
+            self.assertEqual(res, expected)
@@ -0,0 +1,82 @@
+import unittest
+import warnings
+from unittest import mock
+
+import numpy as np
+
+from pyircor import curve, tau, tauap
+from pyircor.curve import tau_curve, tauap_curve
+from pyircor.ranks import RankedVector
+
+
+COEFFICIENTS = {
+    'tau': (tau_curve, tau.tau),
+    'tau_a': (tau_curve, tau.tau_a),
+    'tau_b': (tau_curve, tau.tau_b),
+    'tauap': (tauap_curve, tauap.tauap),
+    'tauap_a': (tauap_curve, tauap.tauap_a),
+    'tauap_b': (tauap_curve, tauap.tauap_b),
+}
+
+
+class TestCurve(unittest.TestCase):
+    def assertCurve(self, method, x, y, decreasing):
+        curve, coef = COEFFICIENTS[method]
+        out = curve(x, y, method, decreasing)
+        ry = RankedVector(y, decreasing)
+        p = ry.mins[ry.order]
+        for k in range(1, len(x) + 1):
+            if k == 1 or (k < len(x) and p[k] == p[k-1]):
+                # no cutoff within a tie group
+                self.assertTrue(np.isnan(out[k-1]))
+                continue
+            top = ry.order[:k]
+            args = (decreasing,) if method.startswith('tauap') else ()
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                try:
+                    expected = coef(x[top], y[top], *args)
+                except ValueError:
+                    continue  # all items tied in the cutoff
+            np.testing.assert_allclose(out[k-1], expected, atol=1e-12)
+
+    def test_without_ties(self):
+        rng = np.random.RandomState(1234)
+        for _ in range(10):
+            x = rng.rand(25)
+            y = x + rng.rand(25)
+            for method in ['tau', 'tau_a', 'tau_b',
+                           'tauap', 'tauap_a', 'tauap_b']:
+                for decreasing in [True, False]:
+                    self.assertCurve(method, x, y, decreasing)
+
+    def test_ties(self):
+        rng = np.random.RandomState(4321)
+        for _ in range(10):
+            x = rng.rand(25)
+            y = rng.randint(0, 6, 25)
+            for method in ['tau_a', 'tauap_a']:
+                for decreasing in [True, False]:
+                    self.assertCurve(method, x, y, decreasing)
+            x = rng.randint(0, 6, 25)
+            for method in ['tau_b', 'tauap_b']:
+                for decreasing in [True, False]:
+                    self.assertCurve(method, x, y, decreasing)
+
+    def test_reverse_warning(self):
+        x = np.arange(8)
+        with mock.patch.object(curve, 'REVERSE_WARN_N', 8):
+            with self.assertWarns(RuntimeWarning):
+                tauap_curve(x, x, 'tauap_b')
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                tauap_curve(x, x, 'tauap')
+                tauap_curve(x[:7], x[:7], 'tauap_b')
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            tau_curve(np.arange(5), np.arange(5), 'tauap')
+        with self.assertRaises(ValueError):
+            tauap_curve(np.arange(5), np.arange(5), 'tau')
+        with self.assertRaises(ValueError):
+            tauap_curve(np.arange(5), np.array([1, 1, 2, 3, 4]), 'tauap')
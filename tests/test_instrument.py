@@ -0,0 +1,99 @@
+import unittest
+from unittest import mock
+
+import numba as nb
+import numpy as np
+
+from pyircor import instrument
+from pyircor.asymptotic import tauap_test
+from pyircor.tau import tau, tau_b
+from pyircor.tauap import tauap, tauap_a, tauap_b
+
+
+class TestInstrument(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(1234)
+        self.x = rng.rand(50)
+        self.y = self.x + rng.rand(50)
+        self.x_ties = np.round(self.x * 4)  # 5 tie groups at most
+        self.y_ties = np.round(self.y * 4)
+
+    def test_record(self):
+        with instrument.record() as rec:
+            tau(self.x, self.y)
+            tau_b(self.x_ties, self.y_ties)
+            tauap_a(self.x, self.y_ties)
+            tauap_b(self.x_ties, self.y_ties)
+        calls = [e for e in rec.events if e['event'] == 'call']
+        self.assertEqual([e['function'] for e in calls],
+                         ['tau', 'tau_b', 'tauap_a', 'tauap_b'])
+        for event in calls:
+            self.assertEqual(event['n'], 50)
+            for stage in instrument.STAGES:
+                self.assertGreaterEqual(event[stage], 0)
+            self.assertAlmostEqual(sum(event[s] for s in instrument.STAGES),
+                                   event['total'])
+        self.assertEqual(calls[0]['groups_x'], 50)
+        self.assertEqual(calls[0]['max_tie_x'], 1)
+        self.assertEqual(calls[3]['groups_x'], len(np.unique(self.x_ties)))
+        self.assertEqual(calls[3]['max_tie_y'],
+                         np.unique(self.y_ties, return_counts=True)[1].max())
+
+        summary = rec.summary()
+        self.assertEqual(summary['tau']['count'], 1)
+        self.assertEqual(summary['tauap_b']['items'], 50)
+        self.assertIn('compile', summary)
+
+    def test_indirect(self):
+        with instrument.record() as rec:
+            tauap(self.x, self.y)
+            tauap_test(self.x, self.y)  # calls tauap on inputs already ranked
+        calls = [e for e in rec.events if e['event'] == 'call']
+        self.assertEqual(len(calls), 2)
+        self.assertGreater(calls[0]['ranking'], 0)
+        self.assertEqual(calls[1]['ranking'], 0)
+
+    def test_hooks(self):
+        events = []
+        instrument.add_hook(events.append)
+        try:
+            self.assertTrue(instrument.enabled())
+            tauap(self.x, self.y)
+        finally:
+            instrument.remove_hook(events.append)
+        self.assertFalse(instrument.enabled())
+        tauap(self.x, self.y)
+        self.assertEqual(len(events), 1)
+        with self.assertRaises(ValueError):
+            instrument.remove_hook(events.append)
+
+    @unittest.skipIf(instrument.nb_event is None,
+                     'numba < 0.53 does not report compilations')
+    def test_compile(self):
+        @nb.njit
+        def add(a):
+            return a + 1
+
+        with instrument.record() as rec:
+            add(1)
+        compiles = [e for e in rec.events if e['event'] == 'compile']
+        # only the outermost compilation, not that of numba's helpers
+        self.assertEqual([e['function'] for e in compiles],
+                         ['TestInstrument.test_compile.<locals>.add'])
+        self.assertGreater(compiles[0]['seconds'], 0)
+
+    def test_no_compile_events(self):
+        # as with numba < 0.53, which has no numba.core.event
+        with mock.patch.object(instrument, '_LISTENER', None):
+            with instrument.record() as rec:
+                tauap(self.x, self.y)
+        self.assertEqual([e['event'] for e in rec.events], ['call'])
+
+    def test_approximate(self):
+        with instrument.record() as rec:
+            tau(self.x, self.y, approximate=True, tol=.2, seed=0)
+        self.assertNotIn('groups_x', rec.events[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import subprocess
+import sys
+import textwrap
+import unittest
+
+import numpy as np
+
+from pyircor import lowmem
+from pyircor.tauap import tauap, tauap_a, tauap_b
+
+
+# peak resident memory of lowmem.tauap_a over 2e6 items, per item, without and
+# with a workspace, resetting the high-water mark before every call
+PEAK_SCRIPT = textwrap.dedent("""
+    import numpy as np
+    from pyircor import lowmem
+
+    def peak():
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM'):
+                    return int(line.split()[1]) * 1024
+
+    def measure(f):
+        with open('/proc/self/clear_refs', 'w') as f_refs:
+            f_refs.write('5')
+        base = peak()
+        f()
+        return (peak() - base) / n
+
+    n = 2 * 10**6
+    rng = np.random.RandomState(0)
+    x = rng.rand(n)
+    y = np.round(rng.rand(n) * 100)
+    lowmem.tauap_a(x[:100], y[:100])
+    ws = lowmem.Workspace(n)
+    lowmem.tauap_a(x, y, workspace=ws)
+    print(measure(lambda: lowmem.tauap_a(x, y)),
+          measure(lambda: lowmem.tauap_a(x, y, workspace=ws)))
+""")
+
+
+class TestLowMem(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(1234)
+        n = 5001  # not a multiple of the runs sorted by insertion
+        self.x = rng.rand(n)
+        self.y = self.x + rng.rand(n)
+        self.x_ties = rng.randint(0, 100, n)
+        self.y_ties = rng.randint(0, 100, n).astype(np.float32)
+
+    def test_coefficients(self):
+        ws = lowmem.Workspace(len(self.x))
+        for decreasing in [True, False]:
+            for workspace in [None, ws]:
+                self.assertAlmostEqual(
+                    lowmem.tauap(self.x, self.y, decreasing, workspace),
+                    tauap(self.x, self.y, decreasing))
+                self.assertAlmostEqual(
+                    lowmem.tauap_a(self.x, self.y_ties, decreasing, workspace),
+                    tauap_a(self.x, self.y_ties, decreasing))
+                self.assertAlmostEqual(
+                    lowmem.tauap_b(self.x_ties, self.y_ties, decreasing,
+                                   workspace),
+                    tauap_b(self.x_ties, self.y_ties, decreasing))
+
+    def test_small(self):
+        x = [.3, .1, .2]
+        y = [.1, .3, .2]
+        self.assertAlmostEqual(lowmem.tauap(x, y), tauap(x, y))
+        self.assertAlmostEqual(lowmem.tauap_b([1, 1, 2], [2, 1, 1]),
+                               tauap_b([1, 1, 2], [2, 1, 1]))
+
+    def test_workspace(self):
+        ws = lowmem.Workspace(100)
+        self.assertEqual(ws.order_x.dtype, np.int32)
+        self.assertEqual(ws.nbytes, 4 * (4 * 100 + 1))
+        # shorter vectors use the start of the buffers
+        lowmem.tauap(self.x[:50], self.y[:50], workspace=ws)
+        with self.assertRaises(ValueError):
+            lowmem.tauap(self.x, self.y, workspace=ws)
+        with self.assertRaises(ValueError):
+            lowmem.Workspace(1)
+
+    def test_ties(self):
+        with self.assertRaises(ValueError):
+            lowmem.tauap(self.x_ties, self.y)
+        with self.assertRaises(ValueError):
+            lowmem.tauap(self.x, self.y_ties)
+        with self.assertRaises(ValueError):
+            lowmem.tauap_a(self.x_ties, self.y)
+
+    @unittest.skipUnless(os.path.exists('/proc/self/clear_refs'),
+                         'needs the peak memory of Linux')
+    def test_peak_memory(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=root)
+        out = subprocess.run([sys.executable, '-c', PEAK_SCRIPT], env=env,
+                             check=True, stdout=subprocess.PIPE,
+                             universal_newlines=True).stdout
+        per_item, per_item_ws = map(float, out.split())
+        # the four int32 buffers, and nothing proportional to n with a
+        # workspace
+        self.assertLess(per_item, 16 * 1.1)
+        self.assertLess(per_item_ws, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+import numpy as np
+
+from pyircor import tau, tauap, matrix
+
+
+FUNCS = {
+    'tau': tau.tau,
+    'tau_a': tau.tau_a,
+    'tau_b': tau.tau_b,
+    'tauap': tauap.tauap,
+    'tauap_a': tauap.tauap_a,
+    'tauap_b': tauap.tauap_b,
+}
+
+
+class TestMatrix(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(1234)
+        self.X = rng.rand(5, 30)
+        self.X_ties = np.round(self.X * 4)
+
+    def test_corr_matrix(self):
+        # every element must match the pairwise public function
+        for method, func in FUNCS.items():
+            X = self.X_ties if method.endswith('_b') else self.X
+            for decreasing in [True, False]:
+                if method.startswith('tauap'):
+                    kwargs = {'decreasing': decreasing}
+                else:
+                    kwargs = {}
+                res = matrix.corr_matrix(X, method=method,
+                                         decreasing=decreasing)
+                ref = np.array([[func(x, y, **kwargs) for y in X] for x in X])
+                np.testing.assert_allclose(res, ref, atol=1e-12)
+
+    def test_corr_matrix_asymmetric(self):
+        res = matrix.corr_matrix(self.X, method='tauap')
+        self.assertAlmostEqual(res[0, 1], tauap.tauap(self.X[0], self.X[1]))
+        self.assertAlmostEqual(res[1, 0], tauap.tauap(self.X[1], self.X[0]))
+        self.assertNotAlmostEqual(res[0, 1], res[1, 0])
+
+    def test_corr_matrix_errors(self):
+        with self.assertRaises(ValueError):
+            matrix.corr_matrix(self.X, method='unknown')
+        with self.assertRaises(ValueError):
+            matrix.corr_matrix(self.X[0])
+        with self.assertRaises(ValueError):
+            matrix.corr_matrix(self.X_ties, method='tauap')
+
+    def test_corr_batch(self):
+        # every element must match the pairwise public function
+        rng = np.random.RandomState(4321)
+        x = rng.rand(30)
+        x_ties = np.round(x * 4)
+        for method, func in FUNCS.items():
+            ref = x_ties if method.endswith('_b') else x
+            Y = self.X if method in ('tau', 'tauap') else self.X_ties
+            for decreasing in [True, False]:
+                if method.startswith('tauap'):
+                    kwargs = {'decreasing': decreasing}
+                else:
+                    kwargs = {}
+                res = matrix.corr_batch(ref, Y, method=method,
+                                        decreasing=decreasing)
+                exp = np.array([func(ref, y, **kwargs) for y in Y])
+                np.testing.assert_allclose(res, exp, atol=1e-12)
+
+    def test_corr_batch_errors(self):
+        with self.assertRaises(ValueError):
+            matrix.corr_batch(self.X[0], self.X, method='unknown')
+        with self.assertRaises(ValueError):
+            matrix.corr_batch(self.X[0, :10], self.X)
+        with self.assertRaises(ValueError):
+            matrix.corr_batch(self.X_ties[0], self.X, method='tau_a')
+        with self.assertRaises(ValueError):
+            matrix.corr_batch(self.X[0], self.X_ties, method='tauap')
@@ -0,0 +1,88 @@
+import unittest
+
+import numpy as np
+
+from pyircor.online import OnlineCorrelation
+from pyircor.tau import tau, tau_a, tau_b
+from pyircor.tauap import tauap, tauap_a, tauap_b
+
+
+class TestOnlineCorrelation(unittest.TestCase):
+    def test_random_operations(self):
+        # more items than a block, with ties in the reference and the scores
+        rng = np.random.RandomState(1234)
+        x = rng.randint(0, 50, 300)
+        oc = OnlineCorrelation(x)
+        live = {}
+        for step in range(1500):
+            item = rng.randint(300)
+            if item not in live:
+                live[item] = rng.randint(0, 80)
+                oc.insert(item, live[item])
+            elif rng.rand() < .3:
+                del live[item]
+                oc.remove(item)
+            else:
+                live[item] = rng.randint(0, 80)
+                oc.update(item, live[item])
+
+            if step % 100 == 99:
+                items = sorted(live)
+                xs = x[items]
+                ys = np.array([live[i] for i in items])
+                self.assertEqual(len(oc), len(items))
+                self.assertAlmostEqual(oc.tau_b(), tau_b(xs, ys))
+                self.assertAlmostEqual(oc.tauap_b(), tauap_b(xs, ys))
+
+    def test_without_ties(self):
+        rng = np.random.RandomState(4321)
+        x = rng.rand(100)
+        y = x + rng.rand(100)
+        for decreasing in [True, False]:
+            oc = OnlineCorrelation(x, decreasing)
+            for i in range(100):
+                oc.insert(i, y[i])
+            oc.update(3, -1.)
+            y2 = y.copy()
+            y2[3] = -1.
+            self.assertAlmostEqual(oc.tau(), tau(x, y2))
+            self.assertAlmostEqual(oc.tau_a(), tau_a(x, y2))
+            self.assertAlmostEqual(oc.tauap(), tauap(x, y2, decreasing))
+            self.assertAlmostEqual(oc.tauap_a(), tauap_a(x, y2, decreasing))
+
+    def test_errors(self):
+        oc = OnlineCorrelation([1, 2, 3, 3])
+        with self.assertRaises(ValueError):
+            oc.tau_b()
+        oc.insert(0, 1.)
+        with self.assertRaises(ValueError):
+            oc.insert(0, 2.)
+        with self.assertRaises(ValueError):
+            oc.remove(1)
+        with self.assertRaises(ValueError):
+            oc.insert(4, 1.)
+        with self.assertRaises(ValueError):
+            oc.insert(1, np.nan)
+        oc.insert(2, 1.)
+        oc.insert(3, 2.)
+        with self.assertRaises(ValueError):
+            oc.tau()  # tied scores
+        with self.assertRaises(ValueError):
+            oc.tauap_a()  # tied in the reference
+        self.assertEqual((oc.concordant, oc.discordant, oc.ties_x, oc.ties_y),
+                         (1, 0, 1, 1))
+
+    def test_failed_update(self):
+        oc = OnlineCorrelation([1, 2, 3, 4, 5])
+        for i, score in enumerate([1., 3., 2., 5., 4.]):
+            oc.insert(i, score)
+        counts = (oc.n, oc.concordant, oc.discordant, oc.ties_x, oc.ties_y)
+        coefs = (oc.tau(), oc.tauap())
+        for score in [np.nan, np.inf]:
+            with self.assertRaises(ValueError):
+                oc.update(2, score)
+        with self.assertRaises(ValueError):
+            oc.update(5, 1.)
+        self.assertEqual((oc.n, oc.concordant, oc.discordant, oc.ties_x,
+                          oc.ties_y), counts)
+        self.assertEqual((oc.tau(), oc.tauap()), coefs)
@@ -0,0 +1,119 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+
+import numpy as np
+
+from pyircor import outofcore
+from pyircor.tau import tau, tau_b
+from pyircor.tauap import tauap
+
+
+# peak resident memory of outofcore.tau_b and outofcore.tauap over 1e6 items
+# read from .npy files, within a budget of 1 MB, resetting the high-water mark
+# before every call
+PEAK_SCRIPT = textwrap.dedent("""
+    import os
+    import tempfile
+
+    import numpy as np
+    from pyircor import outofcore
+
+    def peak():
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM'):
+                    return int(line.split()[1]) * 1024
+
+    def measure(f):
+        with open('/proc/self/clear_refs', 'w') as f_refs:
+            f_refs.write('5')
+        base = peak()
+        f()
+        return peak() - base
+
+    n = 10**6
+    budget = 2**20
+    with tempfile.TemporaryDirectory() as tmp:
+        rng = np.random.RandomState(0)
+        np.save(os.path.join(tmp, 'x.npy'), rng.rand(n))
+        np.save(os.path.join(tmp, 'y.npy'), np.round(rng.rand(n) * 100))
+        x = np.load(os.path.join(tmp, 'x.npy'), mmap_mode='r')
+        y = np.load(os.path.join(tmp, 'y.npy'), mmap_mode='r')
+        outofcore.tau_b(x[:100], y[:100], budget, tmp)
+        outofcore.tauap(x[:100], x[:100], True, budget, tmp)
+        print(budget,
+              measure(lambda: outofcore.tau_b(x, y, budget, tmp)),
+              measure(lambda: outofcore.tauap(x, x, True, budget, tmp)))
+""")
+
+
+class TestOutOfCore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        rng = np.random.RandomState(1234)
+        # larger than the chunks of the smallest budget, so runs are merged
+        n = 30001
+        self.x = rng.rand(n)
+        self.y = self.x + rng.rand(n)
+        self.x_ties = rng.randint(0, 100, n)
+        self.y_ties = rng.randint(0, 100, n).astype(np.float32)
+        for name in ['x', 'y', 'x_ties', 'y_ties']:
+            np.save(os.path.join(self.dir, name + '.npy'), getattr(self, name))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def load(self, name):
+        return np.load(os.path.join(self.dir, name + '.npy'), mmap_mode='r')
+
+    def test_coefficients(self):
+        scratch = os.path.join(self.dir, 'scratch')
+        os.mkdir(scratch)
+        for budget in [2 ** 20, 2 ** 30]:
+            self.assertAlmostEqual(
+                outofcore.tau(self.load('x'), self.load('y'), budget, scratch),
+                tau(self.x, self.y))
+            self.assertAlmostEqual(
+                outofcore.tau_b(self.load('x_ties'), self.load('y_ties'),
+                                budget, scratch),
+                tau_b(self.x_ties, self.y_ties))
+            # not a whole file, and not a memmap
+            self.assertAlmostEqual(
+                outofcore.tau_b(self.load('x')[::3], self.y_ties[::3], budget,
+                                scratch),
+                tau_b(self.x[::3], self.y_ties[::3]))
+            for decreasing in [True, False]:
+                self.assertAlmostEqual(
+                    outofcore.tauap(self.load('x'), self.load('y'), decreasing,
+                                    budget, scratch),
+                    tauap(self.x, self.y, decreasing))
+        # scratch files are removed
+        self.assertEqual(os.listdir(scratch), [])
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            outofcore.tau(self.load('x'), self.load('y_ties'))
+        with self.assertRaises(ValueError):
+            outofcore.tauap(self.load('x_ties'), self.load('y'))
+        with self.assertRaises(ValueError):
+            outofcore.tauap(self.load('x'), self.load('y')[:-1])
+        with self.assertRaises(ValueError):
+            outofcore.tau_b(self.load('x'), np.array(['a'] * len(self.x)))
+
+    @unittest.skipUnless(os.path.exists('/proc/self/clear_refs'),
+                         'needs the peak memory of Linux')
+    def test_peak_memory(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=root)
+        out = subprocess.run([sys.executable, '-c', PEAK_SCRIPT], env=env,
+                             check=True, stdout=subprocess.PIPE,
+                             universal_newlines=True).stdout
+        budget, *peaks = map(int, out.split())
+        # vectors of 8 MB are sorted in chunks of the budget
+        for peak in peaks:
+            self.assertLess(peak, 3 * budget)
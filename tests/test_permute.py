@@ -0,0 +1,126 @@
+import unittest
+
+import numpy as np
+
+from pyircor import matrix, permute
+from pyircor.permute import expected_over_ties, permute_ties
+from pyircor.ranks import RankedVector
+from pyircor.tau import tau_a
+from pyircor.tauap import tauap_a
+
+
+class TestPermutationTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(1234)
+        self.x = rng.rand(40)
+        self.y = self.x + rng.rand(40)
+        self.z = rng.rand(40)
+
+    def test_permuted_coefs(self):
+        # the permuted views must give the same as ranking every permutation
+        rng = np.random.RandomState(4321)
+        perms = np.argsort(rng.rand(20, 40), axis=1)
+        x_ties = np.round(self.x * 4)
+        y_ties = np.round(self.y * 4)
+        for method, (check_type, code, _) in matrix.MEASURES.items():
+            x = self.x if check_type != 'b' else x_ties
+            y = self.y if check_type == 'default' else y_ties
+            for decreasing in [True, False]:
+                rx = RankedVector(x, decreasing)
+                ry = RankedVector(y, decreasing)
+                res = permute._permuted_coefs(code, rx.order, rx.mins,
+                                              rx.dense, ry.order, ry.mins,
+                                              ry.dense, perms)
+                expected = matrix.corr_batch(x, y[perms], method, decreasing)
+                np.testing.assert_allclose(res, expected, atol=1e-12)
+
+    def test_permutation_test(self):
+        res = permute.permutation_test(self.x, self.y, n_permutations=500,
+                                       seed=1)
+        self.assertEqual(res.n_permutations, 500)
+        self.assertLess(res.pvalue, .01)
+        self.assertLessEqual(res.ci_low, res.pvalue)
+
+        res = permute.permutation_test(self.x, self.z, method='tau_b',
+                                       n_permutations=500, seed=1)
+        self.assertGreater(res.pvalue, .05)
+
+        # one-sided alternatives
+        res = permute.permutation_test(self.x, -self.y, alternative='less',
+                                       n_permutations=200, seed=1)
+        self.assertLess(res.pvalue, .01)
+        res = permute.permutation_test(self.x, -self.y, alternative='greater',
+                                       n_permutations=200, seed=1)
+        self.assertGreater(res.pvalue, .99)
+
+    def test_reproducible(self):
+        res1 = permute.permutation_test(self.x, self.z, n_permutations=300,
+                                        batch_size=100, seed=7)
+        res2 = permute.permutation_test(self.x, self.z, n_permutations=300,
+                                        batch_size=100, seed=7)
+        self.assertEqual(res1, res2)
+
+    def test_early_stopping(self):
+        res = permute.permutation_test(self.x, self.y, n_permutations=100000,
+                                       batch_size=100, tol=.01, seed=1)
+        self.assertLess(res.n_permutations, 100000)
+        self.assertLessEqual((res.ci_high - res.ci_low) / 2, .01)
+
+    def test_paired_permutation_test(self):
+        res = permute.paired_permutation_test(self.x, self.y, self.z,
+                                              method='tauap_b',
+                                              n_permutations=500, seed=1)
+        self.assertGreater(res.statistic, 0)
+        self.assertLess(res.pvalue, .05)
+
+        res = permute.paired_permutation_test(self.x, self.y, self.y + 1e-3,
+                                              method='tau_b',
+                                              n_permutations=200, seed=1)
+        self.assertGreater(res.pvalue, .05)
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            permute.permutation_test(self.x, self.y, alternative='unknown')
+        with self.assertRaises(ValueError):
+            permute.permutation_test(self.x, self.y, method='unknown')
+        with self.assertRaises(ValueError):
+            permute.paired_permutation_test(self.x, self.y, self.z[:10])
+
+
+class TestTies(unittest.TestCase):
+    def test_permute_ties(self):
+        x = np.array([3, 1, 3, 2, 1])
+        res = [list(r) for r in permute_ties(x)]
+        self.assertEqual(res, [[0, 3, 1, 2, 4], [0, 4, 1, 2, 3],
+                               [1, 3, 0, 2, 4], [1, 4, 0, 2, 3]])
+        res = list(permute_ties(x, decreasing=False))
+        self.assertEqual(len(res), 4)
+        self.assertEqual(len(list(permute_ties(np.ones(5)))), 120)
+        self.assertEqual(len(list(permute_ties(np.arange(5)))), 1)
+
+    def test_expected_over_ties(self):
+        rng = np.random.RandomState(1234)
+        for _ in range(50):
+            x = rng.randint(0, 3, 6)
+            y = rng.randint(0, 3, 6)
+            if len(set(x)) == 1 or len(set(y)) == 1:
+                continue
+            for method in ['tau', 'tauap']:
+                for decreasing in [True, False]:
+                    self.assertAlmostEqual(
+                        expected_over_ties(x, y, method, decreasing),
+                        expected_over_ties(x, y, method, decreasing,
+                                           exhaustive=True))
+
+    def test_expected_without_ties_in_x(self):
+        rng = np.random.RandomState(4321)
+        x = rng.rand(100)
+        y = rng.randint(0, 10, 100)
+        self.assertAlmostEqual(expected_over_ties(x, y, 'tau'), tau_a(x, y))
+        self.assertAlmostEqual(expected_over_ties(x, y, 'tauap'),
+                               tauap_a(x, y))
+        self.assertAlmostEqual(expected_over_ties(x, x, 'tauap'), 1)
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            expected_over_ties(np.arange(5), np.arange(5), 'tau_b')
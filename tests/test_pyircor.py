@@ -3,6 +3,8 @@
 # sys.path.append(join(dirname(abspath(__file__)), '..'))
 import unittest
 
+import numpy as np
+
 from pyircor import tau, tauap
 
 
@@ -79,11 +81,71 @@ class TestPyircor(unittest.TestCase):
         self.assertAlmostEqual(tau.tau_b(set2['y_ties'], set2['x_ties']), 0.3765, delta=5e-5)
         self.assertAlmostEqual(tau.tau_b(set3['y_ties'], set3['x_ties']), -.6510, delta=5e-5)
 
+    def test_tau_fast_vs_naive(self):
+        # the merge sort engine must agree with the pairwise reference kernel
+        rng = np.random.RandomState(1234)
+        for n in [2, 3, 10, 100, 257]:
+            for _ in range(5):
+                x = rng.rand(n)
+                y = rng.rand(n)
+                x_ties = rng.randint(0, 4, n).astype(float)
+                y_ties = rng.randint(0, 4, n).astype(float)
+                x_ties[:2] = [0, 1]  # make sure neither vector is fully tied
+                y_ties[:2] = [0, 1]
+
+                self.assertAlmostEqual(tau.tau(x, y),
+                                       tau.tau(x, y, method='naive'))
+                self.assertAlmostEqual(tau.tau_a(x, y_ties),
+                                       tau.tau_a(x, y_ties, method='naive'))
+                self.assertAlmostEqual(
+                    tau.tau_b(x_ties, y_ties),
+                    tau.tau_b(x_ties, y_ties, method='naive'))
+
+    def test_tau_method(self):
+        with self.assertRaises(ValueError):
+            tau.tau(set1['x'], set1['y'], method='unknown')
+
     def test_tauap(self):
         self.assertAlmostEqual(tauap.tauap(set1['x'], set1['y']), 0.8519, delta=5e-5)
         self.assertAlmostEqual(tauap.tauap(set2['x'], set2['y']), 0.2504, delta=5e-5)
         self.assertAlmostEqual(tauap.tauap(set3['x'], set3['y']), -.6971, delta=5e-5)
 
+    def test_tauap_fast_vs_naive(self):
+        # the Fenwick tree engine must agree with the pairwise reference kernel
+        rng = np.random.RandomState(1234)
+        for n in [2, 3, 10, 100, 257]:
+            for _ in range(5):
+                x = rng.rand(n)
+                y = rng.rand(n)
+                for decreasing in [True, False]:
+                    self.assertAlmostEqual(
+                        tauap.tauap(x, y, decreasing=decreasing),
+                        tauap.tauap(x, y, decreasing=decreasing,
+                                    method='naive')
+                    )
+
+    def test_tauap_ties_fast_vs_naive(self):
+        # the tie-group aware engines must agree with the pairwise kernels
+        rng = np.random.RandomState(1234)
+        for n in [2, 3, 10, 100, 257]:
+            for levels in [2, 3, 7]:
+                x = rng.rand(n)
+                x_ties = rng.randint(0, levels, n).astype(float)
+                y_ties = rng.randint(0, levels, n).astype(float)
+                x_ties[:2] = [0, 1]  # make sure neither vector is fully tied
+                y_ties[:2] = [0, 1]
+                for decreasing in [True, False]:
+                    self.assertAlmostEqual(
+                        tauap.tauap_a(x, y_ties, decreasing=decreasing),
+                        tauap.tauap_a(x, y_ties, decreasing=decreasing,
+                                      method='naive')
+                    )
+                    self.assertAlmostEqual(
+                        tauap.tauap_b(x_ties, y_ties, decreasing=decreasing),
+                        tauap.tauap_b(x_ties, y_ties, decreasing=decreasing,
+                                      method='naive')
+                    )
+
     def test_tauap_a(self):
         # check that it's the stauap.ame as tau_ap when there are no ties
         self.assertAlmostEqual(tauap.tauap_a(set1['x'], set1['y']), 0.8519, delta=5e-5)
@@ -0,0 +1,115 @@
+import unittest
+
+import numpy as np
+from scipy import stats
+
+from pyircor import tau, tauap, matrix
+from pyircor.ranks import RankedVector
+
+
+class TestRankedVector(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(1234)
+        self.x = rng.rand(30)
+        self.y = rng.rand(30)
+        self.y_ties = np.round(self.y * 4)
+
+    def test_views(self):
+        for decreasing in [True, False]:
+            v = RankedVector(self.y_ties, decreasing=decreasing)
+            keys = -self.y_ties if decreasing else self.y_ties
+            np.testing.assert_array_equal(v.keys, keys)
+            np.testing.assert_array_equal(v.values, self.y_ties)
+            assert_equal = np.testing.assert_array_equal
+            assert_equal(v.mins, stats.rankdata(keys, 'min') - 1)
+            assert_equal(v.dense, stats.rankdata(keys, 'dense') - 1)
+            assert_equal(v.ordinal, stats.rankdata(keys, 'ordinal') - 1)
+            assert_equal(v.average, stats.rankdata(keys) - 1)
+            assert_equal(v.order, np.argsort(keys, kind='mergesort'))
+            self.assertTrue(v.has_ties)
+        self.assertFalse(RankedVector(self.x).has_ties)
+
+    def test_cached(self):
+        v = RankedVector(self.x)
+        self.assertIs(v.order, v.order)
+        self.assertIs(v.ordinal, v.ordinal)
+        self.assertIs(v.tie_sizes, v.tie_sizes)
+
+    def test_coefficients(self):
+        # every coefficient must accept ranked vectors, alone or with arrays
+        funcs = [(tau.tau, self.x, self.y), (tau.tau_a, self.x, self.y_ties),
+                 (tau.tau_b, self.y_ties, self.x)]
+        for func, x, y in funcs:
+            expected = func(x, y)
+            for decreasing in [True, False]:
+                rx = RankedVector(x, decreasing)
+                ry = RankedVector(y, decreasing)
+                self.assertAlmostEqual(func(rx, ry), expected)
+                self.assertAlmostEqual(func(rx, y), expected)
+                self.assertAlmostEqual(func(x, ry), expected)
+
+        funcs = [(tauap.tauap, self.x, self.y),
+                 (tauap.tauap_a, self.x, self.y_ties),
+                 (tauap.tauap_b, self.y_ties, self.x)]
+        for func, x, y in funcs:
+            for decreasing in [True, False]:
+                expected = func(x, y, decreasing=decreasing)
+                rx = RankedVector(x, decreasing)
+                ry = RankedVector(y, decreasing)
+                self.assertAlmostEqual(func(rx, ry, decreasing=decreasing),
+                                       expected)
+                self.assertAlmostEqual(func(rx, y, decreasing=decreasing),
+                                       expected)
+                self.assertAlmostEqual(
+                    func(rx, ry, decreasing=decreasing, method='naive'),
+                    expected)
+
+        Y = np.vstack([self.y, self.x])
+        np.testing.assert_allclose(
+            matrix.corr_batch(RankedVector(self.x), Y, method='tauap'),
+            matrix.corr_batch(self.x, Y, method='tauap'))
+
+    def test_zero_copy(self):
+        # arrays of the kernel dtypes are used as given, even if non-contiguous
+        for dtype in [np.int32, np.int64, np.float32, np.float64]:
+            x = (self.x * 100).astype(dtype)
+            for v in [x, x[::2]]:
+                rv = RankedVector(v)
+                self.assertIs(rv.values, v)
+                np.testing.assert_array_equal(
+                    rv.mins, stats.rankdata(-v.astype(np.float64), 'min') - 1)
+        self.assertEqual(RankedVector(self.x.astype(np.uint8)).values.dtype,
+                         np.float64)
+
+    def test_dtypes(self):
+        # results must not depend on the dtype of the inputs
+        x = np.arange(30)[::-1]
+        y = np.round(self.y * 10)
+        for func in [tau.tau_a, tauap.tauap_a]:
+            expected = func(x.astype(np.float64), y)
+            for dtype in [np.int32, np.int64, np.float32, np.uint16]:
+                self.assertAlmostEqual(func(x.astype(dtype), y.astype(dtype)),
+                                       expected)
+            self.assertAlmostEqual(func(x[::-1][::-1], y), expected)
+
+    def test_validate(self):
+        # trusted inputs skip the tie checks
+        with self.assertRaises(ValueError):
+            tauap.tauap(self.x, self.y_ties)
+        self.assertAlmostEqual(
+            tauap.tauap(self.x, self.y_ties, validate=False),
+            tauap.tauap_b_ties(self.x, self.y_ties))
+        tau.tau(self.x, self.y_ties, validate=False)
+        with self.assertRaises(ValueError):
+            tau.tau(self.x, self.y[:10], validate=False)
+
+    def test_errors(self):
+        rx = RankedVector(self.x, decreasing=True)
+        with self.assertRaises(ValueError):
+            tauap.tauap(rx, self.y, decreasing=False)
+        with self.assertRaises(ValueError):
+            tau.tau(rx, RankedVector(self.y, decreasing=False))
+        with self.assertRaises(ValueError):
+            tau.tau(rx, RankedVector(self.y_ties))
+        with self.assertRaises(ValueError):
+            RankedVector(3)
@@ -0,0 +1,68 @@
+import unittest
+
+import numpy as np
+
+from pyircor import tau, tauap
+from pyircor.segments import corr_segments, group_offsets
+
+
+COEFFICIENTS = {
+    'tau': tau.tau,
+    'tau_a': tau.tau_a,
+    'tau_b': tau.tau_b,
+    'tauap': tauap.tauap,
+    'tauap_a': tauap.tauap_a,
+    'tauap_b': tauap.tauap_b,
+}
+
+
+class TestSegments(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(1234)
+        sizes = rng.randint(2, 30, 50)
+        self.offsets = np.r_[0, np.cumsum(sizes)]
+        n = self.offsets[-1]
+        self.x = rng.rand(n)
+        self.y = self.x + rng.rand(n)
+        self.x_ties = rng.randint(0, 10, n)
+        self.y_ties = rng.randint(0, 10, n)
+
+    def test_corr_segments(self):
+        for method, coef in COEFFICIENTS.items():
+            x = self.x_ties if method.endswith('_b') else self.x
+            y = self.y if method in ['tau', 'tauap'] else self.y_ties
+            for decreasing in [True, False]:
+                res = corr_segments(x, y, self.offsets, method, decreasing)
+                self.assertEqual(len(res), len(self.offsets) - 1)
+                bounds = zip(self.offsets[:-1], self.offsets[1:])
+                for g, (a, b) in enumerate(bounds):
+                    if method.startswith('tauap'):
+                        expected = coef(x[a:b], y[a:b], decreasing)
+                    else:
+                        expected = coef(x[a:b], y[a:b])
+                    self.assertAlmostEqual(res[g], expected)
+
+    def test_dtypes_and_small_groups(self):
+        offsets = [0, 1, 1, 6, 10]
+        x = np.arange(10, dtype=np.int32)
+        y = np.arange(10, dtype=np.float32)[::-1]
+        res = corr_segments(x, y, offsets, 'tau')
+        self.assertTrue(np.isnan(res[0]))
+        self.assertTrue(np.isnan(res[1]))
+        np.testing.assert_array_equal(res[2:], [-1, -1])
+
+    def test_group_offsets(self):
+        ids = np.array(['q1', 'q1', 'q2', 'q3', 'q3', 'q3'])
+        np.testing.assert_array_equal(group_offsets(ids), [0, 2, 3, 6])
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            corr_segments(self.x, self.y, [0, 5, 3, len(self.x)])
+        with self.assertRaises(ValueError):
+            corr_segments(self.x, self.y, [0, 5])
+        with self.assertRaises(ValueError):
+            corr_segments(self.x, self.y[:-1], self.offsets)
+        with self.assertRaises(ValueError):
+            corr_segments(self.x, self.y_ties, self.offsets, 'tauap')
+        with self.assertRaises(ValueError):
+            corr_segments(self.x, self.y, self.offsets, 'unknown')
@@ -0,0 +1,143 @@
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+
+import numpy as np
+
+from pyircor import matrix, tiled
+
+
+# a run killed while saving its third tile, before renaming it
+KILLED_SCRIPT = textwrap.dedent("""
+    import os
+    import signal
+    import sys
+
+    from pyircor import tiled
+
+    replace = os.replace
+    saved = []
+
+    def killed(src, dst):
+        if len(saved) == 2:
+            os.kill(os.getpid(), signal.SIGKILL)
+        saved.append(dst)
+        replace(src, dst)
+
+    os.replace = killed
+    tiled.run(sys.argv[1], n_workers=1)
+""")
+
+
+class TestTiled(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        rng = np.random.RandomState(1234)
+        self.X = rng.rand(11, 30)
+        self.X_ties = np.round(self.X * 4)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def job(self, name):
+        return os.path.join(self.dir, name)
+
+    def test_corr_matrix(self):
+        # bit-identical to the matrix computed at once, whatever the tile size
+        for method in matrix.MEASURES:
+            X = self.X_ties if method.endswith('_b') else self.X
+            for decreasing in [True, False]:
+                ref = matrix.corr_matrix(X, method, decreasing)
+                for tile in [3, 11]:
+                    res = tiled.corr_matrix(X, self.job('{}-{}-{}'.format(
+                        method, decreasing, tile)), method, decreasing, tile,
+                        n_workers=1)
+                    np.testing.assert_array_equal(res, ref)
+
+    def test_resume(self):
+        path = self.job('resume')
+        tiled.create(path, self.X_ties, tile=4)
+        self.assertEqual(len(tiled.pending(path)), 6)
+        with self.assertRaises(ValueError):
+            tiled.assemble(path)
+        self.assertEqual(tiled.run(path, n_workers=1), 6)
+        self.assertEqual(tiled.run(path, n_workers=1), 0)
+
+        os.remove(os.path.join(path, 'tiles', '1-2.npy'))
+        self.assertEqual(tiled.pending(path), [(1, 2)])
+        res = tiled.corr_matrix(self.X_ties, path, tile=4, n_workers=1)
+        np.testing.assert_array_equal(res, matrix.corr_matrix(self.X_ties))
+
+        # the directory holds another job
+        with self.assertRaises(ValueError):
+            tiled.create(path, self.X_ties + 1, tile=4)
+        with self.assertRaises(ValueError):
+            tiled.create(path, self.X_ties, tile=3)
+
+    @unittest.skipUnless(hasattr(signal, 'SIGKILL'), 'needs SIGKILL')
+    def test_killed(self):
+        path = self.job('killed')
+        tiled.create(path, self.X_ties, tile=4)
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=root)
+        proc = subprocess.run([sys.executable, '-c', KILLED_SCRIPT, path],
+                              env=env)
+        self.assertEqual(proc.returncode, -signal.SIGKILL)
+        names = sorted(os.listdir(os.path.join(path, 'tiles')))
+        self.assertEqual(len([f for f in names if f.endswith('.tmp')]), 1)
+        self.assertEqual(len(tiled.pending(path)), 4)
+
+        # the tiles of another node are left alone
+        self.assertEqual(tiled.run(path, n_workers=1, node=1, nodes=6), 0)
+        self.assertEqual(sorted(os.listdir(os.path.join(path, 'tiles'))),
+                         names)
+        self.assertEqual(tiled.run(path, n_workers=1), 4)
+        self.assertFalse([f for f in os.listdir(os.path.join(path, 'tiles'))
+                          if f.endswith('.tmp')])
+        np.testing.assert_array_equal(tiled.assemble(path),
+                                      matrix.corr_matrix(self.X_ties))
+
+    def test_recreate(self):
+        # two jobs in a row at the same path, computed in the same process
+        path = self.job('recreate')
+        for X in [self.X_ties, self.X_ties[::-1] + 1]:
+            shutil.rmtree(path, ignore_errors=True)
+            res = tiled.corr_matrix(X, path, tile=4, n_workers=1)
+            np.testing.assert_array_equal(res, matrix.corr_matrix(X))
+
+    def test_nodes(self):
+        path = self.job('nodes')
+        tiled.create(path, self.X, 'tauap', tile=4)
+        done = [tiled.run(path, n_workers=1, node=k, nodes=4)
+                for k in range(4)]
+        self.assertEqual(done, [2, 2, 1, 1])
+        np.testing.assert_array_equal(tiled.assemble(path),
+                                      matrix.corr_matrix(self.X, 'tauap'))
+        with self.assertRaises(ValueError):
+            tiled.run(path, node=4, nodes=4)
+
+    def test_pool(self):
+        calls = []
+        res = tiled.corr_matrix(self.X_ties, self.job('pool'), 'tau_b',
+                                tile=4, n_workers=2,
+                                progress=lambda *a: calls.append(a))
+        np.testing.assert_array_equal(res,
+                                      matrix.corr_matrix(self.X_ties, 'tau_b'))
+        self.assertEqual(calls[-1], (6, 6))
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            tiled.create(self.job('ties'), self.X_ties, 'tauap')
+        with self.assertRaises(ValueError):
+            tiled.create(self.job('tile'), self.X, tile=0)
+        with self.assertRaises(ValueError):
+            tiled.pending(self.job('missing'))
+
+
+if __name__ == '__main__':
+    unittest.main()
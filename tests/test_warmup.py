@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+import textwrap
+import unittest
+
+
+# the kernels called by the public functions, which a fresh process must have
+# compiled or loaded from the cache after warmup
+KERNELS = {
+    'tau': ['_tau', '_tau_b', '_tau_from_counts', '_tau_b_from_counts',
+            '_tau_counts_ranked'],
+    'tauap': ['_tauap', '_concordant_above', '_concordant_discordant_above',
+              '_concordant_above_parallel', '_tauap_a', '_tauap_b_ties',
+              '_tauap_from_counts', '_tauap_from_counts_parallel',
+              '_tauap_a_from_counts', '_tauap_a_from_counts_parallel'],
+    'ranks': ['_rank_views', '_tie_sizes'],
+    'matrix': ['_rank_rows', '_corr_pairs', '_corr_batch'],
+    'permute': ['_permuted_coefs', '_next_permutation', '_expected_above',
+                '_expected_tauap'],
+    'online': ['_insert', '_remove'],
+    'curve': ['_tau_sweep', '_tauap_reverse_sweep'],
+    'segments': ['_corr_segments'],
+    'outofcore': ['_sort_records', '_tied_pairs_block', '_tauap_block'],
+    'lowmem': ['_tauap_lowmem'],
+    'asymptotic': ['_tie_terms_rows'],
+}
+
+WARMUP_SCRIPT = textwrap.dedent("""
+    import importlib
+    import sys
+
+    from pyircor.warmup import warmup
+
+    warmup()
+    for kernels in sys.argv[1:]:
+        module, names = kernels.split(':')
+        module = importlib.import_module('pyircor.' + module)
+        for name in names.split(','):
+            print(name, len(getattr(module, name).signatures))
+""")
+
+
+class TestWarmup(unittest.TestCase):
+    def test_warmup(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=root)
+        args = ['{}:{}'.format(module, ','.join(names))
+                for module, names in KERNELS.items()]
+        out = subprocess.run([sys.executable, '-c', WARMUP_SCRIPT] + args,
+                             env=env, check=True, stdout=subprocess.PIPE,
+                             universal_newlines=True).stdout
+        signatures = dict(line.split() for line in out.splitlines())
+        self.assertEqual(len(signatures),
+                         sum(len(names) for names in KERNELS.values()))
+        for name, count in signatures.items():
+            self.assertGreater(int(count), 0, name)